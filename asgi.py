@@ -0,0 +1,4 @@
+"""ASGI entry point for the async serving mode"""
+from src.asgi import create_asgi_app
+
+app = create_asgi_app()
\ No newline at end of file
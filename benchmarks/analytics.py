@@ -0,0 +1,62 @@
+"""Attendance analytics benchmark
+
+Times, in-process, building the employee x day matrix of a period and then
+each analytics view from the cached matrix, as /admin/reports/analytics
+and /admin/api/analytics serve them. Run it on a seeded database
+(python -m benchmarks.seed) that is migrated.
+
+Usage:
+    python -m benchmarks.analytics --db bench.db [--days 730] [--end 2025-12-31] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+def median_ms(repeat, function):
+    """Median of repeat timed calls, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.analytics', description='Benchmark attendance analytics')
+    parser.add_argument('--db', required=True, help='seeded database')
+    parser.add_argument('--days', type=int, default=730, help='period length (default: %(default)s)')
+    parser.add_argument('--end', help='last day of the period (default: the latest check-in)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per view (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    os.environ['DB_PATH'] = os.path.abspath(args.db)
+    from src.analytics import VIEWS, AttendanceMatrix, attendance_report, get_matrix
+    from src.database import get_db_connection
+
+    conn = get_db_connection()
+    end_date = date.fromisoformat(args.end or str(conn.execute('SELECT MAX(date) FROM checkins').fetchone()[0]))
+    start_date = end_date - timedelta(days=args.days - 1)
+
+    started = time.perf_counter()
+    matrix = AttendanceMatrix(start_date, end_date)
+    matrix.build(conn)
+    built = time.perf_counter() - started
+    cells = matrix.status.size
+    print(f'period {start_date} to {end_date}: {matrix.status.shape[0]} employees x {matrix.days} days')
+    print(f'{"build matrix":<16} {built * 1000:10.1f} ms  ({cells / built / 1e6:.1f}M cells/s,'
+          f' {sum(array.nbytes for array in (matrix.status, matrix.arrival, matrix.hours)) / 2 ** 20:.1f} MiB)')
+
+    get_matrix(conn, start_date, end_date)
+    print(f'{"cached refresh":<16} {median_ms(args.repeat, lambda: get_matrix(conn, start_date, end_date)):10.3f} ms')
+    for view in VIEWS:
+        elapsed = median_ms(args.repeat, lambda: attendance_report(conn, view, start_date, end_date))
+        print(f'{view:<16} {elapsed:10.1f} ms')
+    conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
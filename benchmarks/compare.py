@@ -0,0 +1,74 @@
+"""Compare two benchmark result files
+
+Flags an endpoint as a regression when its p90 latency grows, or its
+throughput drops, by more than the threshold. Exits with status 1 when
+anything regressed, so it can gate a CI job.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CURRENT.json [--threshold 0.10]
+"""
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+def change(before, after):
+    """Relative change from before to after, or None when not comparable"""
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+def compare(baseline, current, threshold):
+    """Rows of (endpoint, metric deltas, regressed) for endpoints in both files"""
+    rows = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        p90 = change(before['p90_ms'], now['p90_ms'])
+        throughput = change(before['throughput_rps'], now['throughput_rps'])
+        regressed = ((p90 is not None and p90 > threshold)
+                     or (throughput is not None and throughput < -threshold)
+                     or now['errors'] > before['errors'])
+        rows.append((name, before, now, p90, throughput, regressed))
+    return rows
+
+def format_change(value):
+    return '     n/a' if value is None else f'{value * 100:+7.1f}%'
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compare', description='Compare benchmark results')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed relative slowdown (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    baseline, current = load(args.baseline), load(args.current)
+    for label, report in (('baseline', baseline), ('current', current)):
+        meta = report['meta']
+        print(f"{label:<9} {meta.get('revision') or '?'} {meta['mode']} "
+              f"concurrency {meta['concurrency']} ({meta['timestamp']})")
+    if baseline['meta']['mode'] != current['meta']['mode']:
+        print('warning: results come from different modes')
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"\n{'endpoint':<14} {'p90 ms':>17} {'change':>8} {'req/s':>17} {'change':>8}")
+    for name, before, now, p90, throughput, regressed in rows:
+        print(f"{name:<14} {before['p90_ms']:>8} {now['p90_ms']:>8} {format_change(p90)} "
+              f"{before['throughput_rps']:>8} {now['throughput_rps']:>8} {format_change(throughput)}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    regressions = [row[0] for row in rows if row[5]]
+    if regressions:
+        print(f"\nRegressed: {', '.join(regressions)}")
+        return 1
+    print('\nNo regressions')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Page rendering benchmark
+
+Times, in-process and without HTTP, the parts of a page render the app
+controls:
+
+- loading every template in a fresh worker, compiled from source versus
+  read from the bytecode cache in TEMPLATE_CACHE_DIR;
+- get_text() lookups through the compiled catalogs versus the nested
+  TRANSLATIONS lookups with fallback they replaced;
+- rendering the dashboard and the users page without and with the
+  {% cache %} fragments.
+
+Usage:
+    python -m benchmarks.render [--renders 2000] [--language fr]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def best_of(repeat, function):
+    """Fastest of repeat timed calls, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def legacy_get_text(translations):
+    """get_text() as create_app used to define it"""
+    from flask import session
+
+    def get_text(key):
+        lang = session.get('language', 'fr')
+        return translations.get(lang, {}).get(key, translations['en'].get(key, key))
+    return get_text
+
+def time_template_loading(app, repeat):
+    """Seconds to load every template in a new environment, (compiled, cached)"""
+    from src.templating import FragmentCacheExtension, bytecode_cache
+
+    cache = bytecode_cache(tempfile.mkdtemp())
+
+    def load_all(bytecode):
+        env = app.create_jinja_environment()
+        env.add_extension(FragmentCacheExtension)
+        env.bytecode_cache = bytecode
+        for name in env.list_templates():
+            env.get_template(name)
+
+    load_all(cache)  # fill the cache, as the first worker does
+    return best_of(repeat, lambda: load_all(None)), best_of(repeat, lambda: load_all(cache))
+
+def time_lookups(app, language, count):
+    """Seconds for count get_text() calls, (legacy, catalog)"""
+    from flask import session
+    from src.config import TRANSLATIONS
+    from src.i18n import get_catalog
+
+    keys = list(TRANSLATIONS['en'])
+    rounds = range(count // len(keys) + 1)
+    with app.test_request_context('/'):
+        session['language'] = language
+        results = []
+        for get_text in (legacy_get_text(TRANSLATIONS), get_catalog().__getitem__):
+            def run():
+                for _ in rounds:
+                    for key in keys:
+                        get_text(key)
+            results.append(best_of(3, run))
+    return tuple(results)
+
+def time_pages(app, language, renders):
+    """Milliseconds per render of each page as {page: (before, catalogs, fragments)}"""
+    from flask import render_template, session
+    from src.config import TRANSLATIONS
+
+    today = {'check_in_time': '2024-03-04 08:57:12.123456', 'check_out_time': None, 'status': 'on_time'}
+    recent = [dict(today, date=f'2024-03-0{day}', check_out_time='2024-03-04 17:30:00') for day in range(1, 8)]
+    users = [
+        {'id': n, 'employee_id': f'EMP{n:03d}', 'username': f'user{n}', 'first_name': 'Test', 'last_name': f'User {n}',
+         'email': f'user{n}@example.com', 'department': 'IT', 'hourly_rate': 25.0, 'is_active': 1}
+        for n in range(1, 26)
+    ]
+    pages = {
+        'dashboard.html': {'checkin_today': today, 'recent_checkins': recent},
+        'admin/users.html': {'users': users},
+    }
+    results = {}
+    with app.test_request_context('/'):
+        session.update(language=language, employee_id=1, username='admin', employee_name='admin')
+        legacy = legacy_get_text(TRANSLATIONS)
+        for name, context in pages.items():
+            timings = []
+            for overrides, fragments in (({'get_text': legacy}, None), ({}, None), ({}, {})):
+                app.jinja_env.fragment_cache = fragments
+                render = lambda: render_template(name, **context, **overrides)
+                render()
+                timings.append(best_of(3, lambda: [render() for _ in range(renders)]) / renders * 1000)
+            results[name] = tuple(timings)
+    app.jinja_env.fragment_cache = {}
+    return results
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.render', description='Benchmark page rendering')
+    parser.add_argument('--renders', type=int, default=2000, help='renders per page and variant')
+    parser.add_argument('--lookups', type=int, default=200000, help='get_text() calls per variant')
+    parser.add_argument('--language', default='fr', help='session language (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'render.db')
+    os.environ['TEMPLATE_CACHE_DIR'] = tempfile.mkdtemp()
+    os.environ.setdefault('TEMPLATE_FOLDER', os.path.join(REPO_ROOT, 'templates'))
+    from src.app import create_app
+    app = create_app()
+
+    compiled, cached = time_template_loading(app, repeat=5)
+    print(f'{"load all templates":<28} {compiled * 1000:8.1f} ms compiled  {cached * 1000:8.1f} ms from bytecode cache'
+          f'  ({compiled / cached:.1f}x)')
+
+    legacy, catalog = time_lookups(app, args.language, args.lookups)
+    per_call = 1e9 / args.lookups
+    print(f'{"get_text()":<28} {legacy * per_call:8.0f} ns legacy    {catalog * per_call:8.0f} ns catalog'
+          f'             ({legacy / catalog:.1f}x)')
+
+    print(f'\n{"render (ms)":<28} {"before":>8} {"catalogs":>9} {"+fragments":>11}')
+    for name, (before, catalogs, fragments) in time_pages(app, args.language, args.renders).items():
+        print(f'{name:<28} {before:8.3f} {catalogs:9.3f} {fragments:11.3f}  ({before / fragments:.2f}x)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""Latency and throughput benchmarks for the check-in rush
+
+Logs in a set of seeded employees (see benchmarks/seed.py) and replays
+requests against each endpoint in turn from concurrent threads, either
+in-process through the Flask test client or over HTTP against gunicorn.
+Results are written as JSON for benchmarks/compare.py.
+
+Usage:
+    python -m benchmarks.run --db bench.db [--mode client|http] [--requests 500] [--concurrency 8]
+    python -m benchmarks.run --db bench.db --mode http --start-server [--workers 4]
+    python -m benchmarks.run --mode http --url http://localhost:5000
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from .seed import PASSWORD, username
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name, method, path, run as admin
+SCENARIOS = [
+    ('checkin', 'POST', '/checkin', False),
+    ('checkout', 'POST', '/checkout', False),
+    ('api_status', 'GET', '/api/status', False),
+    ('dashboard', 'GET', '/dashboard', False),
+    ('billing', 'GET', '/billing', False),
+    ('admin', 'GET', '/admin', True),
+    ('admin_reports', 'GET', '/admin/reports', True)
+]
+
+# Every virtual user logs in from the same address
+BENCHMARK_ENV = {'LOGIN_RATE_LIMIT_ATTEMPTS': '1000000'}
+
+class ClientSession:
+    """One logged-in browser driving the app in-process"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        return self.client.open(path, method=method, data=data).status_code
+
+class HttpSession:
+    """One logged-in browser driving a running server"""
+
+    def __init__(self, base_url):
+        import requests
+        self.http = requests.Session()
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None):
+        return self.http.request(method, self.base_url + path, data=data, allow_redirects=False).status_code
+
+def login(session, name):
+    status = session.request('POST', '/login', {'username': name, 'password': PASSWORD})
+    if status != 302:
+        raise RuntimeError(f'login as {name} failed with HTTP {status}')
+    return session
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'p90_ms': round(percentile(ordered, 0.90) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else None
+    }
+
+def run_scenario(sessions, method, path, total, concurrency):
+    """Send total requests from concurrency threads, round-robin over sessions"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(index):
+        own = sessions[index::concurrency] or sessions
+        count = total // concurrency + (1 if index < total % concurrency else 0)
+        timings = []
+        failed = 0
+        for n in range(count):
+            started = time.perf_counter()
+            status = own[n % len(own)].request(method, path)
+            timings.append(time.perf_counter() - started)
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(timings)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+def start_server(db_path, port, workers, app_target, worker_class):
+    """Launch gunicorn on the benchmark database and wait until it answers"""
+    import requests
+    env = dict(os.environ, DB_PATH=os.path.abspath(db_path), GUNICORN_WORKER_CLASS=worker_class,
+               TEMPLATE_FOLDER=os.environ.get('TEMPLATE_FOLDER', os.path.join(REPO_ROOT, 'templates')),
+               **BENCHMARK_ENV)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), app_target],
+        cwd=REPO_ROOT, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/login', timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start within 30s')
+
+def database_counts(db_path):
+    if not db_path or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('employees', 'checkins', 'billing_rates')}
+    finally:
+        conn.close()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmark the check-in endpoints')
+    parser.add_argument('--db', default='bench.db', help='seeded database (default: %(default)s)')
+    parser.add_argument('--mode', choices=['client', 'http'], default='client')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server for --mode http')
+    parser.add_argument('--start-server', action='store_true', help='run gunicorn on --db for --mode http')
+    parser.add_argument('--port', type=int, default=5055, help='port for --start-server')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers for --start-server')
+    parser.add_argument('--app', default='main:app', help='gunicorn target, e.g. asgi:app')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, help='employees to log in (default: 4 per thread)')
+    parser.add_argument('--scenario', action='append', choices=[s[0] for s in SCENARIOS],
+                        help='endpoints to run (default: all)')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/<rev>-<mode>.json)')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.mode == 'client':
+        os.environ['DB_PATH'] = args.db
+        os.environ.setdefault('TEMPLATE_FOLDER', os.path.join(REPO_ROOT, 'templates'))
+        os.environ.update(BENCHMARK_ENV)
+        from src.app import create_app
+        app = create_app()
+        new_session = lambda: ClientSession(app)
+    else:
+        if args.start_server:
+            server = start_server(args.db, args.port, args.workers, args.app, args.worker_class)
+            args.url = f'http://127.0.0.1:{args.port}'
+        new_session = lambda: HttpSession(args.url)
+
+    try:
+        users = args.users or args.concurrency * 4
+        employees = [login(new_session(), username(n)) for n in range(users)]
+        admins = [login(new_session(), 'admin') for _ in range(args.concurrency)]
+
+        results = {}
+        for name, method, path, as_admin in SCENARIOS:
+            if args.scenario and name not in args.scenario:
+                continue
+            sessions = admins if as_admin else employees
+            run_scenario(sessions, method, path, args.concurrency, args.concurrency)  # warm up
+            results[name] = run_scenario(sessions, method, path, args.requests, args.concurrency)
+            result = results[name]
+            print(f"{name:<14} {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']:>8} ms  "
+                  f"p90 {result['p90_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    revision = git_revision()
+    report = {
+        'meta': {
+            'revision': revision,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'mode': args.mode,
+            'url': args.url if args.mode == 'http' else None,
+            'app': args.app if args.start_server else None,
+            'worker_class': args.worker_class if args.start_server else None,
+            'workers': args.workers if args.start_server else None,
+            'concurrency': args.concurrency,
+            'users': users,
+            'requests_per_endpoint': args.requests,
+            'database': database_counts(args.db),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    output = args.output or os.path.join(REPO_ROOT, 'benchmarks', 'results', f"{revision or 'local'}-{args.mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f'Results written to {output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Seed a synthetic database for the benchmarks
+
+Creates employees with years of weekday check-ins and a few rate changes
+each, then rebuilds the rollups. Every seeded employee logs in as
+user<N> with the password "password". Today is left empty so the check-in
+benchmark records real check-ins.
+
+Usage:
+    python -m benchmarks.seed --db bench.db [--employees 500] [--years 2] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+PASSWORD = 'password'
+DEPARTMENTS = ['IT', 'Sales', 'Support', 'Finance', 'Operations', 'HR']
+
+def username(number):
+    return f'user{number:05d}'
+
+def iter_checkins(employee_pk, first_day, last_day, rng):
+    """Weekday check-ins with a few absences, late arrivals and open days"""
+    day = first_day
+    while day <= last_day:
+        if day.weekday() < 5 and rng.random() > 0.05:
+            arrival = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=8, minutes=rng.randint(30, 60 + 45), microseconds=rng.randint(0, 999999))
+            status = 'late' if arrival.time() > datetime.strptime('09:15', '%H:%M').time() else 'on_time'
+            departure = arrival + timedelta(hours=rng.uniform(6.5, 9.5))
+            if rng.random() < 0.02:
+                yield (employee_pk, str(arrival), None, None, day.isoformat(), status)
+            else:
+                yield (employee_pk, str(arrival), str(departure), (departure - arrival).total_seconds() / 3600,
+                       day.isoformat(), status)
+        day += timedelta(days=1)
+
+def iter_rates(employee_pk, first_day, last_day, rng, changes=3):
+    """An initial rate plus a few raises spread over the seeded period"""
+    rate = rng.choice([20.0, 25.0, 30.0, 40.0])
+    span = (last_day - first_day).days
+    offsets = sorted(rng.sample(range(1, span), min(changes, span - 1))) if span > 1 else []
+    yield (employee_pk, rate, first_day.isoformat())
+    for offset in offsets:
+        rate = round(rate * rng.uniform(1.02, 1.10), 2)
+        yield (employee_pk, rate, (first_day + timedelta(days=offset)).isoformat())
+
+def seed(db_path, employees=500, years=2, rate_changes=3, random_seed=1):
+    """Create or extend db_path with synthetic data, returning row counts"""
+    os.environ['DB_PATH'] = db_path
+    from src.database import get_pool
+    from src.migrations import migrate
+    from src.passwords import hash_password
+    from src.rates import refresh_end_dates
+    from src.rollups import rebuild_rollups
+
+    rng = random.Random(random_seed)
+    last_day = date.today() - timedelta(days=1)
+    first_day = last_day - timedelta(days=365 * years)
+    password_hash = hash_password(PASSWORD)
+
+    conn = get_pool(db_path).acquire()
+    try:
+        migrate(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        start = conn.execute("SELECT COUNT(*) FROM employees WHERE employee_id LIKE 'BENCH%'").fetchone()[0]
+        for number in range(start, start + employees):
+            department = DEPARTMENTS[number % len(DEPARTMENTS)]
+            employee_pk = conn.execute('''
+                INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            ''', (f'BENCH{number:05d}', username(number), f'{username(number)}@bench.local',
+                  password_hash, 'Bench', f'User {number}', department, 'Staff')).fetchone()[0]
+            conn.executemany(
+                'INSERT INTO checkins (employee_id, check_in_time, check_out_time, worked_hours, date, status)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                iter_checkins(employee_pk, first_day, last_day, rng)
+            )
+            conn.executemany(
+                'INSERT INTO billing_rates (employee_id, hourly_rate, effective_date) VALUES (?, ?, ?)',
+                iter_rates(employee_pk, first_day, last_day, rng, rate_changes)
+            )
+        refresh_end_dates(conn)
+        rebuild_rollups(conn)
+        conn.commit()
+        conn.execute('ANALYZE')
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('employees', 'checkins', 'billing_rates', 'attendance_rollups')}
+    finally:
+        conn.close()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.seed', description='Seed a benchmark database')
+    parser.add_argument('--db', default='bench.db', help='database file (default: %(default)s)')
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--rate-changes', type=int, default=3, help='rate changes per employee')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = seed(args.db, args.employees, args.years, args.rate_changes, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f'Seeded {args.db} in {elapsed:.1f}s: ' + ', '.join(f'{n} {t}' for t, n in counts.items()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
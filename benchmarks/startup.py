@@ -0,0 +1,122 @@
+"""Worker startup benchmark
+
+Measures what a worker pays before it can serve its first request:
+
+- import and create_app() in a fresh interpreter, which every worker pays
+  when the app is not preloaded;
+- gunicorn with and without preload_app (GUNICORN_PRELOAD): time from
+  launch to the first answered request, and each worker's boot time from
+  fork to ready, as logged by the post_worker_init hook in gunicorn.conf.py.
+
+Usage:
+    python -m benchmarks.startup [--db bench.db] [--workers 4] [--runs 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_LINE = re.compile(r'Worker (\d+) ready in ([\d.]+) ms')
+
+IMPORT_SCRIPT = '''
+import time
+started = time.perf_counter()
+from src.app import create_app
+imported = time.perf_counter()
+create_app()
+print(imported - started, time.perf_counter() - imported)
+'''
+
+def server_env(db_path, preload=None):
+    env = dict(os.environ, DB_PATH=os.path.abspath(db_path),
+               TEMPLATE_FOLDER=os.environ.get('TEMPLATE_FOLDER', os.path.join(REPO_ROOT, 'templates')))
+    if preload is not None:
+        env['GUNICORN_PRELOAD'] = '1' if preload else '0'
+    return env
+
+def time_create_app(db_path, runs):
+    """(import seconds, create_app seconds) medians over fresh interpreters"""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=REPO_ROOT, env=server_env(db_path),
+                                check=True, capture_output=True, text=True).stdout
+        timings.append([float(value) for value in output.split()])
+    return tuple(statistics.median(column) for column in zip(*timings))
+
+def time_gunicorn(db_path, preload, workers, port):
+    """(seconds to first answered request, [worker boot ms]) for one server start"""
+    import requests
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), 'main:app'],
+        cwd=REPO_ROOT, env=server_env(db_path, preload), stderr=subprocess.PIPE, text=True
+    )
+    boots = []
+    all_ready = threading.Event()
+
+    def read_log():
+        for line in server.stderr:
+            match = READY_LINE.search(line)
+            if match:
+                boots.append(float(match.group(2)))
+                if len(boots) == workers:
+                    all_ready.set()
+    threading.Thread(target=read_log, daemon=True).start()
+
+    try:
+        first_request = None
+        deadline = started + 60
+        while first_request is None and time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+            try:
+                if requests.get(f'http://127.0.0.1:{port}/login', timeout=1).status_code == 200:
+                    first_request = time.monotonic() - started
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        if first_request is None:
+            raise RuntimeError('gunicorn did not answer within 60s')
+        all_ready.wait(30)
+        return first_request, list(boots)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description='Benchmark worker startup')
+    parser.add_argument('--db', help='database to serve (default: a fresh temporary one)')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3, help='server starts per mode (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=5056)
+    args = parser.parse_args(argv)
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'startup.db')
+    # The first start creates the schema; measure the restarts after it
+    time_create_app(db_path, 1)
+
+    imported, created = time_create_app(db_path, args.runs * 2)
+    print(f'{"import src.app":<30} {imported * 1000:8.1f} ms')
+    print(f'{"create_app()":<30} {created * 1000:8.1f} ms')
+
+    print(f'\n{"gunicorn":<14} {"first request":>14} {"worker boot p50":>16} {"max":>8}')
+    for preload in (False, True):
+        first_requests, boots = [], []
+        for _ in range(args.runs):
+            first_request, worker_boots = time_gunicorn(db_path, preload, args.workers, args.port)
+            first_requests.append(first_request)
+            boots.extend(worker_boots)
+        label = 'preload' if preload else 'no preload'
+        print(f'{label:<14} {statistics.median(first_requests) * 1000:11.0f} ms'
+              f' {statistics.median(boots):13.1f} ms {max(boots):5.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
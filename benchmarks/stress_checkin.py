@@ -0,0 +1,171 @@
+"""Concurrency stress test for check-in and check-out
+
+Several processes, each with several threads, repeatedly check the same
+employees in on one day, in random order, through the same functions the
+routes use, then repeatedly check them out the same way. Check-outs start
+once every check-in is done, as a check-in after a check-out is another
+work session. The run fails unless every employee ends up with exactly one
+checkins row and one closed work session, exactly one successful check-in
+and one successful check-out, no database errors, rollups matching a
+rebuild and one board event per successful operation.
+
+Usage:
+    python -m benchmarks.stress_checkin [--employees 200] [--processes 4] [--threads 8] [--rounds 3]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+STRESS_DAY = datetime(2031, 1, 6, 8, 50)
+
+def hammer(db_path, employee_ids, threads, rounds, seed, phase):
+    """Run check-ins or check-outs (phase) from several threads; returns counters"""
+    os.environ['DB_PATH'] = db_path
+    from src.attendance import check_in_employee, check_out_employee
+    from src.database import get_pool
+
+    counts = Counter()
+    lock = threading.Lock()
+
+    def worker(thread_seed):
+        rng = random.Random(thread_seed)
+        local = Counter()
+        conn = get_pool(db_path).acquire()
+        try:
+            operation, minutes = (check_in_employee, 0) if phase == 'check_in' else (check_out_employee, 8 * 60)
+            for _ in range(rounds):
+                order = list(employee_ids)
+                rng.shuffle(order)
+                for employee_id in order:
+                    moment = STRESS_DAY + timedelta(minutes=minutes, microseconds=rng.randint(0, 10 ** 6))
+                    try:
+                        success, _ = operation(conn, employee_id, now=moment)
+                    except Exception as exc:
+                        local[f'error:{type(exc).__name__}:{exc}'] += 1
+                        continue
+                    local[f'{operation.__name__}:{"ok" if success else "refused"}'] += 1
+                    if success:
+                        local[f'{operation.__name__}:{employee_id}'] += 1
+        finally:
+            conn.close()
+        with lock:
+            counts.update(local)
+
+    pool = [threading.Thread(target=worker, args=(seed * 1000 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return counts
+
+def check(db_path, employee_ids, counts):
+    """List of consistency problems after a run"""
+    from src.database import get_pool
+    from src.rollups import AGGREGATE_COLUMNS_SQL
+
+    problems = [f'{count} x {key}' for key, count in counts.items() if key.startswith('error:')]
+    for employee_id in employee_ids:
+        for operation in ('check_in_employee', 'check_out_employee'):
+            successes = counts[f'{operation}:{employee_id}']
+            if successes != 1:
+                problems.append(f'employee {employee_id}: {successes} successful {operation}')
+
+    day = STRESS_DAY.date().isoformat()
+    conn = get_pool(db_path).acquire()
+    try:
+        rows = conn.execute('''
+            SELECT employee_id, COUNT(*) AS n, MIN(check_in_time) AS check_in, MIN(check_out_time) AS check_out
+            FROM checkins WHERE date = ? GROUP BY employee_id
+        ''', (day,)).fetchall()
+        by_employee = {row['employee_id']: row for row in rows}
+        for employee_id in employee_ids:
+            row = by_employee.get(employee_id)
+            if row is None:
+                problems.append(f'employee {employee_id}: no checkins row')
+            elif row['n'] != 1 or not row['check_in'] or not row['check_out']:
+                problems.append(f'employee {employee_id}: {row["n"]} rows, in={row["check_in"]} out={row["check_out"]}')
+
+        stale = conn.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT employee_id, date AS period_start, {AGGREGATE_COLUMNS_SQL} FROM checkins
+                WHERE date = ? GROUP BY employee_id, date
+                EXCEPT
+                SELECT employee_id, period_start, days_worked, check_ins, late_days, completed_days, total_hours
+                FROM attendance_rollups WHERE period_type = 'day' AND period_start = ?
+            )
+        ''', (day, day)).fetchone()[0]
+        if stale:
+            problems.append(f'{stale} day rollups differ from the check-ins')
+
+        sessions, closed = conn.execute(
+            'SELECT COUNT(*), COUNT(ended_at) FROM work_sessions WHERE checkin_date = ?', (day,)).fetchone()
+        if sessions != len(employee_ids) or closed != sessions:
+            problems.append(f'{sessions} work sessions ({closed} closed), expected {len(employee_ids)} closed')
+
+        events = conn.execute('SELECT COUNT(*) FROM attendance_events WHERE date = ?', (day,)).fetchone()[0]
+        if events != 2 * len(employee_ids):
+            problems.append(f'{events} board events, expected {2 * len(employee_ids)}')
+    finally:
+        conn.close()
+    return problems
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stress_checkin', description='Stress check-in/check-out')
+    parser.add_argument('--db', help='database to use (default: a fresh temporary one)')
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='threads per process')
+    parser.add_argument('--rounds', type=int, default=3, help='passes over all employees per thread')
+    args = parser.parse_args(argv)
+
+    from .seed import seed
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'stress.db')
+    seed(db_path, employees=args.employees, years=0.01)
+
+    from src.database import get_pool
+    conn = get_pool(db_path).acquire()
+    try:
+        conn.execute('DELETE FROM work_sessions WHERE checkin_date = ?', (STRESS_DAY.date().isoformat(),))
+        conn.execute('DELETE FROM checkins WHERE date = ?', (STRESS_DAY.date().isoformat(),))
+        conn.commit()
+        employee_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM employees WHERE employee_id LIKE 'BENCH%' ORDER BY id LIMIT ?", (args.employees,))]
+    finally:
+        conn.close()
+
+    started = time.perf_counter()
+    counts = Counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=context) as executor:
+        for phase in ('check_in', 'check_out'):
+            futures = [executor.submit(hammer, db_path, employee_ids, args.threads, args.rounds, seed_value, phase)
+                       for seed_value in range(args.processes)]
+            for future in futures:
+                counts.update(future.result())
+    elapsed = time.perf_counter() - started
+
+    attempts = sum(count for key, count in counts.items() if key.endswith((':ok', ':refused')))
+    print(f'{attempts} operations from {args.processes * args.threads} threads in {elapsed:.1f}s '
+          f'({attempts / elapsed:.0f}/s) on {len(employee_ids)} employees')
+    for key in ('check_in_employee:ok', 'check_in_employee:refused', 'check_out_employee:ok', 'check_out_employee:refused'):
+        print(f'  {key:<28} {counts[key]}')
+
+    problems = check(db_path, employee_ids, counts)
+    for problem in problems[:50]:
+        print(f'FAIL {problem}')
+    if problems:
+        return 1
+    print('OK: no lost or duplicated check-ins')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -1,7 +1,44 @@
+import os
+import time
+
 bind = "0.0.0.0:5000"
 workers = 4
-worker_class = "sync"
+# "sync" for main:app, "uvicorn.workers.UvicornWorker" for asgi:app
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
 timeout = 30
 keepalive = 2
 max_requests = 1000
-max_requests_jitter = 100
\ No newline at end of file
+max_requests_jitter = 100
+# Build the app once in the master and fork the workers from it, so a
+# recycled worker starts without imports, schema checks or template
+# compilation. Code changes then need a restart, not a HUP.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+def on_starting(server):
+    from src.config import INSTRUMENTATION_ENABLED
+    if INSTRUMENTATION_ENABLED:
+        from src.instrumentation import reset_metrics
+        reset_metrics()
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from src.app import warm_app
+        app = server.app.wsgi()
+        warm_app(getattr(app, "flask_app", app))
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        from src.app import prepare_fork
+        prepare_fork()
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s ready in %.1f ms", worker.pid, (time.monotonic() - worker.forked_at) * 1000)
+
+def child_exit(server, worker):
+    from src.config import INSTRUMENTATION_ENABLED
+    if INSTRUMENTATION_ENABLED:
+        from src.instrumentation import archive_worker
+        archive_worker(worker.pid)
\ No newline at end of file
@@ -0,0 +1,429 @@
+"""Attendance analytics on an employee x day matrix
+
+An AttendanceMatrix holds one period of check-ins as dense NumPy arrays,
+one row per employee and one column per day: the status code, the arrival
+(minutes since midnight) and the hours worked, NaN where there is none.
+Archived months (src/archive.py) are read like the hot table. Every report
+below is a handful of array operations over the whole company, so it takes
+milliseconds once the matrix is built.
+
+Each process keeps up to ANALYTICS_CACHE_PERIODS matrices, one per period.
+The attendance_events outbox (src/live.py) tells which days changed since
+a matrix was built; those columns are reloaded, checked at most every
+ANALYTICS_MAX_AGE_SECONDS. 'reset' events, new employees and long idle
+spells (events are pruned) rebuild the whole matrix.
+
+numpy is optional: only these reports need it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from .archive import checkin_partitions
+from .config import (
+    ANALYTICS_MAX_AGE_SECONDS, ANALYTICS_CACHE_PERIODS, ANALYTICS_MAX_DAYS, LIVE_EVENT_RETENTION_DAYS
+)
+from .dialects import dialect_of
+from .schedules import load_schedules
+
+ABSENT, ON_TIME, LATE, EARLY_LEAVE = 0, 1, 2, 3
+STATUS_CODES = {'on_time': ON_TIME, 'late': LATE, 'early_leave': EARLY_LEAVE}
+VIEWS = ('trends', 'streaks', 'weekdays', 'overtime', 'departments')
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+LOAD_BATCH_ROWS = 50000
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError('Attendance analytics require numpy (pip install numpy)')
+    return numpy
+
+def check_period(start_date, end_date):
+    """(start, end) as dates; ValueError for an empty or too long period"""
+    start_date, end_date = date.fromisoformat(str(start_date)), date.fromisoformat(str(end_date))
+    if end_date < start_date:
+        raise ValueError('The period ends before it starts')
+    if (end_date - start_date).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f'Analytics periods are limited to {ANALYTICS_MAX_DAYS} days')
+    return start_date, end_date
+
+def minutes_labels(minutes):
+    """'HH:MM' of each minutes-since-midnight value, None for NaN"""
+    np = require_numpy()
+    minutes = np.asarray(minutes, dtype=np.float64).ravel()
+    whole = np.rint(np.where(np.isnan(minutes), -1, minutes)).astype(np.int64).tolist()
+    return [None if value < 0 else f'{value // 60:02d}:{value % 60:02d}' for value in whole]
+
+def rounded(value, digits=2):
+    """A NumPy scalar as a JSON number, None for NaN"""
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+class AttendanceMatrix:
+    """One period of check-ins as employee x day arrays"""
+
+    def __init__(self, start_date, end_date):
+        np = require_numpy()
+        self.start_date, self.end_date = start_date, end_date
+        self.days = (end_date - start_date).days + 1
+        first = np.datetime64(start_date, 'D')
+        # 1970-01-01 was a Thursday
+        self.weekdays = (np.arange(self.days) + (first.astype('int64') + 3)) % 7
+        self.employee_ids = np.zeros(0, dtype=np.int64)
+        self.event_id = 0
+
+    def day(self, column):
+        return self.start_date + timedelta(days=int(column))
+
+    def rows_of(self, employee_ids):
+        """Matrix rows of employee ids, -1 for employees not in the matrix"""
+        np = require_numpy()
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        if not len(self.employee_ids):
+            return np.full(len(employee_ids), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.employee_ids, employee_ids), len(self.employee_ids) - 1)
+        return np.where(self.employee_ids[rows] == employee_ids, rows, -1)
+
+    def build(self, conn):
+        """Load every employee's check-ins of the period"""
+        np = require_numpy()
+        # Read the outbox position first: changes committed while loading are replayed
+        event_id = latest_event_id(conn)
+        self.employee_ids = np.array([row[0] for row in conn.execute('SELECT id FROM employees ORDER BY id')],
+                                     dtype=np.int64)
+        shape = (len(self.employee_ids), self.days)
+        self.status = np.zeros(shape, dtype=np.int8)
+        self.arrival = np.full(shape, np.nan, dtype=np.float32)
+        self.hours = np.full(shape, np.nan, dtype=np.float32)
+        self._load_days(conn, self.start_date, self.end_date)
+        self.event_id = event_id
+
+    def _load_days(self, conn, first, last):
+        np = require_numpy()
+        dialect = dialect_of(conn)
+        for table, part_first, part_last in checkin_partitions(conn, str(first), str(last)):
+            # Columns come out of the query ready for indexing: fewer Python objects per row
+            cursor = conn.execute(f'''
+                SELECT employee_id, {dialect.days_between('?', 'date')}, status,
+                       {dialect.seconds_of_day('check_in_time')} / 60.0,
+                       worked_hours
+                FROM {table}
+                WHERE date BETWEEN ? AND ? AND check_in_time IS NOT NULL
+            ''', (str(self.start_date), part_first, part_last))
+            try:
+                while True:
+                    rows = cursor.fetchmany(LOAD_BATCH_ROWS)
+                    if not rows:
+                        break
+                    employee_ids, columns, statuses, arrivals, hours = zip(*rows)
+                    rows = self.rows_of(employee_ids)
+                    columns = np.array(columns, dtype=np.int64)
+                    known = rows >= 0
+                    rows, columns = rows[known], columns[known]
+                    self.status[rows, columns] = np.array(
+                        [STATUS_CODES.get(status, ON_TIME) for status in statuses], dtype=np.int8)[known]
+                    self.arrival[rows, columns] = np.array(arrivals, dtype=np.float32)[known]
+                    self.hours[rows, columns] = np.array(hours, dtype=np.float32)[known]
+            finally:
+                cursor.close()
+
+    def reload_days(self, conn, first, last):
+        """Reload the columns of [first, last] after check-ins changed"""
+        first, last = max(first, self.start_date), min(last, self.end_date)
+        if first > last:
+            return
+        columns = slice((first - self.start_date).days, (last - self.start_date).days + 1)
+        self.status[:, columns] = ABSENT
+        self.arrival[:, columns] = float('nan')
+        self.hours[:, columns] = float('nan')
+        self._load_days(conn, first, last)
+
+    def replay(self, conn):
+        """Reload the days of the outbox events since the build
+
+        False, with nothing reloaded, when the matrix must be rebuilt: after
+        a 'reset' or a check-in of an employee it has no row for.
+        """
+        events = conn.execute('''
+            SELECT id, event_type, employee_id, date FROM attendance_events
+            WHERE id > ? ORDER BY id
+        ''', (self.event_id,)).fetchall()
+        if not events:
+            return True
+        employee_ids = [row['employee_id'] for row in events if row['employee_id'] is not None]
+        if any(row['event_type'] == 'reset' for row in events) or (self.rows_of(employee_ids) < 0).any():
+            return False
+        days = [date.fromisoformat(str(row['date'])) for row in events]
+        self.reload_days(conn, min(days), max(days))
+        self.event_id = events[-1]['id']
+        return True
+
+class CachedMatrix:
+    """The current AttendanceMatrix of a period, kept up to date
+
+    A rebuild replaces the matrix, so a report holding the previous one
+    finishes with it; replayed columns are reloaded in place, so a report
+    running meanwhile may mix old and new values of the changed days.
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_date, self.end_date = start_date, end_date
+        self.matrix = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, conn, max_age=ANALYTICS_MAX_AGE_SECONDS):
+        """Catch up with the outbox; checks younger than max_age are skipped"""
+        now = time.monotonic()
+        if now - self._checked_at < max_age:
+            return
+        with self._lock:
+            if now - self._checked_at < max_age:
+                return
+            # Outbox rows older than LIVE_EVENT_RETENTION_DAYS may be gone
+            idle = now - self._checked_at > LIVE_EVENT_RETENTION_DAYS * 86400
+            if self.matrix is None or idle or not self.matrix.replay(conn):
+                matrix = AttendanceMatrix(self.start_date, self.end_date)
+                matrix.build(conn)
+                self.matrix = matrix
+            self._checked_at = now
+
+def latest_event_id(conn):
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance_events').fetchone()[0]
+
+_matrices = OrderedDict()
+_matrices_lock = threading.Lock()
+
+def matrix_for(conn, start_date, end_date):
+    """The CachedMatrix of a period of conn's database"""
+    from .config import DB_PATH
+    pool = getattr(conn, 'pool', None)
+    key = (pool.path if pool is not None else DB_PATH, start_date, end_date)
+    with _matrices_lock:
+        matrix = _matrices.get(key)
+        if matrix is None:
+            matrix = _matrices[key] = CachedMatrix(start_date, end_date)
+            while len(_matrices) > ANALYTICS_CACHE_PERIODS:
+                _matrices.popitem(last=False)
+        else:
+            _matrices.move_to_end(key)
+    return matrix
+
+def get_matrix(conn, start_date, end_date):
+    """The up-to-date AttendanceMatrix of [start_date, end_date]"""
+    start_date, end_date = check_period(start_date, end_date)
+    cached = matrix_for(conn, start_date, end_date)
+    cached.refresh(conn)
+    return cached.matrix
+
+def select_employees(conn, matrix, department=None):
+    """(active employee rows, their matrix rows), optionally of one department"""
+    np = require_numpy()
+    params = []
+    department_filter = ''
+    if department:
+        department_filter = 'AND department = ?'
+        params.append(department)
+    employees = [dict(row) for row in conn.execute(f'''
+        SELECT id, employee_id, username, first_name, last_name, department FROM employees
+        WHERE is_active = 1 {department_filter}
+        ORDER BY username
+    ''', params)]
+    rows = matrix.rows_of([employee['id'] for employee in employees])
+    kept = rows >= 0
+    return [employee for employee, keep in zip(employees, kept) if keep], rows[kept].astype(np.int64)
+
+def schedule_ends(conn, employee_ids):
+    """Scheduled end of each employee and weekday in minutes, NaN on days off"""
+    np = require_numpy()
+    schedules = load_schedules(conn, employee_ids) if employee_ids else {}
+    return np.array([
+        [float('nan') if day is None else day[1] / 60 for day in schedules[employee_id]]
+        for employee_id in employee_ids
+    ], dtype=np.float32).reshape(len(employee_ids), 7)
+
+def overtime_minutes(matrix, rows, ends):
+    """Minutes worked past the scheduled end per cell; whole days on days off"""
+    np = require_numpy()
+    worked = matrix.hours[rows] * 60
+    end = ends[:, matrix.weekdays]
+    overtime = np.where(np.isnan(end), worked, matrix.arrival[rows] + worked - end)
+    # fmax() also turns the NaN of days without a check-out into 0
+    return np.fmax(overtime, 0)
+
+def lateness_streaks(status):
+    """(longest streak, its last column, current streak) of late days per row
+
+    Days without a check-in neither extend nor break a streak.
+    """
+    np = require_numpy()
+    late = status == LATE
+    breaks = (status != ABSENT) & ~late
+    late_so_far = np.cumsum(late, axis=1, dtype=np.int32)
+    at_last_break = np.maximum.accumulate(np.where(breaks, late_so_far, 0), axis=1)
+    streak = late_so_far - at_last_break
+    if not streak.shape[1]:
+        zeros = np.zeros(len(status), dtype=np.int32)
+        return zeros, zeros, zeros
+    ends = streak.argmax(axis=1)
+    return streak.max(axis=1), ends, streak[:, -1]
+
+def employee_totals(conn, matrix, employees, rows):
+    """Per-employee sums over the period, as arrays aligned with rows"""
+    np = require_numpy()
+    status = matrix.status[rows]
+    hours = matrix.hours[rows]
+    arrival = matrix.arrival[rows]
+    overtime = overtime_minutes(matrix, rows, schedule_ends(conn, [employee['id'] for employee in employees]))
+    return {
+        'present': (status != ABSENT).sum(axis=1),
+        'late': (status == LATE).sum(axis=1),
+        'arrival_sum': np.nansum(arrival, axis=1, dtype=np.float64),
+        'arrival_count': (~np.isnan(arrival)).sum(axis=1),
+        'hours_sum': np.nansum(hours, axis=1, dtype=np.float64),
+        'hours_count': (~np.isnan(hours)).sum(axis=1),
+        'overtime_minutes': overtime.sum(axis=1, dtype=np.float64),
+        'overtime_days': (overtime > 0).sum(axis=1),
+    }
+
+def ratio(numerator, denominator):
+    np = require_numpy()
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator > 0)
+
+def employee_fields(employee):
+    return {key: employee[key] for key in ('employee_id', 'username', 'first_name', 'last_name', 'department')}
+
+def trends_report(conn, matrix, employees, rows):
+    """Late rate and overtime per week of the period"""
+    np = require_numpy()
+    status = matrix.status[rows]
+    overtime = overtime_minutes(matrix, rows, schedule_ends(conn, [employee['id'] for employee in employees]))
+    # Week of each column, counted from the Monday on or before the start
+    weeks = (np.arange(matrix.days) + int(matrix.weekdays[0])) // 7
+    present = np.bincount(weeks, weights=(status != ABSENT).sum(axis=0))
+    late = np.bincount(weeks, weights=(status == LATE).sum(axis=0))
+    overtime_hours = np.bincount(weeks, weights=overtime.sum(axis=0, dtype=np.float64)) / 60
+    late_rate = ratio(late, present)
+    first_monday = matrix.start_date - timedelta(days=int(matrix.weekdays[0]))
+    return [{
+        'week_start': str(first_monday + timedelta(weeks=week)),
+        'check_ins': int(present[week]),
+        'late_days': int(late[week]),
+        'late_rate': rounded(late_rate[week] * 100, 1),
+        'overtime_hours': rounded(overtime_hours[week], 1),
+    } for week in range(len(present))]
+
+def streaks_report(conn, matrix, employees, rows):
+    """Lateness streaks per employee, longest first"""
+    status = matrix.status[rows]
+    longest, ends, current = lateness_streaks(status)
+    late = (status == LATE).sum(axis=1)
+    present = (status != ABSENT).sum(axis=1)
+    late_rate = ratio(late, present)
+    report = [dict(
+        employee_fields(employee),
+        longest_streak=int(longest[n]),
+        longest_streak_end=str(matrix.day(ends[n])) if longest[n] else None,
+        current_streak=int(current[n]),
+        late_days=int(late[n]),
+        days_present=int(present[n]),
+        late_rate=rounded(late_rate[n] * 100, 1),
+    ) for n, employee in enumerate(employees)]
+    report.sort(key=lambda row: (-row['longest_streak'], -row['late_days'], row['username']))
+    return report
+
+def weekdays_report(conn, matrix, employees, rows):
+    """Average arrival per weekday, company-wide and per employee"""
+    np = require_numpy()
+    arrival = matrix.arrival[rows]
+    present = ~np.isnan(arrival)
+    # One-hot weekday of each column: sums per weekday are a matrix product
+    weekday_columns = (matrix.weekdays[:, None] == np.arange(7)).astype(np.float64)
+    sums = np.where(present, arrival, 0).astype(np.float64) @ weekday_columns
+    counts = present.astype(np.float64) @ weekday_columns
+    # Labelled in one pass, then cut back into rows of seven
+    labels = minutes_labels(ratio(sums, counts))
+    company = ratio(sums.sum(axis=0), counts.sum(axis=0))
+    return {
+        'weekdays': list(WEEKDAYS),
+        'company': minutes_labels(company),
+        'check_ins': [int(value) for value in counts.sum(axis=0)],
+        'employees': [dict(
+            employee_fields(employee),
+            arrivals=labels[n * 7:n * 7 + 7],
+        ) for n, employee in enumerate(employees)],
+    }
+
+def overtime_report(conn, matrix, employees, rows):
+    """Hours past the scheduled end per employee, most first"""
+    totals = employee_totals(conn, matrix, employees, rows)
+    average_hours = ratio(totals['hours_sum'], totals['hours_count'])
+    report = [dict(
+        employee_fields(employee),
+        overtime_hours=rounded(totals['overtime_minutes'][n] / 60, 1),
+        overtime_days=int(totals['overtime_days'][n]),
+        days_present=int(totals['present'][n]),
+        hours_worked=rounded(totals['hours_sum'][n], 1),
+        avg_hours=rounded(average_hours[n], 2),
+    ) for n, employee in enumerate(employees)]
+    report.sort(key=lambda row: (-row['overtime_hours'], row['username']))
+    return report
+
+def departments_report(conn, matrix, employees, rows):
+    """Attendance, lateness, arrival, hours and overtime per department"""
+    np = require_numpy()
+    totals = employee_totals(conn, matrix, employees, rows)
+    longest, _, _ = lateness_streaks(matrix.status[rows])
+    names, groups = np.unique(np.array([employee['department'] or '' for employee in employees], dtype=object),
+                              return_inverse=True)
+
+    def by_department(values):
+        return np.bincount(groups, weights=values, minlength=len(names))
+    headcount = np.bincount(groups, minlength=len(names))
+    present = by_department(totals['present'])
+    late_rate = ratio(by_department(totals['late']), present)
+    arrival = minutes_labels(ratio(by_department(totals['arrival_sum']), by_department(totals['arrival_count'])))
+    hours = ratio(by_department(totals['hours_sum']), by_department(totals['hours_count']))
+    overtime = ratio(by_department(totals['overtime_minutes']) / 60, headcount)
+    longest_streak = np.zeros(len(names), dtype=np.int64)
+    np.maximum.at(longest_streak, groups, longest)
+    return [{
+        'department': str(name),
+        'employees': int(headcount[n]),
+        'days_present': rounded(ratio(present[n], headcount[n]), 1),
+        'late_rate': rounded(late_rate[n] * 100, 1),
+        'avg_arrival': arrival[n],
+        'avg_hours': rounded(hours[n], 2),
+        'overtime_hours': rounded(overtime[n], 1),
+        'longest_streak': int(longest_streak[n]),
+    } for n, name in enumerate(names)]
+
+REPORTS = {
+    'trends': trends_report,
+    'streaks': streaks_report,
+    'weekdays': weekdays_report,
+    'overtime': overtime_report,
+    'departments': departments_report,
+}
+
+def attendance_report(conn, view, start_date, end_date, department=None):
+    """One analytics view of a period as JSON-ready data
+
+    Raises ValueError for an unknown view or an invalid period and
+    RuntimeError when numpy is not installed.
+    """
+    if view not in REPORTS:
+        raise ValueError(f'Unknown analytics view: {view}')
+    matrix = get_matrix(conn, start_date, end_date)
+    employees, rows = select_employees(conn, matrix, department)
+    return {
+        'view': view,
+        'start_date': str(matrix.start_date),
+        'end_date': str(matrix.end_date),
+        'department': department,
+        'employees': len(employees),
+        'data': REPORTS[view](conn, matrix, employees, rows),
+    }
\ No newline at end of file
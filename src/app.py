@@ -1,33 +1,44 @@
 """Main Flask application"""
+import gc
 from flask import Flask, session
 from flask_cors import CORS
-from .config import SECRET_KEY, CORS_ORIGINS, TRANSLATIONS
-from .database import init_db
+from .config import (
+    SECRET_KEY, CORS_ORIGINS, TRANSLATIONS, TEMPLATE_FOLDER, STATIC_FOLDER, INSTRUMENTATION_ENABLED,
+    JOB_WORKER_THREAD, TRUSTED_PROXY_COUNT
+)
+from .database import init_db, close_db, close_pools, get_db_connection
+from .i18n import get_catalog, get_language
+from .rates import get_rate_index
+from .templating import init_templates
+from .tenants import tenants_enabled, init_tenants
 from .routes.main_routes import main_bp
 from .routes.auth_routes import auth_bp
 from .routes.checkin_routes import checkin_bp
 from .routes.billing_routes import billing_bp
 from .routes.admin_routes import admin_bp
+from .routes.ingest_routes import ingest_bp
 
 def create_app():
     """Application factory"""
-    app = Flask(__name__, template_folder='/app/templates', static_folder='/app/static')
+    app = Flask(__name__, template_folder=TEMPLATE_FOLDER, static_folder=STATIC_FOLDER)
     app.secret_key = SECRET_KEY
     
+    # Behind nginx every request comes from the proxy's address: take the
+    # client's from the X-Forwarded-For entry the trusted proxy added
+    if TRUSTED_PROXY_COUNT:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+    
     # Configure CORS
     CORS(app, origins=CORS_ORIGINS, supports_credentials=True)
     
-    # Language support
-    def get_language():
-        return session.get('language', 'fr')
-
-    def get_text(key):
-        lang = get_language()
-        return TRANSLATIONS.get(lang, {}).get(key, TRANSLATIONS['en'].get(key, key))
-
+    # Compiled templates shared between workers, cached static fragments
+    init_templates(app)
+    
+    # Language support: one catalog lookup per get_text() call
     @app.context_processor
     def inject_language():
-        return {'get_text': get_text, 'current_lang': get_language()}
+        return {'get_text': get_catalog().__getitem__, 'current_lang': get_language()}
     
     @app.route('/set_language/<language>')
     def set_language(language):
@@ -36,8 +47,25 @@ def create_app():
             session['language'] = language
         return redirect(request.referrer or url_for('main.dashboard'))
     
-    # Initialize database
-    init_db()
+    if INSTRUMENTATION_ENABLED:
+        from .instrumentation import init_instrumentation
+        init_instrumentation(app)
+    
+    # Initialize database; tenant databases are migrated when first opened
+    if tenants_enabled():
+        init_tenants(app)
+    else:
+        init_db()
+    app.teardown_appcontext(close_db)
+    
+    if JOB_WORKER_THREAD:
+        from .jobs import start_worker_thread
+        
+        # Started by the first request, so that it runs in the worker and
+        # not in a gunicorn master that preloaded the app
+        @app.before_request
+        def ensure_job_worker():
+            start_worker_thread()
     
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -45,5 +73,31 @@ def create_app():
     app.register_blueprint(checkin_bp)
     app.register_blueprint(billing_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(ingest_bp)
     
-    return app
\ No newline at end of file
+    return app
+
+def warm_app(app):
+    """Load what requests need up front, once for all workers
+
+    With gunicorn's preload_app the master calls this after create_app(),
+    so workers are forked with every template compiled and the rate index
+    loaded, and share those pages copy-on-write instead of building them on
+    their first requests.
+    """
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    if not tenants_enabled():
+        with app.app_context():
+            get_rate_index(get_db_connection())
+
+def prepare_fork():
+    """Make the preloaded master safe to fork (gunicorn pre_fork hook)
+
+    Connections opened while loading the app are closed so that no worker
+    inherits a database handle, and the loaded objects are frozen out of
+    the garbage collector so collections in the workers don't touch, and
+    thereby copy, the shared pages.
+    """
+    close_pools()
+    gc.freeze()
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""Monthly archives of old check-ins
+
+Closed months are moved out of the checkins table into one compact SQLite
+file each, <archive dir>/checkins-YYYY-MM.db, listed in checkin_archives.
+The hot table keeps the last ARCHIVE_KEEP_MONTHS months, so its indexes,
+purges and deletions stay small whatever the history. Range readers
+(billing, exports, the admin log) go through checkin_partitions(), which
+attaches the archives overlapping the range one at a time.
+
+Archived months are read-only. Their day rollups stay in
+attendance_rollups and stand in for their check-ins when a week or month
+is re-aggregated; ingested events for them are rejected and status
+re-evaluations leave them as they were. `restore` moves a month back into
+the hot table.
+
+SQLite only. The archive directory is ARCHIVE_DIR, or archive/ next to the
+database, followed by the database name, so every tenant has its own.
+
+Usage:
+    python -m src.archive list    [--db checkin_system.db]
+    python -m src.archive archive [2024-01 ...] [--keep-months 3] [--db checkin_system.db]
+    python -m src.archive restore 2024-01 [--db checkin_system.db]
+    python -m src.archive verify  [--db checkin_system.db]
+    python -m src.archive compact [--db checkin_system.db]
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from .config import ARCHIVE_DIR, ARCHIVE_KEEP_MONTHS, DB_BUSY_TIMEOUT_MS, DB_PATH
+from .dialects import SQLITE, dialect_of
+from .live import publish_event
+
+MONTH = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+CHECKIN_COLUMNS = 'id, employee_id, check_in_time, check_out_time, date, status, notes, created_at, worked_hours'
+
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE checkins (
+        id INTEGER PRIMARY KEY,
+        employee_id INTEGER NOT NULL,
+        check_in_time TIMESTAMP,
+        check_out_time TIMESTAMP,
+        date DATE NOT NULL,
+        status TEXT,
+        notes TEXT,
+        created_at TIMESTAMP,
+        worked_hours REAL
+    )
+'''
+
+# The log order and the per-employee covering index, as in the hot table
+ARCHIVE_INDEXES = (
+    'CREATE INDEX idx_checkins_log ON checkins (date, check_in_time, id)',
+    '''CREATE INDEX idx_checkins_employee_date_cover
+       ON checkins (employee_id, date, status, check_in_time, check_out_time, worked_hours)''',
+)
+
+def check_month(month):
+    if not MONTH.match(month):
+        raise ValueError(f'Invalid month {month!r} (YYYY-MM)')
+    return month
+
+def month_bounds(month):
+    """First and last day of a YYYY-MM month as ISO dates"""
+    year, number = int(month[:4]), int(month[5:7])
+    return f'{month}-01', f'{month}-{monthrange(year, number)[1]:02d}'
+
+def shift_day(day, days):
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+def database_file(conn):
+    """Path of the connection's main database file ('' when in memory)"""
+    for row in conn.execute('PRAGMA database_list'):
+        if row[1] == 'main':
+            return row[2]
+    return ''
+
+def archive_dir(conn):
+    """Directory holding the archives of the connection's database"""
+    path = database_file(conn)
+    base = ARCHIVE_DIR or os.path.join(os.path.dirname(path), 'archive')
+    return os.path.join(base, os.path.splitext(os.path.basename(path))[0])
+
+def archived_months(conn, start_date=None, end_date=None):
+    """(month, file) of the archived months overlapping a date range, in order"""
+    return [tuple(row) for row in conn.execute('''
+        SELECT month, file FROM checkin_archives
+        WHERE month BETWEEN ? AND ?
+        ORDER BY month
+    ''', (str(start_date)[:7] if start_date else '0000-00', str(end_date)[:7] if end_date else '9999-99'))]
+
+def archived_ranges(conn, start_date, end_date):
+    """(first, last) ISO days of [start_date, end_date] that lie in archived months"""
+    start, end = str(start_date), str(end_date)
+    ranges = []
+    for month, _ in archived_months(conn, start, end):
+        first, last = month_bounds(month)
+        ranges.append((max(first, start), min(last, end)))
+    return ranges
+
+def attach_archive(conn, month, file):
+    """Attach one month's archive, returning its schema name"""
+    schema = 'archive_' + month.replace('-', '_')
+    path = os.path.join(archive_dir(conn), file)
+    if not os.path.exists(path):
+        raise RuntimeError(f'Archive of {month} is missing: {path}')
+    # Left attached by a reader that was interrupted
+    detach_archive(conn, schema)
+    conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+    return schema
+
+def detach_archive(conn, schema):
+    if any(row[1] == schema for row in conn.execute('PRAGMA database_list')):
+        conn.execute(f'DETACH DATABASE {schema}')
+
+def checkin_partitions(conn, start_date=None, end_date=None, descending=False):
+    """Yield (table, first, last) for each partition of the check-ins in a range
+
+    table is checkins or an archive's checkins, and first and last are
+    the ISO dates of the range that it holds (None for an open end).
+    Partitions come in date order, newest first when descending. An archive
+    is attached while its partition is read and detached when the next one
+    is requested, so its rows must be fetched before moving on.
+    """
+    start = str(start_date) if start_date else None
+    end = str(end_date) if end_date else None
+    partitions = []
+    hot_first = start
+    for month, file in archived_months(conn, start, end):
+        first, last = month_bounds(month)
+        before = shift_day(first, -1)
+        if hot_first is None or hot_first <= before:
+            partitions.append((None, None, hot_first, before))
+        partitions.append((month, file, max(first, start or first), min(last, end or last)))
+        hot_first = shift_day(last, 1)
+    if hot_first is None or end is None or hot_first <= end:
+        partitions.append((None, None, hot_first, end))
+    if descending:
+        partitions.reverse()
+
+    for month, file, first, last in partitions:
+        if month is None:
+            yield 'checkins', first, last
+            continue
+        schema = attach_archive(conn, month, file)
+        try:
+            yield f'{schema}.checkins', first, last
+        finally:
+            detach_archive(conn, schema)
+
+def checksum_rows(rows):
+    """(row count, SHA-256) of check-in rows read in id order"""
+    digest = hashlib.sha256()
+    count = 0
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+        count += 1
+    return count, digest.hexdigest()
+
+def build_archive(source, path, first, last):
+    """Copy the check-ins of [first, last] from source into a new SQLite file
+
+    Rows are inserted in id order before the indexes are built and the
+    file is vacuumed, so it has no free pages. Returns the row count and
+    checksum of what was written.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    archive = sqlite3.connect(path)
+    try:
+        # Written once by this connection and discarded on failure
+        archive.execute('PRAGMA journal_mode = OFF')
+        archive.execute(ARCHIVE_SCHEMA)
+        archive.execute('ATTACH DATABASE ? AS source', (source,))
+        archive.execute(f'''
+            INSERT INTO checkins SELECT {CHECKIN_COLUMNS} FROM source.checkins
+            WHERE date BETWEEN ? AND ? ORDER BY id
+        ''', (first, last))
+        archive.commit()
+        archive.execute('DETACH DATABASE source')
+        for sql in ARCHIVE_INDEXES:
+            archive.execute(sql)
+        archive.execute('ANALYZE')
+        archive.commit()
+        archive.execute('VACUUM')
+        return checksum_rows(archive.execute(f'SELECT {CHECKIN_COLUMNS} FROM checkins ORDER BY id'))
+    finally:
+        archive.close()
+
+def check_sqlite(conn):
+    if dialect_of(conn) is not SQLITE or not database_file(conn):
+        raise ValueError('Archives need a SQLite database file')
+
+def archive_month(conn, month):
+    """Move one closed month's check-ins into its archive, returning the row count
+
+    The file is built and checked first; the check-ins are deleted in the
+    transaction that lists the archive, and only if they still match it.
+    """
+    check_sqlite(conn)
+    check_month(month)
+    if month >= date.today().strftime('%Y-%m'):
+        raise ValueError(f'{month} is not a closed month')
+    if conn.execute('SELECT 1 FROM checkin_archives WHERE month = ?', (month,)).fetchone():
+        raise ValueError(f'{month} is already archived')
+    first, last = month_bounds(month)
+
+    directory = archive_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    file = f'checkins-{month}.db'
+    path = os.path.join(directory, file)
+    archived = build_archive(database_file(conn), path + '.part', first, last)
+    if not archived[0]:
+        os.unlink(path + '.part')
+        raise ValueError(f'No check-ins in {month}')
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = checksum_rows(conn.execute(f'''
+            SELECT {CHECKIN_COLUMNS} FROM checkins WHERE date BETWEEN ? AND ? ORDER BY id
+        ''', (first, last)))
+        if current != archived:
+            raise RuntimeError(f'Check-ins of {month} changed while archiving, run again')
+        os.replace(path + '.part', path)
+        conn.execute('''
+            INSERT INTO checkin_archives (month, file, row_count, checksum, archived_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (month, file, archived[0], archived[1], datetime.now().isoformat(' ', 'seconds')))
+        conn.execute('DELETE FROM checkins WHERE date BETWEEN ? AND ?', (first, last))
+        publish_event(conn, 'reset', None, date.today())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        for leftover in (path + '.part', path):
+            if os.path.exists(leftover):
+                os.unlink(leftover)
+        raise
+    return archived[0]
+
+def restore_month(conn, month):
+    """Move an archived month back into the hot table, returning the row count"""
+    check_sqlite(conn)
+    row = conn.execute('SELECT file FROM checkin_archives WHERE month = ?', (check_month(month),)).fetchone()
+    if row is None:
+        raise ValueError(f'{month} is not archived')
+    schema = attach_archive(conn, month, row[0])
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(f'''
+                INSERT INTO checkins ({CHECKIN_COLUMNS})
+                SELECT {CHECKIN_COLUMNS} FROM {schema}.checkins ORDER BY id
+            ''').rowcount
+            conn.execute('DELETE FROM checkin_archives WHERE month = ?', (month,))
+            publish_event(conn, 'reset', None, date.today())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        detach_archive(conn, schema)
+    os.unlink(os.path.join(archive_dir(conn), row[0]))
+    return count
+
+def open_archive(conn, file):
+    return sqlite3.connect(os.path.join(archive_dir(conn), file), timeout=DB_BUSY_TIMEOUT_MS / 1000)
+
+def delete_archived_employee(conn, employee_id):
+    """Delete an employee's check-ins from every archive, returning the count
+
+    Each archive is rewritten and its catalog entry updated in turn; an
+    interrupted run is completed by running it again.
+    """
+    deleted = 0
+    for month, file, row_count in conn.execute(
+            'SELECT month, file, row_count FROM checkin_archives ORDER BY month').fetchall():
+        archive = open_archive(conn, file)
+        try:
+            count = archive.execute('DELETE FROM checkins WHERE employee_id = ?', (employee_id,)).rowcount
+            archive.commit()
+            remaining = archive.execute('SELECT COUNT(*) FROM checkins').fetchone()[0]
+            if remaining == row_count:
+                continue
+            rows, checksum = checksum_rows(archive.execute(f'SELECT {CHECKIN_COLUMNS} FROM checkins ORDER BY id'))
+        finally:
+            archive.close()
+        conn.execute('UPDATE checkin_archives SET row_count = ?, checksum = ? WHERE month = ?',
+                     (rows, checksum, month))
+        conn.commit()
+        deleted += count
+    return deleted
+
+def add_worked_hours(conn):
+    """Add worked_hours to archives written before it existed (migration 11)
+
+    Archived days had a single session, from check-in to check-out. The
+    catalog checksums, which cover the new column, are updated in the
+    caller's transaction; archives already upgraded are only checksummed.
+    """
+    for month, file in archived_months(conn):
+        path = os.path.join(archive_dir(conn), file)
+        if not os.path.exists(path):
+            # Reported by verify()
+            continue
+        archive = sqlite3.connect(path)
+        try:
+            if 'worked_hours' not in [row[1] for row in archive.execute('PRAGMA table_info(checkins)')]:
+                archive.execute('ALTER TABLE checkins ADD COLUMN worked_hours REAL')
+                archive.execute(f"UPDATE checkins SET worked_hours = {SQLITE.exact_hours_between('check_in_time', 'check_out_time')}")
+                archive.execute('DROP INDEX IF EXISTS idx_checkins_employee_date_cover')
+                archive.execute(ARCHIVE_INDEXES[1])
+                archive.commit()
+            _, checksum = checksum_rows(archive.execute(f'SELECT {CHECKIN_COLUMNS} FROM checkins ORDER BY id'))
+        finally:
+            archive.close()
+        conn.execute('UPDATE checkin_archives SET checksum = ? WHERE month = ?', (checksum, month))
+
+def unlist_archives(conn):
+    """Remove every archive from the catalog in the caller's transaction
+
+    Returns the archive files, to delete once committed, and the number of
+    check-ins they hold.
+    """
+    directory = archive_dir(conn) if dialect_of(conn) is SQLITE else ''
+    rows = conn.execute('DELETE FROM checkin_archives RETURNING file, row_count').fetchall()
+    return [os.path.join(directory, row[0]) for row in rows], sum(row[1] for row in rows)
+
+def months_to_archive(conn, keep_months=ARCHIVE_KEEP_MONTHS):
+    """Months with hot check-ins older than the last keep_months (the current one included)"""
+    if keep_months < 1:
+        raise ValueError('keep_months must be at least 1')
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - (keep_months - 1)
+    cutoff = date(index // 12, index % 12 + 1, 1).isoformat()
+    return [row[0] for row in conn.execute('''
+        SELECT DISTINCT substr(date, 1, 7) FROM checkins WHERE date < ? ORDER BY 1
+    ''', (cutoff,))]
+
+def verify(conn):
+    """Check every archive against its catalog entry, returning a list of problems"""
+    check_sqlite(conn)
+    problems = []
+    directory = archive_dir(conn)
+    listed = set()
+    for month, file, row_count, checksum in conn.execute(
+            'SELECT month, file, row_count, checksum FROM checkin_archives ORDER BY month').fetchall():
+        listed.add(file)
+        if not os.path.exists(os.path.join(directory, file)):
+            problems.append(f'{month}: {file} is missing')
+            continue
+        first, last = month_bounds(month)
+        archive = open_archive(conn, file)
+        try:
+            result = archive.execute('PRAGMA quick_check').fetchone()[0]
+            if result != 'ok':
+                problems.append(f'{month}: quick_check: {result}')
+            outside = archive.execute('SELECT COUNT(*) FROM checkins WHERE date NOT BETWEEN ? AND ?',
+                                      (first, last)).fetchone()[0]
+            found = checksum_rows(archive.execute(f'SELECT {CHECKIN_COLUMNS} FROM checkins ORDER BY id'))
+        finally:
+            archive.close()
+        if outside:
+            problems.append(f'{month}: {outside} check-ins outside the month in {file}')
+        if found != (row_count, checksum):
+            problems.append(f'{month}: {file} holds {found[0]} check-ins (checksum {found[1][:12]}), '
+                            f'catalog lists {row_count} ({checksum[:12]})')
+        hot = conn.execute('SELECT COUNT(*) FROM checkins WHERE date BETWEEN ? AND ?', (first, last)).fetchone()[0]
+        if hot:
+            problems.append(f'{month}: {hot} check-ins left in the hot table')
+    if os.path.isdir(directory):
+        for name in sorted(set(os.listdir(directory)) - listed):
+            problems.append(f'{name}: not listed in checkin_archives')
+    return problems
+
+def compact(conn):
+    """VACUUM every archive and the hot database, returning (bytes before, bytes after)"""
+    check_sqlite(conn)
+    directory = archive_dir(conn)
+    paths = [database_file(conn)] + [os.path.join(directory, row[0])
+                                     for row in conn.execute('SELECT file FROM checkin_archives')]
+    before = sum(os.path.getsize(path) for path in paths)
+    for path in paths[1:]:
+        archive = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        try:
+            archive.execute('VACUUM')
+            archive.execute('PRAGMA optimize')
+        finally:
+            archive.close()
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA optimize')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return before, sum(os.path.getsize(path) for path in paths)
+
+def main(argv=None):
+    """Command line entry point"""
+    from .cache import invalidate_all
+    from .database import get_pool
+
+    parser = argparse.ArgumentParser(prog='python -m src.archive', description='Archive closed months of check-ins')
+    parser.add_argument('command', choices=['list', 'archive', 'restore', 'verify', 'compact'])
+    parser.add_argument('months', nargs='*', help='YYYY-MM (archive: default every month before the kept ones)')
+    parser.add_argument('--keep-months', type=int, default=ARCHIVE_KEEP_MONTHS,
+                        help='months kept in the hot table, the current one included (default: %(default)s)')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    conn = get_pool(args.db).acquire()
+    try:
+        check_sqlite(conn)
+        if args.command == 'list':
+            directory = archive_dir(conn)
+            print(f'Archives in {directory}')
+            for month, file, row_count, archived_at in conn.execute(
+                    'SELECT month, file, row_count, archived_at FROM checkin_archives ORDER BY month'):
+                path = os.path.join(directory, file)
+                size = f'{os.path.getsize(path) / 1024:.0f} KB' if os.path.exists(path) else 'missing'
+                print(f'  {month}  {row_count:>9} check-ins  {size:>10}  archived {archived_at}')
+        elif args.command == 'archive':
+            for month in args.months or months_to_archive(conn, args.keep_months):
+                print(f'{month}: {archive_month(conn, month)} check-ins archived')
+            invalidate_all()
+        elif args.command == 'restore':
+            if not args.months:
+                parser.error('restore needs the months to restore')
+            for month in args.months:
+                print(f'{month}: {restore_month(conn, month)} check-ins restored')
+            invalidate_all()
+        elif args.command == 'verify':
+            problems = verify(conn)
+            for problem in problems:
+                print(f'FAIL {problem}')
+            if problems:
+                return 1
+            print(f'{args.db}: archives OK')
+        elif args.command == 'compact':
+            before, after = compact(conn)
+            print(f'{before / 1048576:.1f} MB -> {after / 1048576:.1f} MB')
+    except ValueError as error:
+        parser.error(str(error))
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
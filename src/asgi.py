@@ -0,0 +1,220 @@
+"""ASGI application for the async serving mode
+
+The hot endpoints (/api/status, /checkin, /checkout and /api/billing) are
+served by native coroutines that wait on src/async_db.py instead of holding
+a worker, and /admin/live/stream keeps its Server-Sent Events stream open
+on the event loop. Every other path is passed to the Flask app through asgiref's WSGI
+adapter. Both modes come from the same create_app(), share its session
+cookie and run the same attendance and billing functions.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+from flask import url_for
+from itsdangerous import BadSignature
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import parse_cookie, dump_cookie
+from .app import create_app
+from .async_db import run_db, shutdown_executor
+from .attendance import check_in_employee, check_out_employee, get_status
+from .config import LIVE_POLL_SECONDS, LIVE_RETRY_MS, LIVE_HEARTBEAT_SECONDS
+from .live import get_live_hub, format_sse
+from .routes.admin_routes import parse_last_event_id
+from .routes.billing_routes import resolve_billing_period, get_billing_data, billing_data_to_json
+from .tenants import tenants_enabled, resolve_tenant, tenant_exists, set_current_tenant
+
+class AsyncRequest:
+    """The parts of an HTTP scope the async handlers need"""
+
+    def __init__(self, scope, session, receive):
+        self.scope = scope
+        self.session = session
+        self.receive = receive
+        self.headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                                for name, value in scope.get('headers', [])])
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.session_modified = False
+
+    def flash(self, message, category='message'):
+        """Queue a flash message the same way flask.flash does"""
+        self.session.setdefault('_flashes', []).append((category, message))
+        self.session_modified = True
+
+class AsyncApp:
+    """ASGI callable routing hot paths to coroutines and the rest to Flask"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        with flask_app.test_request_context():
+            self.login_url = url_for('auth.login')
+            self.dashboard_url = url_for('main.dashboard')
+        self.routes = {
+            ('GET', '/api/status'): self.api_status,
+            ('POST', '/checkin'): self.check_in,
+            ('POST', '/checkout'): self.check_out,
+            ('GET', '/api/billing'): self.api_billing,
+            ('GET', '/admin/live/stream'): self.live_stream
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = None
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            return await self.wsgi_app(scope, receive, send)
+
+        await self.drain_body(receive)
+        request = AsyncRequest(scope, self.load_session(scope), receive)
+        if tenants_enabled():
+            # Each request runs in its own task, so the tenant stays local to it
+            tenant = resolve_tenant(request.headers.get('host'), request.headers)
+            if not tenant_exists(tenant):
+                return await self.send_response(send, 404, b'', [('content-length', '0')])
+            set_current_tenant(tenant)
+            if request.session.get('tenant') != tenant:
+                request.session = {}
+        if 'employee_id' not in request.session:
+            return await self.send_redirect(send, self.login_url)
+        return await handler(request, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                shutdown_executor()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def drain_body(receive):
+        """Consume the request body (the form posts carry no fields we use)"""
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message.get('more_body', False)
+
+    # Session cookie, compatible with Flask's SecureCookieSessionInterface
+
+    def load_session(self, scope):
+        cookies = {}
+        for name, value in scope.get('headers', []):
+            if name == b'cookie':
+                cookies.update(parse_cookie(value.decode('latin-1')))
+        value = cookies.get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not value:
+            return {}
+        max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+        try:
+            return self.session_serializer.loads(value, max_age=max_age)
+        except BadSignature:
+            return {}
+
+    def session_cookie(self, session):
+        config = self.flask_app.config
+        return dump_cookie(
+            config['SESSION_COOKIE_NAME'],
+            self.session_serializer.dumps(dict(session)),
+            path=config['SESSION_COOKIE_PATH'] or '/',
+            domain=config['SESSION_COOKIE_DOMAIN'] or None,
+            secure=config['SESSION_COOKIE_SECURE'],
+            httponly=config['SESSION_COOKIE_HTTPONLY'],
+            samesite=config['SESSION_COOKIE_SAMESITE']
+        )
+
+    # Responses
+
+    @staticmethod
+    async def send_response(send, status, body, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def send_json(self, send, data, status=200):
+        body = json.dumps(data).encode()
+        await self.send_response(send, status, body, [
+            ('content-type', 'application/json'),
+            ('content-length', str(len(body)))
+        ])
+
+    async def send_redirect(self, send, location, request=None):
+        headers = [('location', location), ('content-length', '0')]
+        if request is not None and request.session_modified:
+            headers.append(('set-cookie', self.session_cookie(request.session)))
+        await self.send_response(send, 302, b'', headers)
+
+    # Handlers
+
+    async def api_status(self, request, send):
+        status = await run_db(get_status, request.session['employee_id'])
+        await self.send_json(send, status)
+
+    async def check_in(self, request, send):
+        _, message = await run_db(check_in_employee, request.session['employee_id'])
+        request.flash(message)
+        await self.send_redirect(send, self.dashboard_url, request)
+
+    async def check_out(self, request, send):
+        _, message = await run_db(check_out_employee, request.session['employee_id'])
+        request.flash(message)
+        await self.send_redirect(send, self.dashboard_url, request)
+
+    async def api_billing(self, request, send):
+        try:
+            _, start_date, end_date = resolve_billing_period(request.args)
+        except ValueError:
+            return await self.send_json(send, {'error': 'invalid period'}, status=400)
+        billing_data = await run_db(get_billing_data, request.session['employee_id'], start_date, end_date)
+        await self.send_json(send, billing_data_to_json(billing_data))
+
+    async def live_stream(self, request, send):
+        if request.session.get('username') != 'admin':
+            request.flash('Admin access required')
+            return await self.send_redirect(send, self.dashboard_url, request)
+
+        live_hub = get_live_hub()
+        await run_db(live_hub.board.refresh, max_age=LIVE_POLL_SECONDS)
+        queue = live_hub.subscribe(parse_last_event_id(request.headers.get('last-event-id')))
+        # The body was drained, so the next message is the disconnect
+        disconnected = asyncio.ensure_future(request.receive())
+        getter = None
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]
+            })
+            await send({'type': 'http.response.body', 'body': f'retry: {LIVE_RETRY_MS}\n\n'.encode(),
+                        'more_body': True})
+            while True:
+                getter = getter or asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, disconnected}, timeout=LIVE_HEARTBEAT_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    break
+                if getter in done:
+                    message = format_sse(getter.result())
+                    getter = None
+                else:
+                    message = ': keep-alive\n\n'
+                await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+        finally:
+            live_hub.unsubscribe(queue)
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
+
+def create_asgi_app():
+    """Build the ASGI application from the shared Flask configuration"""
+    return AsyncApp(create_app())
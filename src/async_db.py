@@ -0,0 +1,44 @@
+"""Async database access for the ASGI handlers
+
+Database calls block, so coroutines hand them to a bounded thread pool. Each
+call runs the same synchronous query functions the WSGI routes use, on a
+connection taken from the process pool for the duration of the call. The
+caller's context variables, such as the current tenant, follow the call.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .config import ASYNC_DB_THREADS
+from .database import current_pool
+
+_executor = None
+
+def get_executor():
+    """Thread pool shared by all async database calls of this process"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix='async-db')
+    return _executor
+
+def _call_with_connection(func, args, kwargs):
+    conn = current_pool().acquire()
+    try:
+        return func(conn, *args, **kwargs)
+    finally:
+        conn.close()
+
+async def run_db(func, *args, **kwargs):
+    """Await func(conn, *args, **kwargs) run on the database thread pool"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, _call_with_connection, func, args, kwargs)
+    )
+
+def shutdown_executor():
+    """Stop the thread pool (ASGI lifespan shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,256 @@
+"""Attendance operations shared by the WSGI routes and the ASGI handlers"""
+from datetime import datetime, date
+from .archive import checkin_partitions
+from .cache import cached, employee_day_key, employee_recent_key, invalidate_employee_day
+from .rollups import refresh_rollups
+from .live import publish_event
+from .occupancy import (already_checked_in, close_session, employee_department, get_open_session, index_for,
+                        open_session, session_hours)
+from .schedules import DEFAULT_SCHEDULE, arrival_status, get_schedule, is_early_leave
+
+RECENT_CHECKINS_LIMIT = 7
+
+def get_day_checkin(conn, employee_id, day):
+    """An employee's check-in record for one day, as a dict or None"""
+    def load(conn):
+        row = conn.execute(
+            'SELECT * FROM checkins WHERE employee_id = ? AND date = ?',
+            (employee_id, day)
+        ).fetchone()
+        return dict(row) if row else None
+    return cached(conn, employee_day_key(employee_id, day), load)
+
+def get_recent_checkins(conn, employee_id):
+    """An employee's most recent check-in records (last 7 days)"""
+    def load(conn):
+        rows = conn.execute('''
+            SELECT * FROM checkins 
+            WHERE employee_id = ? 
+            ORDER BY date DESC 
+            LIMIT ?
+        ''', (employee_id, RECENT_CHECKINS_LIMIT)).fetchall()
+        return [dict(row) for row in rows]
+    return cached(conn, employee_recent_key(employee_id), load)
+
+def get_status(conn, employee_id, day=None):
+    """Today's check-in status as served by /api/status"""
+    checkin_today = get_day_checkin(conn, employee_id, day or date.today())
+    return {
+        'checked_in': bool(checkin_today and checkin_today['check_in_time']),
+        'checked_out': bool(checkin_today and checkin_today['check_out_time']),
+        'check_in_time': checkin_today['check_in_time'] if checkin_today else None,
+        'check_out_time': checkin_today['check_out_time'] if checkin_today else None,
+        'status': checkin_today['status'] if checkin_today else None
+    }
+
+def checkin_status(moment, schedule=DEFAULT_SCHEDULE):
+    """'on_time' or 'late' for a check-in at the given datetime"""
+    return arrival_status(schedule, moment)
+
+def check_in_employee(conn, employee_id, now=None):
+    """Record a check-in, returning (success, message)
+
+    The check-in opens a work session (see src/occupancy.py) under BEGIN
+    IMMEDIATE: the unique index on open sessions lets exactly one of
+    concurrent requests for the same employee open it. Checking in again
+    after a check-out starts another session of the day, so the day's row
+    keeps its first check-in and loses the check-out until the next one.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    schedule = get_schedule(conn, employee_id)
+    status = checkin_status(now, schedule)
+    
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        session_id = open_session(conn, employee_id, now, schedule)
+        if session_id is None:
+            message = already_checked_in(get_open_session(conn, employee_id), today)
+            conn.rollback()
+            return False, message
+        
+        # An early leave is undone by coming back; lateness is not
+        conn.execute('''
+            INSERT INTO checkins (employee_id, check_in_time, date, status) VALUES (?, ?, ?, ?)
+            ON CONFLICT(employee_id, date) DO UPDATE SET
+                check_in_time = COALESCE(checkins.check_in_time, excluded.check_in_time),
+                check_out_time = NULL,
+                status = CASE
+                    WHEN checkins.check_in_time IS NULL THEN excluded.status
+                    WHEN checkins.status = 'early_leave' THEN 'on_time'
+                    ELSE checkins.status
+                END
+        ''', (employee_id, now, today, status))
+        department = employee_department(conn, employee_id)
+        
+        refresh_rollups(conn, employee_id, today)
+        publish_event(conn, 'check_in', employee_id, today)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    index_for(conn).opened(employee_id, session_id, now, department)
+    invalidate_employee_day(employee_id, today)
+    
+    return True, f'Checked in successfully at {now.strftime("%H:%M")}'
+
+def check_out_employee(conn, employee_id, now=None):
+    """Record a check-out, returning (success, message)
+
+    The check-out closes the open session and is the day's check-out of the
+    session's check-in day, which is the day before for a night shift. The
+    session's length is added to that day's worked_hours.
+    """
+    now = now or datetime.now()
+    
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        session = close_session(conn, employee_id, now)
+        if session is None:
+            # Only the refusal needs to know why
+            checkin_record = conn.execute(
+                'SELECT check_out_time FROM checkins WHERE employee_id = ? AND date = ?',
+                (employee_id, now.date())
+            ).fetchone()
+            conn.rollback()
+            if not checkin_record or not checkin_record['check_out_time']:
+                return False, 'Must check in first'
+            return False, 'Already checked out today'
+        
+        # Late arrivals stay 'late' when they also leave early; leaving a
+        # night shift after midnight is never early
+        day = date.fromisoformat(str(session['checkin_date']))
+        early_leave = day == now.date() and is_early_leave(get_schedule(conn, employee_id), now)
+        conn.execute('''
+            UPDATE checkins SET
+                check_out_time = ?,
+                worked_hours = COALESCE(worked_hours, 0) + ?,
+                status = CASE WHEN status = 'on_time' AND ? THEN 'early_leave' ELSE status END
+            WHERE employee_id = ? AND date = ?
+        ''', (now, session_hours(session, now), early_leave, employee_id, day))
+        
+        refresh_rollups(conn, employee_id, day)
+        publish_event(conn, 'check_out', employee_id, day)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    index_for(conn).closed(employee_id)
+    invalidate_employee_day(employee_id, day)
+    
+    return True, f'Checked out successfully at {now.strftime("%H:%M")}'
+
+def build_checkin_log_query(filters, after=None, limit=None, table='checkins'):
+    """Build the keyset-paginated check-in log query
+
+    Rows are ordered by (date, check_in_time, id) descending, which matches
+    the idx_checkins_log index and its employee/status variants, so each page
+    is an index range scan regardless of history size. Rows without a
+    check-in time come last in their date, as SQLite orders them anyway. table is checkins
+    or an archive's checkins (see get_checkin_log()).
+    """
+    where = []
+    params = []
+    
+    if filters['employee']:
+        where.append('c.employee_id = ?')
+        params.append(filters['employee'])
+    if filters['department']:
+        where.append('e.department = ?')
+        params.append(filters['department'])
+    if filters['status']:
+        where.append('c.status = ?')
+        params.append(filters['status'])
+    if filters['start_date']:
+        where.append('c.date >= ?')
+        params.append(filters['start_date'])
+    if filters['end_date']:
+        where.append('c.date <= ?')
+        params.append(filters['end_date'])
+    if after:
+        # Rows without a check-in sort last within their date
+        after_date, after_time, after_id = after
+        if after_time is None:
+            where.append('c.date <= ? AND (c.date < ? OR (c.check_in_time IS NULL AND c.id < ?))')
+            params.extend([after_date, after_date, after_id])
+        else:
+            where.append('c.date <= ? AND ((c.date, c.check_in_time, c.id) < (?, ?, ?)'
+                         ' OR (c.date = ? AND c.check_in_time IS NULL))')
+            params.extend([after_date, after_date, after_time, after_id, after_date])
+    
+    sql = f'''
+        SELECT c.*, e.first_name, e.last_name, e.employee_id as emp_id, e.department
+        FROM {table} c
+        JOIN employees e ON c.employee_id = e.id
+    '''
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY c.date DESC, c.check_in_time DESC NULLS LAST, c.id DESC'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    return sql, params
+
+def get_checkin_log(conn, filters, after=None, limit=None):
+    """One page of the check-in log
+
+    Partitions are read newest first until the page is full, so a page of
+    recent check-ins never opens an archive.
+    """
+    rows = []
+    for table, first, last in checkin_partitions(conn, filters['start_date'], filters['end_date'], descending=True):
+        sql, params = build_checkin_log_query(dict(filters, start_date=first, end_date=last), after,
+                                              limit and limit - len(rows), table)
+        rows += conn.execute(sql, params).fetchall()
+        if limit and len(rows) >= limit:
+            break
+    return rows
+
+def iter_checkin_log(conn, filters, after=None, limit=None):
+    """The check-in log read through a streaming cursor per partition, for large exports"""
+    count = 0
+    for table, first, last in checkin_partitions(conn, filters['start_date'], filters['end_date'], descending=True):
+        sql, params = build_checkin_log_query(dict(filters, start_date=first, end_date=last), after,
+                                              limit and limit - count, table)
+        cursor = conn.stream(sql, params)
+        try:
+            for row in cursor:
+                yield row
+                count += 1
+        finally:
+            cursor.close()
+        if limit and count >= limit:
+            return
+
+def delete_checkin(conn, checkin_id):
+    """Delete a check-in record, returning its (employee_id, date) or None"""
+    deleted = conn.execute(
+        'DELETE FROM checkins WHERE id = ? RETURNING employee_id, date', (checkin_id,)
+    ).fetchone()
+    if deleted:
+        conn.execute('DELETE FROM work_sessions WHERE employee_id = ? AND checkin_date = ?',
+                     (deleted['employee_id'], deleted['date']))
+        refresh_rollups(conn, deleted['employee_id'], deleted['date'])
+        publish_event(conn, 'reset', None, date.today())
+    conn.commit()
+    if deleted:
+        invalidate_employee_day(deleted['employee_id'], deleted['date'])
+    return deleted
+
+def last_checkin_id(conn):
+    """Highest check-in id so far, 0 when there is none"""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM checkins').fetchone()[0]
+
+def get_day_activity(conn, day):
+    """Every active employee with their check-in of the day, if any"""
+    return conn.execute('''
+        SELECT e.username, e.first_name, e.last_name,
+               c.check_in_time, c.check_out_time, c.status
+        FROM employees e
+        LEFT JOIN checkins c ON e.id = c.employee_id AND c.date = ?
+        WHERE e.is_active = 1
+        ORDER BY e.username
+    ''', (day,)).fetchall()
\ No newline at end of file
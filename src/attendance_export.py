@@ -0,0 +1,224 @@
+"""Attendance history export
+
+Check-ins for a date range, optionally with employee details and the rate
+in effect on each day, are read from one cursor per partition (the hot
+table and each archived month, see src/archive.py; server-side on
+PostgreSQL) in (date, check_in_time, id) index order and encoded chunk by chunk, so memory
+stays constant whatever the range. Short ranges are streamed straight to
+the browser; longer ones run on the job queue (src/jobs.py), are written
+to EXPORT_DIR and downloaded when done, so the gunicorn timeout never
+applies to them.
+
+Usage:
+    python -m src.attendance_export --start 2020-01-01 --end 2024-12-31 \
+        [--format csv|jsonl|parquet] [--gzip] [--details] [--rates] \
+        [--department IT] [--employee EMP001] [--output FILE] [--db checkin_system.db]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import zlib
+from datetime import date, datetime
+from .archive import checkin_partitions
+from .billing_export import iter_csv, iter_jsonl
+from .config import DB_PATH, EXPORT_BATCH_ROWS
+from .dialects import dialect_of
+from .rates import get_rate_index
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+BASE_COLUMNS = ['date', 'employee_id', 'check_in_time', 'check_out_time', 'status', 'hours_worked']
+DETAIL_COLUMNS = ['first_name', 'last_name', 'department', 'position']
+RATE_COLUMNS = ['hourly_rate', 'cost']
+
+def export_columns(details=False, rates=False):
+    return BASE_COLUMNS + (DETAIL_COLUMNS if details else []) + (RATE_COLUMNS if rates else [])
+
+def attendance_filter(conn, start_date, end_date, employee_codes=None, department=None):
+    """WHERE clause and parameters selecting the check-ins of an export"""
+    dialect = dialect_of(conn)
+    where = 'c.date BETWEEN :start AND :end AND (:department IS NULL OR e.department = :department)'
+    params = {'start': str(start_date), 'end': str(end_date), 'department': department}
+    if employee_codes:
+        where += f" AND {dialect.in_list('e.employee_id', ':codes')}"
+        params['codes'] = dialect.list_param(employee_codes)
+    return where, params
+
+def iter_attendance_rows(conn, start_date, end_date, employee_codes=None, department=None,
+                         details=False, rates=False):
+    """Yield one dict per check-in in the range, in date and check-in order"""
+    columns = [
+        'c.date', 'e.employee_id', 'c.check_in_time', 'c.check_out_time', 'c.status',
+        'ROUND(c.worked_hours, 4) AS hours_worked', 'c.employee_id AS employee_pk', 'c.worked_hours AS hours'
+    ]
+    if details:
+        columns += ['e.first_name', 'e.last_name', 'e.department', 'e.position']
+    rate_index = get_rate_index(conn) if rates else None
+
+    for table, first, last in checkin_partitions(conn, start_date, end_date):
+        where, params = attendance_filter(conn, first, last, employee_codes, department)
+        cursor = conn.stream(f'''
+            SELECT {', '.join(columns)}
+            FROM {table} c
+            JOIN employees e ON e.id = c.employee_id
+            WHERE {where}
+            ORDER BY c.date, c.check_in_time, c.id
+        ''', params)
+        try:
+            names = None
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                # Server-side cursors only describe their columns once rows were fetched
+                names = names or [description[0] for description in cursor.description]
+                for row in rows:
+                    row = dict(zip(names, row))
+                    employee_pk = row.pop('employee_pk')
+                    hours = row.pop('hours')
+                    if rate_index is not None:
+                        row['hourly_rate'] = rate_index.rate_at(employee_pk, row['date'])
+                        row['cost'] = round(hours * row['hourly_rate'], 2) if hours is not None else None
+                    yield row
+        finally:
+            cursor.close()
+
+def iter_parquet(rows, columns, compression='snappy'):
+    """Parquet needs its footer written last, so build it in a temporary file and stream that"""
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        write_parquet(rows, columns, path, compression)
+        yield from iter_file(path)
+    finally:
+        os.unlink(path)
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+    return pyarrow
+
+def check_export_format(export_format):
+    """RuntimeError if the optional package export_format needs is missing
+
+    Called before a response starts streaming, which cannot report errors.
+    """
+    if export_format == 'parquet':
+        require_pyarrow()
+
+def write_parquet(rows, columns, path, compression='snappy'):
+    """Write rows to a Parquet file one row group per EXPORT_BATCH_ROWS"""
+    pyarrow = require_pyarrow()
+
+    types = {'hours_worked': pyarrow.float64(), 'hourly_rate': pyarrow.float64(), 'cost': pyarrow.float64()}
+    schema = pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in columns])
+    with pyarrow.parquet.ParquetWriter(path, schema, compression=compression) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+
+def iter_file(path):
+    with open(path, 'rb') as export_file:
+        while True:
+            chunk = export_file.read(65536)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_gzip(chunks):
+    """Compress text or byte chunks into a gzip stream on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_export(rows, export_format, columns, gzip=False):
+    """Encode rows in the requested format; Parquet compresses internally with gzip"""
+    if export_format == 'parquet':
+        return iter_parquet(rows, columns, 'gzip' if gzip else 'snappy')
+    chunks = iter_jsonl(rows) if export_format == 'jsonl' else iter_csv(rows, columns)
+    return iter_gzip(chunks) if gzip else chunks
+
+def export_filename(start_date, end_date, export_format, gzip=False):
+    extension = EXPORT_FORMATS[export_format][1]
+    if gzip and export_format != 'parquet':
+        extension += '.gz'
+    return f'attendance_{start_date}_{end_date}.{extension}'
+
+def export_mimetype(export_format, gzip=False):
+    if gzip and export_format != 'parquet':
+        return 'application/gzip'
+    return EXPORT_FORMATS[export_format][0]
+
+def write_export(chunks, path):
+    """Write encoded chunks to path through a temporary file, returning its size"""
+    with open(path + '.part', 'wb') as output:
+        for chunk in chunks:
+            output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    os.replace(path + '.part', path)
+    return os.path.getsize(path)
+
+def count_attendance_rows(conn, start_date, end_date, employee_codes=None, department=None):
+    """Number of rows iter_attendance_rows() will yield, for progress reports"""
+    total = 0
+    for table, first, last in checkin_partitions(conn, start_date, end_date):
+        where, params = attendance_filter(conn, first, last, employee_codes, department)
+        total += conn.execute(f'''
+            SELECT COUNT(*) FROM {table} c
+            JOIN employees e ON e.id = c.employee_id
+            WHERE {where}
+        ''', params).fetchone()[0]
+    return total
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m src.attendance_export', description='Export attendance history')
+    parser.add_argument('--start', required=True, type=date.fromisoformat, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, type=date.fromisoformat, help='last day (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--gzip', action='store_true', help='gzip the output (Parquet: gzip column compression)')
+    parser.add_argument('--details', action='store_true', help='add employee name, department and position')
+    parser.add_argument('--rates', action='store_true', help='add the hourly rate in effect and the cost')
+    parser.add_argument('--department')
+    parser.add_argument('--employee', action='append', help='employee ID (repeatable)')
+    parser.add_argument('--output', help='output file (default: stdout, not for parquet)')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if not args.output and (args.format == 'parquet' or args.gzip):
+        parser.error('--output is required for binary output')
+
+    from .database import get_pool
+    conn = get_pool(args.db).acquire()
+    started = datetime.now()
+    try:
+        rows = iter_attendance_rows(conn, args.start, args.end, args.employee, args.department,
+                                    args.details, args.rates)
+        chunks = iter_export(rows, args.format, export_columns(args.details, args.rates), args.gzip)
+        if args.output:
+            write_export(chunks, args.output)
+            print(f'{args.output} written in {(datetime.now() - started).total_seconds():.1f}s', file=sys.stderr)
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
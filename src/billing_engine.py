@@ -0,0 +1,139 @@
+"""Set-based billing calculations
+
+A day is billed for its worked_hours, the sum of its closed work sessions
+(see src/occupancy.py), so the gaps between a day's sessions are not
+billed. Totals are summed inside the database, and each check-in is billed
+at the rate effective on its own date. Rates come from the in-memory rate
+index (src/rates.py), so a period spanning a rate change is split
+correctly without querying billing_rates.
+"""
+from .archive import checkin_partitions
+from .dialects import dialect_of
+from .rates import get_rate_index
+
+def get_rate_at(conn, employee_id, day):
+    """Hourly rate effective for an employee on a given day"""
+    return get_rate_index(conn).rate_at(employee_id, day)
+
+def compute_employee_billing(conn, employee_id, start_date, end_date):
+    """Per-day billing records and totals for one employee"""
+    rates = get_rate_index(conn)
+    records = []
+    for table, first, last in checkin_partitions(conn, start_date, end_date):
+        records += conn.execute(f'''
+            SELECT c.date, c.status,
+                   substr(CAST(c.check_in_time AS TEXT), 12, 5) AS check_in,
+                   substr(CAST(c.check_out_time AS TEXT), 12, 5) AS check_out,
+                   c.worked_hours AS hours_worked
+            FROM {table} c
+            WHERE c.employee_id = ? AND c.date BETWEEN ? AND ?
+            AND c.worked_hours IS NOT NULL
+            ORDER BY c.date
+        ''', (employee_id, first, last)).fetchall()
+
+    billing_records = []
+    total_hours = 0
+    total_cost = 0
+
+    for record in records:
+        hours_worked = record['hours_worked']
+        hourly_rate = rates.rate_at(employee_id, record['date'])
+        daily_cost = hours_worked * hourly_rate
+
+        billing_records.append({
+            'date': record['date'],
+            'check_in': record['check_in'],
+            'check_out': record['check_out'],
+            'hours_worked': round(hours_worked, 2),
+            'hourly_rate': hourly_rate,
+            'cost': round(daily_cost, 2),
+            'status': record['status']
+        })
+
+        total_hours += hours_worked
+        total_cost += daily_cost
+
+    return {
+        'records': billing_records,
+        'total_hours': round(total_hours, 2),
+        'total_cost': round(total_cost, 2),
+        'hourly_rate': rates.rate_at(employee_id, end_date),
+        'period_start': start_date,
+        'period_end': end_date
+    }
+
+def iter_rate_segments(conn, start_date, end_date, employee_ids=None):
+    """Billed days and hours per employee per rate period, in one query per partition
+
+    The rate periods overlapping [start_date, end_date] come from the rate
+    index and are passed in as one JSON parameter. Each one aggregates its
+    check-ins with an index range scan on (employee_id, date), so the cost
+    is one covering-index pass over the period whatever the number of
+    employees. Archived months are read from their archives and their
+    sums added to those of the hot table.
+    Rows are ordered by employee and period start.
+    """
+    if employee_ids is None:
+        employee_ids = [row[0] for row in conn.execute('SELECT id FROM employees')]
+    rates = get_rate_index(conn)
+    periods = [[employee_id, hourly_rate, valid_from, valid_to]
+               for employee_id in employee_ids
+               for hourly_rate, valid_from, valid_to in rates.periods(employee_id, start_date, end_date)]
+    dialect = dialect_of(conn)
+    columns = [('employee_id', 'INTEGER'), ('hourly_rate', 'DOUBLE PRECISION'),
+               ('valid_from', 'DATE'), ('valid_to', 'DATE')]
+    segment_filter = f'''
+        c.employee_id = r.employee_id
+        AND c.date >= {dialect.greatest('r.valid_from', ':first')} AND c.date < r.valid_to AND c.date <= :last
+        AND c.worked_hours IS NOT NULL
+    '''
+    params = {'periods': dialect.rows_param(periods, columns), 'start': str(start_date), 'end': str(end_date)}
+    segments = None
+    for table, first, last in checkin_partitions(conn, start_date, end_date):
+        rows = conn.execute(f'''
+            WITH rate_periods AS ({dialect.rows_table(':periods', columns)})
+            SELECT r.employee_id, r.hourly_rate,
+                   {dialect.greatest('r.valid_from', ':start')} AS segment_start,
+                   {dialect.least(dialect.add_days('r.valid_to', -1), ':end')} AS segment_end,
+                   (SELECT COUNT(*) FROM {table} c WHERE {segment_filter}) AS days_billed,
+                   (SELECT COALESCE(SUM(c.worked_hours), 0) FROM {table} c WHERE {segment_filter}) AS hours_worked
+            FROM rate_periods r
+            ORDER BY r.employee_id, r.valid_from
+        ''', dict(params, first=first, last=last))
+        if segments is None:
+            segments = [dict(row) for row in rows]
+            continue
+        for segment, row in zip(segments, rows):
+            segment['days_billed'] += row['days_billed']
+            segment['hours_worked'] += row['hours_worked']
+    return segments
+
+def compute_billing_totals(conn, start_date, end_date, employee_ids=None):
+    """Billing totals per employee over a period, split across rate changes
+
+    Returns {employee_id: {'days_billed', 'total_hours', 'total_cost',
+    'segments'}} where segments lists the rate periods that were billed.
+    """
+    totals = {}
+    for segment in iter_rate_segments(conn, start_date, end_date, employee_ids):
+        if not segment['days_billed']:
+            continue
+        employee = totals.setdefault(segment['employee_id'], {
+            'days_billed': 0, 'total_hours': 0, 'total_cost': 0, 'segments': []
+        })
+        cost = segment['hours_worked'] * segment['hourly_rate']
+        employee['days_billed'] += segment['days_billed']
+        employee['total_hours'] += segment['hours_worked']
+        employee['total_cost'] += cost
+        employee['segments'].append({
+            'start': segment['segment_start'],
+            'end': segment['segment_end'],
+            'hourly_rate': segment['hourly_rate'],
+            'days_billed': segment['days_billed'],
+            'hours_worked': round(segment['hours_worked'], 2),
+            'cost': round(cost, 2)
+        })
+    for employee in totals.values():
+        employee['total_hours'] = round(employee['total_hours'], 2)
+        employee['total_cost'] = round(employee['total_cost'], 2)
+    return totals
@@ -0,0 +1,229 @@
+"""Company-wide billing export for month-end invoicing and payroll
+
+Employees are billed in batches with compute_billing_totals(), one
+set-based pass over checkins and billing_rates per batch. Long periods
+fan the batches out to a process pool. Rows are written out as soon as
+their batch is done, so memory stays bounded by the batches in flight.
+Exports requested from the admin pages run as background jobs
+(src/jobs.py), never in a web request.
+
+Usage:
+    python -m src.billing_export --start 2024-01-01 --end 2024-01-31 \
+        [--format csv|jsonl|xlsx] [--output FILE] [--department IT] [--db checkin_system.db]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+from .config import DB_PATH, BILLING_EXPORT_BATCH_SIZE, BILLING_EXPORT_WORKERS, BILLING_EXPORT_POOL_MIN_DAYS
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+
+EXPORT_COLUMNS = [
+    'employee_id', 'first_name', 'last_name', 'department', 'period_start', 'period_end',
+    'days_billed', 'total_hours', 'total_cost', 'hourly_rates'
+]
+
+def select_employees(conn, employee_ids=None, department=None):
+    """Employees to bill, as (id, employee_id, first_name, last_name, department) rows"""
+    sql = 'SELECT id, employee_id, first_name, last_name, department FROM employees WHERE 1 = 1'
+    params = []
+    if employee_ids:
+        sql += f" AND id IN ({', '.join('?' * len(employee_ids))})"
+        params.extend(employee_ids)
+    if department:
+        sql += ' AND department = ?'
+        params.append(department)
+    sql += ' ORDER BY employee_id'
+    return [tuple(row) for row in conn.execute(sql, params)]
+
+def bill_batch(db_path, start_date, end_date, employees):
+    """Export rows for one batch of employees (runs in pool workers too)"""
+    from .billing_engine import compute_billing_totals
+    from .database import get_pool
+
+    conn = get_pool(db_path).acquire()
+    try:
+        totals = compute_billing_totals(conn, start_date, end_date, [e[0] for e in employees])
+    finally:
+        conn.close()
+
+    rows = []
+    for employee_pk, employee_id, first_name, last_name, department in employees:
+        billed = totals.get(employee_pk)
+        if not billed:
+            continue
+        rows.append({
+            'employee_id': employee_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'department': department,
+            'period_start': str(start_date),
+            'period_end': str(end_date),
+            'days_billed': billed['days_billed'],
+            'total_hours': billed['total_hours'],
+            'total_cost': billed['total_cost'],
+            'hourly_rates': ';'.join(str(s['hourly_rate']) for s in billed['segments'])
+        })
+    return rows
+
+def iter_billing_rows(start_date, end_date, employee_ids=None, department=None,
+                      db_path=None, workers=None, progress=None):
+    """Yield one export row per billed employee, in employee_id order
+
+    progress(done, total) is called with employee counts after each batch.
+    """
+    from .database import get_pool, current_pool
+
+    db_path = db_path or current_pool().path
+    workers = BILLING_EXPORT_WORKERS if workers is None else workers
+
+    conn = get_pool(db_path).acquire()
+    try:
+        employees = select_employees(conn, employee_ids, department)
+    finally:
+        conn.close()
+
+    batches = [employees[i:i + BILLING_EXPORT_BATCH_SIZE]
+               for i in range(0, len(employees), BILLING_EXPORT_BATCH_SIZE)]
+
+    done = 0
+
+    def batch_done(size):
+        nonlocal done
+        done += size
+        if progress:
+            progress(done, len(employees))
+
+    batch_done(0)
+    use_pool = (workers > 1 and len(batches) > 1
+                and (end_date - start_date).days >= BILLING_EXPORT_POOL_MIN_DAYS)
+    if not use_pool:
+        for batch in batches:
+            yield from bill_batch(db_path, start_date, end_date, batch)
+            batch_done(len(batch))
+        return
+
+    # Imported here: most exports are short enough to run in-process
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: forking a threaded web worker that holds SQLite handles is unsafe
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = []
+        for batch in batches:
+            pending.append((batch, executor.submit(bill_batch, db_path, start_date, end_date, batch)))
+            # Keep a bounded window of batches in flight and emit them in order
+            if len(pending) >= workers * 2:
+                oldest, future = pending.pop(0)
+                yield from future.result()
+                batch_done(len(oldest))
+        for batch, future in pending:
+            yield from future.result()
+            batch_done(len(batch))
+
+def iter_csv(rows, columns=EXPORT_COLUMNS):
+    """Encode export rows as CSV chunks"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_jsonl(rows):
+    """Encode export rows as JSON lines"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+def require_openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError('XLSX export requires openpyxl (pip install openpyxl)')
+    return openpyxl
+
+def check_export_format(export_format):
+    """RuntimeError if the optional package export_format needs is missing
+
+    Called before a response starts streaming, which cannot report errors.
+    """
+    if export_format == 'xlsx':
+        require_openpyxl()
+
+def write_xlsx(rows, path):
+    """Write export rows to an XLSX file with a constant-memory writer"""
+    workbook = require_openpyxl().Workbook(write_only=True)
+    sheet = workbook.create_sheet('Billing')
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append([row[column] for column in EXPORT_COLUMNS])
+    workbook.save(path)
+
+def iter_xlsx(rows):
+    """XLSX is a zip archive, so build it in a temporary file and stream that"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write_xlsx(rows, path)
+        with open(path, 'rb') as export_file:
+            while True:
+                chunk = export_file.read(65536)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
+
+def iter_export(rows, export_format):
+    """Encode export rows in the requested format"""
+    if export_format == 'jsonl':
+        return iter_jsonl(rows)
+    if export_format == 'xlsx':
+        return iter_xlsx(rows)
+    return iter_csv(rows)
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m src.billing_export', description='Export billing for all employees')
+    parser.add_argument('--start', required=True, type=date.fromisoformat, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, type=date.fromisoformat, help='last day (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--output', help='output file (default: stdout, not for xlsx)')
+    parser.add_argument('--department')
+    parser.add_argument('--workers', type=int, default=BILLING_EXPORT_WORKERS)
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    rows = iter_billing_rows(args.start, args.end, department=args.department,
+                             db_path=args.db, workers=args.workers)
+    if args.format == 'xlsx':
+        if not args.output:
+            parser.error('--output is required for xlsx')
+        write_xlsx(rows, args.output)
+        return 0
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        for chunk in iter_export(rows, args.format):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
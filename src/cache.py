@@ -0,0 +1,238 @@
+"""Read cache for per-employee attendance data
+
+Values are cached by key with a TTL, either in an in-process LRU or in a
+shared Redis-compatible server (CACHE_BACKEND = 'redis'). Writers call the
+invalidate_* helpers explicitly after committing.
+
+With the in-process backend each gunicorn worker has its own copy, so
+reads are guarded by PRAGMA data_version: when another connection (another
+worker, a sibling pooled connection, an admin script) has committed since
+the connection last looked, the attendance_events outbox of the database
+says which employees changed and only their entries are dropped; a
+'reset' event (bulk changes) drops everything. PostgreSQL has no such
+counter, so with a PostgreSQL database only the Redis backend caches.
+
+In multi-tenant mode keys are prefixed with the current tenant, and
+clearing only drops that tenant's entries.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from .config import CACHE_BACKEND, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_REDIS_URL, DB_PATH, LIVE_EVENT_RETENTION_DAYS
+from .dialects import SQLITE, dialect_of
+from .tenants import current_tenant
+
+KEY_PREFIX = 'checkin-cache:'
+
+def namespaced(key):
+    """Key as stored: tenants never share entries"""
+    tenant = current_tenant()
+    return f'{tenant}/{key}' if tenant else key
+
+class CacheStats:
+    """Hit/miss counters for one process"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions
+        }
+
+class MemoryCache:
+    """Thread-safe LRU with per-entry expiry"""
+    verifies_data_version = True
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # database path -> [last outbox id applied, monotonic time of the read]
+        self._outbox = {}
+        self._outbox_lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value)"""
+        key = namespaced(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value):
+        key = namespaced(key)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(namespaced(key), None)
+            self.stats.invalidations += 1
+
+    def clear(self):
+        """Drop every entry of the current tenant"""
+        prefix = namespaced('')
+        with self._lock:
+            if prefix:
+                for key in [key for key in self._entries if key.startswith(prefix)]:
+                    del self._entries[key]
+            else:
+                self._entries.clear()
+            self.stats.invalidations += 1
+
+    def size(self):
+        return len(self._entries)
+
+    def check_data_version(self, conn):
+        """Drop the entries other connections changed since conn last looked
+
+        This process's writes were already invalidated explicitly; their
+        events only delete the same keys again.
+        """
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if conn.cache_data_version == version:
+            return
+        pool = getattr(conn, 'pool', None)
+        with self._outbox_lock:
+            self._apply_outbox(conn, pool.path if pool is not None else DB_PATH)
+        conn.cache_data_version = version
+
+    def _apply_outbox(self, conn, path):
+        seen = self._outbox.get(path)
+        now = time.monotonic()
+        # Outbox rows older than LIVE_EVENT_RETENTION_DAYS may be gone
+        if seen is None or now - seen[1] > LIVE_EVENT_RETENTION_DAYS * 86400:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance_events').fetchone()[0]
+            self._outbox[path] = [last_id, now]
+            self.clear()
+            return
+        events = conn.execute('''
+            SELECT id, event_type, employee_id, date FROM attendance_events
+            WHERE id > ? ORDER BY id
+        ''', (seen[0],)).fetchall()
+        seen[1] = now
+        if not events:
+            return
+        seen[0] = events[-1]['id']
+        if any(row['event_type'] == 'reset' for row in events):
+            self.clear()
+            return
+        keys = set()
+        for row in events:
+            if row['event_type'] == 'schedule':
+                keys.add(schedule_key(row['employee_id']))
+            else:
+                keys.update((employee_day_key(row['employee_id'], row['date']),
+                             employee_recent_key(row['employee_id'])))
+        self.delete(*keys)
+
+class RedisCache:
+    """Cache shared by all workers through a Redis-compatible server"""
+    verifies_data_version = False
+
+    def __init__(self, url=CACHE_REDIS_URL, ttl=CACHE_TTL_SECONDS):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, key):
+        raw = self.client.get(KEY_PREFIX + namespaced(key))
+        if raw is None:
+            self.stats.misses += 1
+            return False, None
+        self.stats.hits += 1
+        return True, json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(KEY_PREFIX + namespaced(key), json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        self.client.delete(*(KEY_PREFIX + namespaced(key) for key in keys))
+        self.stats.invalidations += 1
+
+    def clear(self):
+        keys = list(self.client.scan_iter(KEY_PREFIX + namespaced('') + '*', count=1000))
+        if keys:
+            self.client.delete(*keys)
+        self.stats.invalidations += 1
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(KEY_PREFIX + '*', count=1000))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache instance for the configured backend"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RedisCache() if CACHE_BACKEND == 'redis' else MemoryCache()
+    return _cache
+
+def cached(conn, key, loader):
+    """Return the cached value for key, calling loader(conn) on a miss"""
+    cache = get_cache()
+    if cache.verifies_data_version:
+        if dialect_of(conn) is not SQLITE:
+            # Commits made on other nodes cannot be detected: use the redis backend
+            return loader(conn)
+        cache.check_data_version(conn)
+    found, value = cache.get(key)
+    if not found:
+        value = loader(conn)
+        cache.set(key, value)
+    return value
+
+def employee_day_key(employee_id, day):
+    return f'checkin:{employee_id}:{day}'
+
+def employee_recent_key(employee_id):
+    return f'recent:{employee_id}'
+
+def schedule_key(employee_id):
+    return f'schedule:{employee_id}'
+
+def invalidate_employee_day(employee_id, day):
+    """Forget an employee's cached record for one day and recent history"""
+    get_cache().delete(employee_day_key(employee_id, day), employee_recent_key(employee_id))
+
+def invalidate_all():
+    """Forget every cached value (bulk deletes, purges)"""
+    get_cache().clear()
+
+def cache_stats():
+    """Counters for the admin stats endpoint"""
+    cache = get_cache()
+    stats = cache.stats.as_dict()
+    stats['backend'] = CACHE_BACKEND
+    stats['entries'] = cache.size()
+    return stats
@@ -1,10 +1,31 @@
 """Configuration settings for AI Check-in at Work"""
 import os
 
-# Database configuration
-DB_PATH = 'checkin_system.db'
+# Database configuration: a SQLite file, or a postgresql:// URL (see src/postgres.py)
+DB_PATH = os.environ.get('DB_PATH', 'checkin_system.db')
+
+# Connection pool settings (one pool per worker process)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_JOURNAL_MODE = os.environ.get('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 268435456))  # 256 MB
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+DB_MAX_OPEN_POOLS = int(os.environ.get('DB_MAX_OPEN_POOLS', 64))  # Least recently used pools close beyond this
+
+# Multi-tenant mode (enabled by TENANT_DATA_DIR): one database per tenant,
+# <TENANT_DATA_DIR>/<tenant>.db, picked from the host name <tenant>.TENANT_DOMAIN
+# or from the TENANT_HEADER request header set by the proxy
+TENANT_DATA_DIR = os.environ.get('TENANT_DATA_DIR', '')
+TENANT_DOMAIN = os.environ.get('TENANT_DOMAIN', '')
+TENANT_HEADER = os.environ.get('TENANT_HEADER', '')
+TENANT_POOL_SIZE = int(os.environ.get('TENANT_POOL_SIZE', 2))  # Idle connections kept per tenant
 
 # Flask configuration
+TEMPLATE_FOLDER = os.environ.get('TEMPLATE_FOLDER', '/app/templates')
+STATIC_FOLDER = os.environ.get('STATIC_FOLDER', '/app/static')
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '/tmp/checkin-templates')  # Compiled templates; empty disables
 SECRET_KEY = os.environ.get('SECRET_KEY', 'checkin-secret-key-change-in-production')
 FLASK_ENV = os.environ.get('FLASK_ENV', 'development')
 
@@ -17,8 +38,90 @@ WORK_END_TIME = "17:00"
 LATE_THRESHOLD_MINUTES = 15
 EARLY_LEAVE_THRESHOLD_MINUTES = 30
 
+# Password hashing (see python -m src.passwords benchmark)
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+PASSWORD_HASH_WAIT_SECONDS = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS', 2))
+
+# Failed login attempts allowed per username and per client address in the window
+LOGIN_RATE_LIMIT_ATTEMPTS = int(os.environ.get('LOGIN_RATE_LIMIT_ATTEMPTS', 10))
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = int(os.environ.get('LOGIN_RATE_LIMIT_WINDOW_SECONDS', 300))
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))  # Reverse proxies whose X-Forwarded-For/-Proto are trusted
+
+# Request instrumentation (off by default): Server-Timing, /metrics, slow queries
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '0') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+METRICS_DIR = os.environ.get('METRICS_DIR', '/tmp/checkin-metrics')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+# Endpoints to sample, e.g. "admin.reports,billing.billing_report"
+PROFILE_ROUTES = {name for name in os.environ.get('PROFILE_ROUTES', '').split(',') if name}
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/checkin-profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+
+# Badge reader ingestion: comma separated bearer tokens (empty disables the API)
+INGEST_API_TOKENS = {token for token in os.environ.get('INGEST_API_TOKENS', '').split(',') if token}
+INGEST_MAX_EVENTS = int(os.environ.get('INGEST_MAX_EVENTS', 10000))
+INGEST_EVENT_RETENTION_DAYS = 90
+
+# Live attendance board (Server-Sent Events)
+LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', 1))
+LIVE_RETRY_MS = int(os.environ.get('LIVE_RETRY_MS', 3000))  # WSGI mode reconnect delay
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_BUFFER_SIZE = 1000
+LIVE_QUEUE_SIZE = 100
+LIVE_EVENT_RETENTION_DAYS = 2
+
+# On-site occupancy (open work sessions, see src/occupancy.py)
+OCCUPANCY_MAX_SESSION_HOURS = float(os.environ.get('OCCUPANCY_MAX_SESSION_HOURS', 16))  # Older open sessions are forgotten check-outs
+OCCUPANCY_MAX_AGE_SECONDS = float(os.environ.get('OCCUPANCY_MAX_AGE_SECONDS', 1))  # Other workers' check-ins visibility
+
+# Async (ASGI) serving mode: threads running blocking SQLite calls per process
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 32))
+
+# Read cache for dashboard and status data ('memory' per worker, or 'redis' shared)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 300))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+
+# Admin check-in log pagination
+ADMIN_LOG_PAGE_SIZE = 50
+ADMIN_LOG_MAX_PAGE_SIZE = 500
+
 # Billing settings
 DEFAULT_HOURLY_RATE = 25.0  # Default hourly rate in USD
+RATE_INDEX_MAX_AGE_SECONDS = float(os.environ.get('RATE_INDEX_MAX_AGE_SECONDS', 2))  # Rate change visibility across workers
+
+# Company-wide billing export
+BILLING_EXPORT_BATCH_SIZE = 500  # Employees billed per set-based pass
+BILLING_EXPORT_WORKERS = int(os.environ.get('BILLING_EXPORT_WORKERS', os.cpu_count() or 1))
+BILLING_EXPORT_POOL_MIN_DAYS = 92  # Use the process pool for periods this long
+
+# Attendance history export
+EXPORT_DIR = os.environ.get('EXPORT_DIR', '/tmp/checkin-exports')
+EXPORT_BATCH_ROWS = 5000  # Rows fetched per cursor step and per Parquet row group
+EXPORT_STREAM_MAX_DAYS = int(os.environ.get('EXPORT_STREAM_MAX_DAYS', 92))  # Longer ranges run as jobs
+EXPORT_RETENTION_HOURS = int(os.environ.get('EXPORT_RETENTION_HOURS', 24))
+
+# Monthly check-in archives (python -m src.archive)
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')  # Default: archive/ next to the database
+ARCHIVE_KEEP_MONTHS = int(os.environ.get('ARCHIVE_KEEP_MONTHS', 3))  # Months kept in checkins, current included
+
+# Attendance analytics (/admin/reports/analytics, needs numpy)
+ANALYTICS_MAX_AGE_SECONDS = float(os.environ.get('ANALYTICS_MAX_AGE_SECONDS', 5))  # Outbox checks per cached matrix
+ANALYTICS_CACHE_PERIODS = int(os.environ.get('ANALYTICS_CACHE_PERIODS', 4))  # Matrices kept per process
+ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', 1830))
+ANALYTICS_DEFAULT_DAYS = 90
+
+# Background job queue (python -m src.jobs worker)
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+JOB_CHUNK_ROWS = int(os.environ.get('JOB_CHUNK_ROWS', 2000))  # Rows deleted per write transaction
+JOB_CHUNK_EMPLOYEES = 50  # Employees per rollup rebuild transaction
+JOB_STALE_SECONDS = 300  # Running jobs without a heartbeat this long are retried
+JOB_MAX_ATTEMPTS = 3
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 30))
+JOB_WORKER_THREAD = os.environ.get('JOB_WORKER_THREAD', '0') == '1'  # Run a worker inside the web app
 
 # Language translations
 TRANSLATIONS = {
@@ -95,7 +198,55 @@ TRANSLATIONS = {
         'late_days': 'Late Days',
         'avg_hours_day': 'Avg Hours/Day',
         'no_activity': 'No activity',
-        'no_activity_data': 'No activity data found for the selected period.'
+        'no_activity_data': 'No activity data found for the selected period.',
+        'employee': 'Employee',
+        'all': 'All',
+        'filter': 'Filter',
+        'first_page': 'First page',
+        'next_page': 'Next page',
+        'day': 'Day',
+        'week': 'Week',
+        'month': 'Month',
+        'previous_period': 'Previous',
+        'next_period': 'Next',
+        'billing_export': 'Billing Export',
+        'export': 'Export',
+        'format': 'Format',
+        'live_board': 'Live Board',
+        'attendance_export': 'Attendance Export',
+        'jobs': 'Jobs',
+        'job': 'Job',
+        'created': 'Created',
+        'progress': 'Progress',
+        'rebuild_reports': 'Rebuild reports',
+        'recompute_statuses': 'Recompute check-in statuses',
+        'employee_details': 'Employee details',
+        'hourly_rates': 'Hourly rates',
+        'compress_gzip': 'Compress (gzip)',
+        'run_in_background': 'Run in background',
+        'download': 'Download',
+        'no_jobs': 'No jobs yet',
+        'effective_date': 'Effective from',
+        'rate_history': 'Rate history',
+        'attendance_analytics': 'Attendance Analytics',
+        'analytics_view': 'View',
+        'analytics_trends': 'Weekly trends',
+        'analytics_streaks': 'Lateness streaks',
+        'analytics_weekdays': 'Arrival by weekday',
+        'analytics_overtime': 'Overtime',
+        'analytics_departments': 'Departments',
+        'all_departments': 'All departments',
+        'week_start': 'Week of',
+        'late_rate': 'Late %',
+        'overtime_hours': 'Overtime (h)',
+        'overtime_days': 'Overtime days',
+        'longest_streak': 'Longest late streak',
+        'current_streak': 'Current streak',
+        'days_present': 'Days present',
+        'analytics_hours_worked': 'Hours worked',
+        'avg_arrival': 'Avg arrival',
+        'employees': 'Employees',
+        'company': 'Company'
     },
     'fr': {
         'login': 'Connexion',
@@ -170,6 +321,54 @@ TRANSLATIONS = {
         'late_days': 'Jours de retard',
         'avg_hours_day': 'Heures moy./jour',
         'no_activity': 'Aucune activité',
-        'no_activity_data': 'Aucune donnée d\'activité trouvée pour la période sélectionnée.'
+        'no_activity_data': 'Aucune donnée d\'activité trouvée pour la période sélectionnée.',
+        'employee': 'Employé',
+        'all': 'Tous',
+        'filter': 'Filtrer',
+        'first_page': 'Première page',
+        'next_page': 'Page suivante',
+        'day': 'Jour',
+        'week': 'Semaine',
+        'month': 'Mois',
+        'previous_period': 'Précédent',
+        'next_period': 'Suivant',
+        'billing_export': 'Export de facturation',
+        'export': 'Exporter',
+        'format': 'Format',
+        'live_board': 'Tableau en direct',
+        'attendance_export': 'Export des présences',
+        'jobs': 'Tâches',
+        'job': 'Tâche',
+        'created': 'Créée',
+        'progress': 'Progression',
+        'rebuild_reports': 'Reconstruire les rapports',
+        'recompute_statuses': 'Recalculer les statuts de pointage',
+        'employee_details': 'Détails des employés',
+        'hourly_rates': 'Taux horaires',
+        'compress_gzip': 'Compresser (gzip)',
+        'run_in_background': 'Exécuter en arrière-plan',
+        'download': 'Télécharger',
+        'no_jobs': 'Aucune tâche pour le moment',
+        'effective_date': 'En vigueur le',
+        'rate_history': 'Historique des taux',
+        'attendance_analytics': 'Analyse des présences',
+        'analytics_view': 'Vue',
+        'analytics_trends': 'Tendances hebdomadaires',
+        'analytics_streaks': 'Séries de retards',
+        'analytics_weekdays': 'Arrivée par jour de semaine',
+        'analytics_overtime': 'Heures supplémentaires',
+        'analytics_departments': 'Départements',
+        'all_departments': 'Tous les départements',
+        'week_start': 'Semaine du',
+        'late_rate': 'Retards %',
+        'overtime_hours': 'Heures sup. (h)',
+        'overtime_days': 'Jours avec heures sup.',
+        'longest_streak': 'Plus longue série de retards',
+        'current_streak': 'Série en cours',
+        'days_present': 'Jours présents',
+        'analytics_hours_worked': 'Heures travaillées',
+        'avg_arrival': 'Arrivée moyenne',
+        'employees': 'Employés',
+        'company': 'Entreprise'
     }
 }
\ No newline at end of file
@@ -1,96 +1,203 @@
 """Database initialization and management"""
+import os
 import sqlite3
-from datetime import datetime
-from werkzeug.security import generate_password_hash
-from .config import DB_PATH
+import threading
+from collections import OrderedDict
+from flask import g, has_app_context
+from .config import (
+    DB_PATH, DB_POOL_SIZE, DB_MAX_OPEN_POOLS, DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_STATEMENT_CACHE_SIZE, INSTRUMENTATION_ENABLED, TENANT_POOL_SIZE
+)
+from .dialects import SQLITE
+from .migrations import migrate
+from .tenants import current_tenant, tenant_db_path
 
-def init_db():
-    """Initialize database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Employees table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS employees (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id TEXT UNIQUE NOT NULL,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            department TEXT,
-            position TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Check-ins table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS checkins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            check_in_time TIMESTAMP,
-            check_out_time TIMESTAMP,
-            date DATE NOT NULL,
-            status TEXT DEFAULT 'present',
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES employees (id),
-            UNIQUE(employee_id, date)
-        )
-    ''')
-    
-    # Work schedules table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS work_schedules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            day_of_week INTEGER NOT NULL,
-            start_time TIME NOT NULL,
-            end_time TIME NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            FOREIGN KEY (employee_id) REFERENCES employees (id)
-        )
-    ''')
-    
-    # Billing rates table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS billing_rates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            hourly_rate DECIMAL(10,2) NOT NULL DEFAULT 25.00,
-            effective_date DATE NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES employees (id)
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool instead of closing"""
+    pool = None
+    bound = False
+    dialect = SQLITE
+    cache_data_version = None  # PRAGMA data_version when src/cache.py last looked
+
+    def stream(self, sql, parameters=()):
+        """Cursor for a large result, read with fetchmany()"""
+        return self.execute(sql, parameters)
+
+    def close(self):
+        # Connections bound to an app context are released at teardown
+        if self.bound:
+            return
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            sqlite3.Connection.close(self)
+
+class ConnectionPool:
+    """Per-process pool of tuned SQLite connections"""
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.pid = os.getpid()
+        self.retired = False
+        self.schema_checked = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        factory = PooledConnection
+        if INSTRUMENTATION_ENABLED:
+            from .instrumentation import InstrumentedConnection
+            factory = InstrumentedConnection
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            factory=factory
         )
-    ''')
-    
-    # Create default admin employee
-    cursor.execute('SELECT COUNT(*) FROM employees WHERE username = ?', ('admin',))
-    if cursor.fetchone()[0] == 0:
-        admin_password_hash = generate_password_hash('password')
-        cursor.execute('''
-            INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', ('EMP001', 'admin', 'admin@company.com', admin_password_hash, 'System', 'Administrator', 'IT', 'Admin'))
-        
-        # Get the admin employee ID
-        admin_id = cursor.lastrowid
-        
-        # Create default billing rate for admin
-        cursor.execute('''
-            INSERT INTO billing_rates (employee_id, hourly_rate, effective_date)
-            VALUES (?, ?, ?)
-        ''', (admin_id, 25.00, datetime.now().date()))
-    
-    conn.commit()
-    conn.close()
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}')
+        conn.execute(f'PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size = {int(DB_MMAP_SIZE)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """Take an idle connection or open a new one"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        return conn
+
+    def release(self, conn):
+        """Return a connection, discarding any uncommitted work"""
+        conn.bound = False
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size and not self.retired:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    def _close(self, conn):
+        sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def retire(self):
+        """Close idle connections; those in use are closed when released"""
+        self.retired = True
+        self.close_all()
+
+# Most recently used last; beyond DB_MAX_OPEN_POOLS (one per tenant
+# database) the least recently used pool is retired.
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+# Connections inherited through fork() must never be closed by the child,
+# otherwise SQLite may checkpoint or unlink the parent's WAL file.
+_inherited_pools = []
+
+def is_postgres_url(path):
+    return path.startswith(('postgresql://', 'postgres://'))
+
+def open_pool(path, size):
+    """SQLite pool for a file, PostgreSQL pool for a postgresql:// URL"""
+    if is_postgres_url(path):
+        from .postgres import PostgresPool
+        return PostgresPool(path, size)
+    return ConnectionPool(path, size)
+
+def get_pool(path=None, size=DB_POOL_SIZE):
+    """Get the connection pool for a database file or URL in this process"""
+    path = path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is not None and pool.pid != os.getpid():
+            _inherited_pools.append(pool)
+            pool = None
+        if pool is None:
+            pool = _pools[path] = open_pool(path, size)
+            while len(_pools) > DB_MAX_OPEN_POOLS:
+                _, evicted = _pools.popitem(last=False)
+                if evicted.pid == os.getpid():
+                    evicted.retire()
+                else:
+                    _inherited_pools.append(evicted)
+        else:
+            _pools.move_to_end(path)
+    return pool
+
+def close_pools():
+    """Close and forget every pool of this process
+
+    Called by a preloading gunicorn master before it forks, so that every
+    worker opens its own connections.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.retire()
+
+def current_pool():
+    """Pool of the current tenant's database, or of DB_PATH in single-tenant mode
+
+    A tenant database is migrated the first time this process opens it.
+    """
+    tenant = current_tenant()
+    if tenant is None:
+        return get_pool()
+    pool = get_pool(tenant_db_path(tenant), TENANT_POOL_SIZE)
+    if not pool.schema_checked:
+        conn = pool.acquire()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        pool.schema_checked = True
+    return pool
+
+def init_db():
+    """Bring the database schema up to date
+
+    Workers only read the schema version when the schema is current; the
+    DDL in src/migrations.py runs once per database.
+    """
+    conn = get_db_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    """Get database connection
+
+    Inside a request the pooled connection is bound to the app context and
+    reused until teardown; elsewhere the caller's close() returns it to the pool.
+    """
+    if not has_app_context():
+        return current_pool().acquire()
+    conn = g.get('db')
+    if conn is None:
+        conn = current_pool().acquire()
+        conn.bound = True
+        g.db = conn
+    return conn
+
+def close_db(exception=None):
+    """Release the app context's connection back to its pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.pool.release(conn)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""SQL that differs between SQLite and PostgreSQL
+
+Queries are written once, in SQL both engines accept, with ? or :name
+placeholders. The few constructs that differ (date arithmetic, passing a
+list of values, row locking) come from the dialect of the connection as
+SQL fragments: dialect_of(conn).days_between(...).
+"""
+import json
+
+class SQLiteDialect:
+    name = 'sqlite'
+    # The whole database is locked by BEGIN IMMEDIATE
+    for_update = ''
+    skip_locked = ''
+
+    def lock_until_commit(self, conn, key):
+        """Serialize transactions on key; SQLite writers already hold the write lock"""
+
+    def in_list(self, column, param):
+        """column is one of the values passed as list_param()"""
+        return f'{column} IN (SELECT value FROM json_each({param}))'
+
+    def list_param(self, values):
+        return json.dumps(list(values))
+
+    def rows_table(self, param, columns):
+        """SELECT over rows passed as rows_param(), columns being (name, sql_type) pairs"""
+        selected = ', '.join(f"json_extract(value, '$[{index}]') AS {name}"
+                             for index, (name, _) in enumerate(columns))
+        return f'SELECT {selected} FROM json_each({param})'
+
+    def rows_param(self, rows, columns):
+        return json.dumps([list(row) for row in rows])
+
+    def shifted_now(self, param):
+        """Current UTC time moved by a modifier such as '-30 days'"""
+        return f"datetime('now', {param})"
+
+    def exact_hours_between(self, start, end):
+        """Hours between two timestamps, to the microsecond"""
+        return f'(({self._microseconds(end)} - {self._microseconds(start)}) / 1000000.0 / 3600)'
+
+    @staticmethod
+    def _microseconds(column):
+        # strftime() rounds to milliseconds, so only whole seconds are taken from it
+        return (f"(CAST(strftime('%s', substr({column}, 1, 19)) AS INTEGER) * 1000000"
+                f" + CAST(substr({column} || '.000000', 21, 6) AS INTEGER))")
+
+    def seconds_of_day(self, column):
+        """Seconds since midnight of a stored 'YYYY-MM-DD HH:MM:SS[.ffffff]' timestamp"""
+        return (f'(CAST(substr({column}, 12, 2) AS INTEGER) * 3600'
+                f' + CAST(substr({column}, 15, 2) AS INTEGER) * 60'
+                f' + CAST(substr({column}, 18) AS REAL))')
+
+    def day_of_week(self, column):
+        """0 = Monday ... 6 = Sunday, as date.weekday()"""
+        return f"((CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7)"
+
+    def week_start(self, column):
+        return f"date({column}, '-' || {self.day_of_week(column)} || ' days')"
+
+    def month_start(self, column):
+        return f"date({column}, 'start of month')"
+
+    def add_days(self, column, days):
+        return f"date({column}, '{int(days):+d} day')"
+
+    def days_between(self, start, end):
+        """Whole days from one date to another"""
+        return f'CAST(julianday({end}) - julianday({start}) AS INTEGER)'
+
+    def greatest(self, *values):
+        return f"MAX({', '.join(values)})"
+
+    def least(self, *values):
+        return f"MIN({', '.join(values)})"
+
+class PostgresDialect:
+    name = 'postgres'
+    for_update = ' FOR UPDATE'
+    # Concurrent workers claim different rows instead of waiting for each other
+    skip_locked = ' FOR UPDATE SKIP LOCKED'
+
+    def lock_until_commit(self, conn, key):
+        conn.execute('SELECT pg_advisory_xact_lock(?)', (key,))
+
+    def in_list(self, column, param):
+        return f'{column} = ANY({param})'
+
+    def list_param(self, values):
+        return list(values)
+
+    def rows_table(self, param, columns):
+        definition = ', '.join(f'{name} {sql_type}' for name, sql_type in columns)
+        return f'SELECT * FROM json_to_recordset(CAST({param} AS json)) AS rows ({definition})'
+
+    def rows_param(self, rows, columns):
+        names = [name for name, _ in columns]
+        return json.dumps([dict(zip(names, row)) for row in rows])
+
+    def shifted_now(self, param):
+        # Connections run with TimeZone = UTC, like SQLite's CURRENT_TIMESTAMP
+        return f'(LOCALTIMESTAMP + CAST({param} AS interval))'
+
+    def exact_hours_between(self, start, end):
+        return f'(EXTRACT(EPOCH FROM ({end} - {start})) / 3600)'
+
+    def seconds_of_day(self, column):
+        return f'EXTRACT(EPOCH FROM CAST({column} AS time))'
+
+    def day_of_week(self, column):
+        return f'(CAST(EXTRACT(ISODOW FROM {column}) AS INTEGER) - 1)'
+
+    def week_start(self, column):
+        return f"CAST(date_trunc('week', {column}) AS date)"
+
+    def month_start(self, column):
+        return f"CAST(date_trunc('month', {column}) AS date)"
+
+    def add_days(self, column, days):
+        return f'(CAST({column} AS date) + {int(days)})'
+
+    def days_between(self, start, end):
+        return f'(CAST({end} AS date) - CAST({start} AS date))'
+
+    def greatest(self, *values):
+        return f"GREATEST({', '.join(values)})"
+
+    def least(self, *values):
+        return f"LEAST({', '.join(values)})"
+
+SQLITE = SQLiteDialect()
+POSTGRES = PostgresDialect()
+
+def dialect_of(conn):
+    """Dialect of a pooled connection; plain sqlite3 connections and cursors are SQLite"""
+    return getattr(conn, 'dialect', SQLITE)
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Employee accounts
+
+The employees queries behind the login and user management pages, so the
+routes hold no SQL and run unchanged on SQLite and PostgreSQL.
+"""
+
+def find_login(conn, username):
+    """Active account that may log in as username, or None"""
+    return conn.execute(
+        'SELECT id, username, password_hash FROM employees WHERE username = ? AND is_active = 1',
+        (username,)
+    ).fetchone()
+
+def set_password_hash(conn, employee_id, password_hash):
+    conn.execute('UPDATE employees SET password_hash = ? WHERE id = ?', (password_hash, employee_id))
+
+def list_employees(conn):
+    """Every account, newest first"""
+    return conn.execute('''
+        SELECT e.id, e.employee_id, e.username, e.email, e.first_name, e.last_name,
+               e.department, e.position, e.is_active, e.created_at
+        FROM employees e
+        ORDER BY e.created_at DESC
+    ''').fetchall()
+
+def employee_choices(conn):
+    """Employees by name, for filter drop-downs"""
+    return conn.execute('''
+        SELECT id, employee_id, first_name, last_name FROM employees
+        ORDER BY last_name, first_name
+    ''').fetchall()
+
+def list_departments(conn):
+    return [row['department'] for row in conn.execute('''
+        SELECT DISTINCT department FROM employees
+        WHERE department IS NOT NULL AND department != ''
+        ORDER BY department
+    ''')]
+
+def get_employee(conn, employee_id):
+    return conn.execute('SELECT * FROM employees WHERE id = ?', (employee_id,)).fetchone()
+
+def username_or_email_taken(conn, username, email):
+    return conn.execute(
+        'SELECT id FROM employees WHERE username = ? OR email = ?',
+        (username, email)
+    ).fetchone() is not None
+
+def create_employee(conn, employee_code, username, email, password_hash, first_name, last_name,
+                    department, position):
+    """Insert an account, returning its id; the caller commits"""
+    return conn.execute('''
+        INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        RETURNING id
+    ''', (employee_code, username, email, password_hash, first_name, last_name, department, position)).fetchone()[0]
+
+def update_employee(conn, employee_id, email, first_name, last_name, department, position, is_active):
+    conn.execute('''
+        UPDATE employees
+        SET email = ?, first_name = ?, last_name = ?, department = ?, position = ?, is_active = ?
+        WHERE id = ?
+    ''', (email, first_name, last_name, department, position, is_active, employee_id))
+
+def deactivate_employee(conn, employee_id):
+    """Stop an account from logging in; its data is deleted by the delete_employee job"""
+    conn.execute('UPDATE employees SET is_active = 0 WHERE id = ?', (employee_id,))
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""Translations for the page templates
+
+TRANSLATIONS is compiled once per process into one flat catalog per
+language, with the English text filled in for keys a language lacks, so
+get_text() in a template is a single dict lookup. The catalog of a request
+is picked from the session once and reused by every render.
+"""
+from flask import g, session
+from .config import TRANSLATIONS
+
+DEFAULT_LANGUAGE = 'fr'
+FALLBACK_LANGUAGE = 'en'
+
+class Catalog(dict):
+    """Texts of one language; unknown keys are shown as themselves"""
+
+    def __missing__(self, key):
+        return key
+
+def compile_catalogs(translations):
+    """One Catalog per language, each complete with the fallback texts"""
+    fallback = translations[FALLBACK_LANGUAGE]
+    return {language: Catalog(fallback, **texts) for language, texts in translations.items()}
+
+CATALOGS = compile_catalogs(TRANSLATIONS)
+
+def get_language():
+    return session.get('language', DEFAULT_LANGUAGE)
+
+def get_catalog():
+    """Catalog of the current request's language"""
+    catalog = g.get('catalog')
+    if catalog is None:
+        catalog = g.catalog = CATALOGS.get(get_language(), CATALOGS[FALLBACK_LANGUAGE])
+    return catalog
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""Batch ingestion of badge reader events
+
+Readers post JSON lines, one event per line:
+
+    {"event_id": "reader-7:000123", "employee_id": "EMP001", "type": "check_in", "timestamp": "2024-03-04T08:57:12"}
+
+A batch is applied in one transaction. Events already recorded under the
+same event_id, rejected ones included, return their first result, so a
+reader can resend its whole buffer after a timeout. New events are
+replayed in timestamp order against the current check-ins and open work
+sessions with the same rules as /checkin and /checkout, and the resulting
+rows are written with a single executemany UPSERT.
+
+A reader that was offline sends events older than sessions recorded since
+by other readers or the web pages. Those sessions are then replayed too:
+the employee's sessions from the day of the first late event on are
+turned back into check-in and check-out events, merged with the new ones
+in timestamp order, and their days are derived again.
+"""
+import json
+from datetime import datetime
+from .archive import archived_months
+from .attendance import checkin_status
+from .cache import invalidate_employee_day
+from .config import INGEST_EVENT_RETENTION_DAYS
+from .dialects import dialect_of
+from .live import publish_events
+from .occupancy import (already_checked_in, as_datetime, index_for, is_forgotten, load_open_sessions,
+                        load_sessions_since, save_sessions, session_cutoff, session_hours)
+from .rollups import refresh_rollups_many
+from .schedules import departure_status, load_schedules
+
+EVENT_TYPES = ('check_in', 'check_out')
+
+DAY_KEY_COLUMNS = [('employee_id', 'INTEGER'), ('date', 'DATE')]
+
+INGEST_LOCK_KEY = 7306  # PostgreSQL advisory lock serializing batches
+
+UPSERT_CHECKIN_SQL = '''
+    INSERT INTO checkins (employee_id, date, check_in_time, check_out_time, worked_hours, status)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(employee_id, date) DO UPDATE SET
+        check_in_time = excluded.check_in_time,
+        check_out_time = excluded.check_out_time,
+        worked_hours = excluded.worked_hours,
+        status = excluded.status
+'''
+
+def parse_timestamp(value):
+    """Local naive datetime from an ISO 8601 string (offsets are converted)"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def parse_event(line):
+    """Return (event, error) for one JSON line"""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None, 'Invalid JSON'
+    if not isinstance(event, dict):
+        return None, 'Event must be an object'
+    if not event.get('event_id') or not isinstance(event['event_id'], str):
+        return event, 'Missing event_id'
+    if not event.get('employee_id'):
+        return event, 'Missing employee_id'
+    if event.get('type') not in EVENT_TYPES:
+        return event, f"type must be one of {', '.join(EVENT_TYPES)}"
+    try:
+        event['moment'] = parse_timestamp(str(event.get('timestamp')))
+    except ValueError:
+        return event, 'Invalid timestamp'
+    return event, None
+
+def result(event, outcome, message):
+    return {'event_id': event.get('event_id') if isinstance(event, dict) else None,
+            'result': outcome, 'message': message}
+
+def load_recorded(conn, event_ids):
+    """First results of already ingested events, by event_id"""
+    dialect = dialect_of(conn)
+    rows = conn.execute(f'''
+        SELECT event_id, result, message FROM ingest_events
+        WHERE {dialect.in_list('event_id', '?')}
+    ''', (dialect.list_param(event_ids),))
+    return {row['event_id']: (row['result'], row['message']) for row in rows}
+
+def load_employees(conn, codes):
+    """Active employees' primary keys by employee_id code"""
+    dialect = dialect_of(conn)
+    rows = conn.execute(f'''
+        SELECT id, employee_id FROM employees
+        WHERE is_active = 1 AND {dialect.in_list('employee_id', '?')}
+    ''', (dialect.list_param(codes),))
+    return {row['employee_id']: row['id'] for row in rows}
+
+def load_days(conn, keys):
+    """Current check-in rows for (employee pk, date) keys, locked until commit"""
+    dialect = dialect_of(conn)
+    rows = conn.execute(f'''
+        SELECT employee_id, date, check_in_time, check_out_time, worked_hours, status FROM checkins
+        WHERE (employee_id, date) IN ({dialect.rows_table('?', DAY_KEY_COLUMNS)}){dialect.for_update}
+    ''', (dialect.rows_param(keys, DAY_KEY_COLUMNS),))
+    return {(row['employee_id'], row['date']): dict(row) for row in rows}
+
+def session_events(session):
+    """The check-in and check-out events of a recorded session"""
+    started_at = as_datetime(session['started_at'])
+    events = [{'event_id': None, 'employee_pk': session['employee_id'], 'type': 'check_in',
+               'moment': started_at, 'date': session['checkin_date']}]
+    if session['ended_at']:
+        ended_at = as_datetime(session['ended_at'])
+        events.append({'event_id': None, 'employee_pk': session['employee_id'], 'type': 'check_out',
+                       'moment': ended_at, 'date': ended_at.date().isoformat()})
+    return events
+
+def apply_event(days, sessions, touched, event, schedule):
+    """Apply one event to the employee's open session and day rows
+
+    Returns (outcome, message, key of the changed day row or None). New,
+    closed and dropped sessions are appended to touched for save_sessions().
+    """
+    moment = event['moment']
+    timestamp = str(moment)
+    employee_pk = event['employee_pk']
+    session = sessions.get(employee_pk)
+    if session and (is_forgotten(session, moment, schedule) if event['type'] == 'check_in'
+                    else as_datetime(session['started_at']) < session_cutoff(moment)):
+        # A forgotten check-out, dropped as check_in_employee() does
+        session['dropped'] = True
+        if session['id']:
+            touched.append(session)
+        del sessions[employee_pk]
+        session = None
+
+    if event['type'] == 'check_in':
+        if session:
+            return 'ignored', already_checked_in(session, event['date']), None
+        key = (employee_pk, event['date'])
+        day = days.setdefault(key, {'check_in_time': None, 'check_out_time': None,
+                                    'worked_hours': None, 'status': None})
+        if day['check_out_time'] and timestamp < day['check_out_time']:
+            return 'rejected', 'Check-in is before the last check-out', None
+        session = {'id': None, 'employee_id': employee_pk, 'checkin_date': event['date'],
+                   'started_at': timestamp, 'ended_at': None, 'dropped': False}
+        sessions[employee_pk] = session
+        touched.append(session)
+        if not day['check_in_time']:
+            day['check_in_time'] = timestamp
+            day['status'] = checkin_status(moment, schedule)
+        else:
+            # Another session of the day
+            day['check_out_time'] = None
+            if day['status'] == 'early_leave':
+                day['status'] = 'on_time'
+        return 'applied', f'Checked in at {moment.strftime("%H:%M")}', key
+
+    if not session:
+        day = days.get((employee_pk, event['date']))
+        if day and day['check_out_time']:
+            return 'ignored', 'Already checked out today', None
+        return 'rejected', 'Must check in first', None
+    if timestamp < session['started_at']:
+        return 'rejected', 'Check-out is before check-in', None
+    session['ended_at'] = timestamp
+    if session['id']:
+        touched.append(session)
+    del sessions[employee_pk]
+    message = f'Checked out at {moment.strftime("%H:%M")}'
+    key = (employee_pk, session['checkin_date'])
+    day = days.get(key)
+    if day is None:
+        # The day's row was deleted or archived while the session was open
+        return 'applied', message, None
+    day['check_out_time'] = timestamp
+    day['worked_hours'] = (day['worked_hours'] or 0) + session_hours(session, moment)
+    if session['checkin_date'] == event['date']:
+        day['status'] = departure_status(schedule, moment, day['status'])
+    return 'applied', message, key
+
+def ingest_batch(conn, lines):
+    """Apply a batch of JSON line events, returning one result per line"""
+    results = [None] * len(lines)
+    events = []
+    for index, line in enumerate(lines):
+        event, error = parse_event(line)
+        if error:
+            results[index] = result(event, 'rejected', error)
+        else:
+            events.append((index, event))
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Batches replay events against what earlier batches wrote, so on
+        # PostgreSQL they still run one at a time
+        dialect_of(conn).lock_until_commit(conn, INGEST_LOCK_KEY)
+        recorded = load_recorded(conn, [event['event_id'] for _, event in events])
+        employees = load_employees(conn, sorted({str(event['employee_id']) for _, event in events}))
+        archived = {month for month, _ in archived_months(conn)}
+
+        pending = []
+        first_in_batch = {}
+        log_rows = []
+        for index, event in events:
+            event_id = event['event_id']
+            if event_id in recorded:
+                outcome, message = recorded[event_id]
+                results[index] = dict(result(event, outcome, message), duplicate=True)
+                continue
+            if event_id in first_in_batch:
+                first_in_batch[event_id][1].append(index)
+                continue
+            first_in_batch[event_id] = (index, [])
+            employee_pk = employees.get(str(event['employee_id']))
+            if employee_pk is None:
+                rejection = 'Unknown or inactive employee'
+            elif event['moment'].strftime('%Y-%m') in archived:
+                rejection = 'Month is archived'
+            else:
+                event['employee_pk'] = employee_pk
+                event['date'] = event['moment'].date().isoformat()
+                pending.append((index, event))
+                continue
+            results[index] = result(event, 'rejected', rejection)
+            log_rows.append((event_id, employee_pk, event['type'], str(event['moment']), 'rejected', rejection))
+
+        employee_pks = sorted({e['employee_pk'] for _, e in pending})
+        sessions = load_open_sessions(conn, employee_pks)
+        since = {}
+        for _, event in pending:
+            since[event['employee_pk']] = min(since.get(event['employee_pk'], event['moment']), event['moment'])
+        replayed = load_sessions_since(conn, since)
+        touched = []
+        for session in replayed:
+            sessions.pop(session['employee_id'], None)
+            session['dropped'] = True
+            touched.append(session)
+            pending += [(None, event) for event in session_events(session)]
+        rederived = {(session['employee_id'], session['checkin_date']) for session in replayed}
+        # A check-out updates the day of its session's check-in
+        days = load_days(conn, sorted({(e['employee_pk'], e['date']) for _, e in pending}
+                                      | {(pk, session['checkin_date']) for pk, session in sessions.items()}
+                                      | rederived))
+        for key in rederived:
+            days[key] = {'check_in_time': None, 'check_out_time': None, 'worked_hours': None, 'status': None}
+        schedules = load_schedules(conn, employee_pks)
+        changed = set(rederived)
+        # Recorded sessions go first at equal times
+        for index, event in sorted(pending, key=lambda item: (item[1]['moment'], item[0] is not None, item[0] or 0)):
+            outcome, message, key = apply_event(days, sessions, touched, event, schedules[event['employee_pk']])
+            if key:
+                changed.add(key)
+            if index is None:
+                continue
+            results[index] = result(event, outcome, message)
+            log_rows.append((event['event_id'], event['employee_pk'], event['type'],
+                             str(event['moment']), outcome, message))
+        for first, duplicates in first_in_batch.values():
+            for duplicate_index in duplicates:
+                results[duplicate_index] = dict(results[first], duplicate=True)
+
+        changed = sorted(changed)
+        save_sessions(conn, touched)
+        conn.executemany(UPSERT_CHECKIN_SQL, [
+            (employee_pk, day, days[(employee_pk, day)]['check_in_time'], days[(employee_pk, day)]['check_out_time'],
+             days[(employee_pk, day)]['worked_hours'], days[(employee_pk, day)]['status'])
+            for employee_pk, day in changed
+        ])
+        conn.executemany('''
+            INSERT INTO ingest_events (event_id, employee_id, event_type, occurred_at, result, message)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', log_rows)
+        conn.execute(
+            f"DELETE FROM ingest_events WHERE received_at < {dialect_of(conn).shifted_now('?')}",
+            (f'-{int(INGEST_EVENT_RETENTION_DAYS)} days',)
+        )
+        refresh_rollups_many(conn, changed)
+        publish_events(conn, [('ingest', employee_pk, day) for employee_pk, day in changed])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if touched:
+        index_for(conn).mark_stale()
+    for employee_pk, day in changed:
+        invalidate_employee_day(employee_pk, day)
+    return results
+
+def summarize(results):
+    """Count of results per outcome, duplicates counted apart"""
+    summary = {'applied': 0, 'ignored': 0, 'rejected': 0, 'duplicate': 0}
+    for entry in results:
+        summary['duplicate' if entry.get('duplicate') else entry['result']] += 1
+    return summary
\ No newline at end of file
@@ -0,0 +1,357 @@
+"""Opt-in request instrumentation (INSTRUMENTATION_ENABLED)
+
+Every request is split into database, template and remaining Python time,
+returned in a Server-Timing header and aggregated into Prometheus metrics.
+Database time comes from InstrumentedConnection, which the pool uses as its
+connection class while instrumentation is on; statements slower than
+SLOW_QUERY_MS are logged with their EXPLAIN QUERY PLAN.
+
+Each gunicorn worker keeps its own counters and periodically writes them to
+METRICS_DIR; /metrics sums the files of all workers (and of exited workers,
+archived by the child_exit hook) so the counters cover the whole server.
+
+Routes listed in PROFILE_ROUTES are sampled every PROFILE_INTERVAL_MS and
+their stacks appended to PROFILE_DIR/<endpoint>.folded, the folded format
+read by flamegraph.pl and speedscope.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from flask import Response, request, before_render_template, template_rendered
+from .config import (
+    SLOW_QUERY_MS, METRICS_DIR, METRICS_FLUSH_SECONDS, PROFILE_ROUTES, PROFILE_DIR,
+    PROFILE_INTERVAL_MS
+)
+from .database import PooledConnection
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_WHITESPACE = re.compile(r'\s+')
+_local = threading.local()
+
+class RequestTimings:
+    """Time spent by one request, filled in while it runs"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.queries = 0
+        self.template_starts = []
+
+def current_timings():
+    return getattr(_local, 'timings', None)
+
+# Statement timing
+
+def normalize_sql(sql):
+    return _WHITESPACE.sub(' ', sql).strip()
+
+class InstrumentedConnection(PooledConnection):
+    """Pooled connection that times every statement run through it
+
+    Only statements run with the connection's execute(), executemany() and
+    commit() are timed; cursors obtained with cursor() are not.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return PooledConnection.execute(self, sql, parameters)
+        finally:
+            record_statement(self, sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return PooledConnection.executemany(self, sql, seq_of_parameters)
+        finally:
+            record_statement(self, sql, None, time.perf_counter() - started)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return PooledConnection.commit(self)
+        finally:
+            record_statement(self, 'COMMIT', None, time.perf_counter() - started)
+
+def record_statement(conn, sql, parameters, elapsed):
+    timings = current_timings()
+    if timings is not None:
+        timings.db_time += elapsed
+        timings.queries += 1
+    metrics.observe('checkin_db_statement_duration_seconds', {}, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        log_slow_query(conn, sql, parameters, elapsed)
+
+def log_slow_query(conn, sql, parameters, elapsed):
+    metrics.increment('checkin_db_slow_statements_total', {})
+    plan = []
+    statement = normalize_sql(sql)
+    if parameters is not None and statement.split(' ', 1)[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        try:
+            plan = [row[3] for row in PooledConnection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters)]
+        except Exception as exc:
+            plan = [f'(plan unavailable: {exc})']
+    endpoint = request.endpoint if current_timings() is not None else None
+    logger.warning('slow query %.1f ms [%s]: %s\n  plan: %s', elapsed * 1000, endpoint or '-',
+                   statement, '\n        '.join(plan) or '-')
+
+# Metrics
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+class Metrics:
+    """Counters and histograms of this process, keyed by 'name{labels}'"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def increment(self, name, labels, amount=1):
+        key = name + _labels(labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = name + _labels(labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: dict(h, buckets=list(h['buckets'])) for key, h in self.histograms.items()}
+            }
+
+    def flush(self, force=False):
+        """Write this worker's counters to METRICS_DIR"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = worker_metrics_path(os.getpid())
+        with open(path + '.tmp', 'w') as metrics_file:
+            json.dump(self.snapshot(), metrics_file)
+        os.replace(path + '.tmp', path)
+
+metrics = Metrics()
+
+def worker_metrics_path(pid):
+    return os.path.join(METRICS_DIR, f'worker-{pid}.json')
+
+def merge_snapshots(snapshots):
+    merged = {'counters': {}, 'histograms': {}}
+    for snapshot in snapshots:
+        for key, value in snapshot['counters'].items():
+            merged['counters'][key] = merged['counters'].get(key, 0) + value
+        for key, histogram in snapshot['histograms'].items():
+            total = merged['histograms'].setdefault(
+                key, {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return merged
+
+def _read_snapshot(path):
+    try:
+        with open(path) as metrics_file:
+            return json.load(metrics_file)
+    except (OSError, ValueError):
+        return None
+
+def archive_worker(pid):
+    """Fold an exited worker's counters into the archive (gunicorn child_exit)"""
+    path = worker_metrics_path(pid)
+    snapshot = _read_snapshot(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(METRICS_DIR, 'archive.json')
+    with open(os.path.join(METRICS_DIR, 'archive.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        archived = _read_snapshot(archive_path) or {'counters': {}, 'histograms': {}}
+        with open(archive_path + '.tmp', 'w') as archive_file:
+            json.dump(merge_snapshots([archived, snapshot]), archive_file)
+        os.replace(archive_path + '.tmp', archive_path)
+        os.unlink(path)
+
+def reset_metrics():
+    """Forget the counters of a previous server run (gunicorn on_starting)"""
+    if os.path.isdir(METRICS_DIR):
+        for name in os.listdir(METRICS_DIR):
+            os.unlink(os.path.join(METRICS_DIR, name))
+
+def collect_metrics():
+    """Counters of every worker of this server, merged"""
+    metrics.flush(force=True)
+    snapshots = []
+    if os.path.isdir(METRICS_DIR):
+        for name in os.listdir(METRICS_DIR):
+            if name.endswith('.json'):
+                snapshot = _read_snapshot(os.path.join(METRICS_DIR, name))
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+def render_prometheus(merged):
+    """Prometheus text exposition format"""
+    lines = []
+    typed = set()
+    for key, value in sorted(merged['counters'].items()):
+        name = key.split('{', 1)[0]
+        if name not in typed:
+            lines.append(f'# TYPE {name} counter')
+            typed.add(name)
+        lines.append(f'{key} {value}')
+    for key, histogram in sorted(merged['histograms'].items()):
+        name, _, labels = key.partition('{')
+        labels = labels.rstrip('}')
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        prefix = labels + ',' if labels else ''
+        for bound, count in zip(DURATION_BUCKETS, histogram['buckets']):
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+        suffix = '{' + labels + '}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {histogram["sum"]}')
+        lines.append(f'{name}_count{suffix} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+# Sampling profiler
+
+class Sampler:
+    """Samples the stacks of registered request threads from one background thread"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._stacks:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[folded_stack(frame)] += 1
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+
+def write_profile(endpoint, stacks):
+    if not stacks:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f'{endpoint}.folded'), 'a') as profile_file:
+        fcntl.flock(profile_file, fcntl.LOCK_EX)
+        profile_file.writelines(f'{stack} {count}\n' for stack, count in stacks.items())
+
+# Flask wiring
+
+def _template_started(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings.template_starts.append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings.template_starts:
+        elapsed = time.perf_counter() - timings.template_starts.pop()
+        # Nested renders are already counted by the outer one
+        if not timings.template_starts:
+            timings.template_time += elapsed
+
+def init_instrumentation(app):
+    """Register request timing, template signals, /metrics and the profiler"""
+
+    @app.before_request
+    def start_timing():
+        _local.timings = RequestTimings()
+        if request.endpoint in PROFILE_ROUTES:
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def record_timing(response):
+        timings = current_timings()
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        python_time = max(0.0, total - timings.db_time - timings.template_time)
+        endpoint = request.endpoint or 'unknown'
+        labels = {'endpoint': endpoint}
+
+        metrics.increment('checkin_http_requests_total',
+                          {'endpoint': endpoint, 'method': request.method, 'status': response.status_code})
+        metrics.observe('checkin_http_request_duration_seconds', labels, total)
+        metrics.increment('checkin_http_db_seconds_total', labels, timings.db_time)
+        metrics.increment('checkin_http_template_seconds_total', labels, timings.template_time)
+        metrics.increment('checkin_http_python_seconds_total', labels, python_time)
+        metrics.increment('checkin_http_db_statements_total', labels, timings.queries)
+
+        response.headers['Server-Timing'] = (
+            f'db;dur={timings.db_time * 1000:.2f};desc="{timings.queries} statements", '
+            f'tpl;dur={timings.template_time * 1000:.2f}, '
+            f'app;dur={python_time * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+        return response
+
+    @app.teardown_request
+    def finish_timing(exception=None):
+        _local.timings = None
+        if request.endpoint in PROFILE_ROUTES:
+            write_profile(request.endpoint, sampler.stop(threading.get_ident()))
+        metrics.flush()
+
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(render_prometheus(collect_metrics()), mimetype='text/plain; version=0.0.4')
\ No newline at end of file
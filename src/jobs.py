@@ -0,0 +1,479 @@
+"""Durable background jobs
+
+Heavy admin operations are queued in the jobs table and run by a worker
+process (python -m src.jobs worker), never in a request. Handlers work in
+short BEGIN IMMEDIATE transactions of JOB_CHUNK_ROWS rows, so check-in
+writers wait at most one chunk for the write lock. Every chunk records its
+progress and a heartbeat. Handlers can be resumed: a job whose worker died
+or was stopped goes back to the queue and carries on from what is left.
+In multi-tenant mode one worker serves the queue of every tenant.
+
+Usage:
+    python -m src.jobs worker [--once] [--db checkin_system.db]
+    python -m src.jobs list [--db checkin_system.db | --tenant acme]
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from .archive import delete_archived_employee, unlist_archives
+from .cache import invalidate_all
+from .config import (
+    DB_PATH, EXPORT_BATCH_ROWS, EXPORT_RETENTION_HOURS, JOB_POLL_SECONDS, JOB_CHUNK_ROWS,
+    JOB_CHUNK_EMPLOYEES, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETENTION_DAYS
+)
+from .dialects import dialect_of
+from .live import publish_event
+from .rollups import rebuild_rollups, delete_employee_rollups
+from .tenants import tenants_enabled, list_tenants, tenant_context, tenant_exists, tenant_export_dir
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS_SQL = '''
+    id, kind, params, status, progress, total, result, error, attempts,
+    created_at, started_at, finished_at
+'''
+
+HANDLERS = {}
+
+def job_handler(kind):
+    """Register a function(conn, job) as the handler of a job kind"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+class WorkerStopping(Exception):
+    """Raised at a chunk boundary when the worker is asked to stop"""
+
+def enqueue(conn, kind, params=None):
+    """Queue a job and return its id; the caller commits"""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind}')
+    return conn.execute(
+        'INSERT INTO jobs (kind, params) VALUES (?, ?) RETURNING id',
+        (kind, json.dumps(params or {}))
+    ).fetchone()[0]
+
+def job_row(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def get_job(conn, job_id):
+    row = conn.execute(f'SELECT {JOB_COLUMNS_SQL} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return job_row(row) if row else None
+
+def list_jobs(conn, limit=100, kind=None):
+    """Most recent jobs, newest first"""
+    rows = conn.execute(f'''
+        SELECT {JOB_COLUMNS_SQL} FROM jobs
+        WHERE :kind IS NULL OR kind = :kind
+        ORDER BY id DESC LIMIT :limit
+    ''', {'kind': kind, 'limit': limit})
+    return [job_row(row) for row in rows]
+
+def claim(conn, worker_name):
+    """Take the oldest queued job, first requeueing jobs whose worker went silent"""
+    dialect = dialect_of(conn)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        stale = f'-{int(JOB_STALE_SECONDS)} seconds'
+        conn.execute(f'''
+            UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND heartbeat_at < {dialect.shifted_now('?')} AND attempts >= ?
+        ''', (stale, JOB_MAX_ATTEMPTS))
+        conn.execute(f'''
+            UPDATE jobs SET status = 'queued'
+            WHERE status = 'running' AND heartbeat_at < {dialect.shifted_now('?')}
+        ''', (stale,))
+        # Workers on other nodes skip the job this one is claiming (PostgreSQL)
+        row = conn.execute(f'''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,
+                started_at = COALESCE(started_at, CURRENT_TIMESTAMP), heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1{dialect.skip_locked})
+            AND status = 'queued'
+            RETURNING {JOB_COLUMNS_SQL}
+        ''', (worker_name,)).fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return job_row(row) if row else None
+
+class Job:
+    """A claimed job as seen by its handler"""
+
+    def __init__(self, conn, row, stop_event):
+        self.conn = conn
+        self.id = row['id']
+        self.kind = row['kind']
+        self.params = row['params']
+        self.done = row['progress']
+        self._stop_event = stop_event
+
+    def check_stop(self):
+        if self._stop_event.is_set():
+            raise WorkerStopping()
+
+    def progress(self, done, total=None):
+        """Record progress and a heartbeat
+
+        Inside a transaction the update commits with it, so progress is
+        never ahead of the work; otherwise it is committed on its own.
+        """
+        self.done = done
+        in_transaction = self.conn.in_transaction
+        self.conn.execute('''
+            UPDATE jobs SET progress = ?, total = COALESCE(?, total), heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (done, total, self.id))
+        if not in_transaction:
+            self.conn.commit()
+
+def run_job(conn, row, stop_event):
+    """Run one claimed job and record how it ended; returns the final status"""
+    job = Job(conn, row, stop_event)
+    try:
+        result = HANDLERS[job.kind](conn, job)
+    except WorkerStopping:
+        conn.rollback()
+        conn.execute("UPDATE jobs SET status = 'queued', attempts = attempts - 1 WHERE id = ?", (job.id,))
+        conn.commit()
+        return 'queued'
+    except Exception as exc:
+        logger.exception('job %s (%s) failed', job.id, job.kind)
+        conn.rollback()
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (f'{type(exc).__name__}: {exc}', job.id))
+        conn.commit()
+        return 'failed'
+    conn.execute('''
+        UPDATE jobs SET status = 'done', result = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+    ''', (json.dumps(result), job.id))
+    conn.commit()
+    return 'done'
+
+def prune_jobs(conn):
+    """Forget finished jobs after JOB_RETENTION_DAYS and export files after EXPORT_RETENTION_HOURS"""
+    dialect = dialect_of(conn)
+    for row in conn.execute(f'''
+        SELECT result FROM jobs
+        WHERE kind IN ('attendance_export', 'billing_export') AND status = 'done'
+        AND finished_at < {dialect.shifted_now('?')}
+    ''', (f'-{int(EXPORT_RETENTION_HOURS)} hours',)).fetchall():
+        path = export_path(json.loads(row['result']))
+        if path and os.path.exists(path):
+            os.unlink(path)
+    conn.execute(f'''
+        DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < {dialect.shifted_now('?')}
+    ''', (f'-{int(JOB_RETENTION_DAYS)} days',))
+    conn.commit()
+
+def run_worker(db_path=None, once=False, stop_event=None):
+    """Run queued jobs until stop_event is set (or the queue is empty, with once)
+
+    Without db_path in multi-tenant mode, each round takes at most one job
+    from every tenant in turn, so a long queue never starves the others.
+    """
+    from .database import get_pool, current_pool
+
+    stop_event = stop_event or threading.Event()
+    worker_name = f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    pruned_at = {}
+    while not stop_event.is_set():
+        ran = False
+        for tenant in list_tenants() if tenants_enabled() and not db_path else [None]:
+            if stop_event.is_set():
+                break
+            with tenant_context(tenant):
+                conn = get_pool(db_path).acquire() if db_path else current_pool().acquire()
+                try:
+                    if time.monotonic() - pruned_at.get(tenant, 0.0) > 3600:
+                        pruned_at[tenant] = time.monotonic()
+                        prune_jobs(conn)
+                    row = claim(conn, worker_name)
+                    if row is not None:
+                        ran = True
+                        logger.info('job %s (%s) started%s', row['id'], row['kind'],
+                                    f' for {tenant}' if tenant else '')
+                        status = run_job(conn, row, stop_event)
+                        logger.info('job %s (%s) %s', row['id'], row['kind'], status)
+                finally:
+                    conn.close()
+        if not ran:
+            if once:
+                break
+            stop_event.wait(JOB_POLL_SECONDS)
+
+_worker_thread = None
+_worker_thread_lock = threading.Lock()
+
+def start_worker_thread(db_path=None):
+    """Run a worker in a daemon thread of this process (single-container setups)
+
+    Does nothing while the thread runs; threads are not inherited through
+    fork(), so a forked worker starts its own.
+    """
+    global _worker_thread
+    with _worker_thread_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=run_worker, args=(db_path,), name='job-worker', daemon=True)
+            _worker_thread.start()
+    return _worker_thread
+
+def chunked_delete(conn, job, where_sql, params):
+    """Delete matching check-ins JOB_CHUNK_ROWS at a time, one transaction each"""
+    deleted = job.done
+    while True:
+        job.check_stop()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(f'''
+                DELETE FROM checkins WHERE id IN (
+                    SELECT id FROM checkins WHERE {where_sql} LIMIT :chunk
+                )
+            ''', dict(params, chunk=JOB_CHUNK_ROWS)).rowcount
+            deleted += count
+            job.progress(deleted)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if count < JOB_CHUNK_ROWS:
+            return deleted
+
+@job_handler('purge_checkins')
+def purge_checkins(conn, job):
+    """Delete every check-in that existed when the purge was requested"""
+    job.progress(job.done, conn.execute(
+        'SELECT COUNT(*) FROM checkins WHERE id <= ?', (job.params['max_id'],)).fetchone()[0] + job.done)
+    deleted = chunked_delete(conn, job, 'id <= :max_id', {'max_id': job.params['max_id']})
+
+    # Only check-ins recorded after the request remain, so this rebuild is short
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        archives, archived = unlist_archives(conn)
+        conn.execute('''
+            DELETE FROM work_sessions WHERE NOT EXISTS (
+                SELECT 1 FROM checkins c
+                WHERE c.employee_id = work_sessions.employee_id AND c.date = work_sessions.checkin_date
+            )
+        ''')
+        rebuild_rollups(conn)
+        publish_event(conn, 'reset', None, date.today())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for path in archives:
+        if os.path.exists(path):
+            os.unlink(path)
+    invalidate_all()
+    return {'deleted': deleted + archived}
+
+@job_handler('delete_employee')
+def delete_employee(conn, job):
+    """Delete an employee (deactivated when queued) and all their data"""
+    employee_id = job.params['employee_id']
+    job.progress(job.done, conn.execute(
+        'SELECT COUNT(*) FROM checkins WHERE employee_id = ?', (employee_id,)).fetchone()[0] + job.done)
+    deleted = chunked_delete(conn, job, 'employee_id = :employee_id', {'employee_id': employee_id})
+    deleted += delete_archived_employee(conn, employee_id)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM billing_rates WHERE employee_id = ?', (employee_id,))
+        conn.execute('DELETE FROM work_schedules WHERE employee_id = ?', (employee_id,))
+        conn.execute('DELETE FROM work_sessions WHERE employee_id = ?', (employee_id,))
+        delete_employee_rollups(conn, employee_id)
+        conn.execute('DELETE FROM employees WHERE id = ?', (employee_id,))
+        publish_event(conn, 'reset', None, date.today())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_all()
+    return {'deleted': deleted}
+
+@job_handler('rebuild_rollups')
+def rebuild_all_rollups(conn, job):
+    """Rebuild the report rollups JOB_CHUNK_EMPLOYEES employees at a time"""
+    employee_ids = [row[0] for row in conn.execute('SELECT id FROM employees ORDER BY id')]
+    job.progress(job.done, len(employee_ids))
+    for index in range(job.done, len(employee_ids), JOB_CHUNK_EMPLOYEES):
+        job.check_stop()
+        batch = employee_ids[index:index + JOB_CHUNK_EMPLOYEES]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rebuild_rollups(conn, batch)
+            job.progress(index + len(batch))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    # Rollups of employees deleted since are no longer needed
+    conn.execute('DELETE FROM attendance_rollups WHERE employee_id NOT IN (SELECT id FROM employees)')
+    conn.commit()
+    invalidate_all()
+    return {'employees': len(employee_ids)}
+
+@job_handler('reevaluate_statuses')
+def reevaluate(conn, job):
+    """Recompute check-in statuses one month per transaction (see src/schedules.py)"""
+    from .schedules import reevaluate_statuses
+
+    start = date.fromisoformat(job.params['start_date'])
+    end = date.fromisoformat(job.params['end_date'])
+    months = []
+    month_start = start
+    while month_start <= end:
+        next_month = (month_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        months.append((month_start, min(end, next_month - timedelta(days=1))))
+        month_start = next_month
+
+    changed = 0
+    job.progress(job.done, len(months))
+    for index in range(job.done, len(months)):
+        job.check_stop()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            changed += reevaluate_statuses(conn, *months[index], job.params.get('employee_ids'))
+            job.progress(index + 1)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        publish_event(conn, 'reset', None, date.today())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_all()
+    return {'months': len(months), 'changed': changed}
+
+def export_path(result):
+    return os.path.join(tenant_export_dir(), result['file']) if result and result.get('file') else None
+
+@job_handler('attendance_export')
+def attendance_export(conn, job):
+    """Write an attendance export to EXPORT_DIR (a directory per tenant)
+
+    The rows are read on a second connection: a read cursor and the
+    progress writes on one connection would hold the write lock for the
+    whole export.
+    """
+    from . import attendance_export as export
+
+    params = job.params
+    export_dir = tenant_export_dir()
+    os.makedirs(export_dir, exist_ok=True)
+    filename = export.export_filename(params['start_date'], params['end_date'], params['format'], params['gzip'])
+    file_name = f'job-{job.id}-{filename}'
+
+    reader = conn.pool.acquire()
+    try:
+        total = export.count_attendance_rows(reader, params['start_date'], params['end_date'],
+                                             params['employee_codes'], params['department'])
+        job.progress(0, total)
+        rows = export.iter_attendance_rows(reader, params['start_date'], params['end_date'],
+                                           params['employee_codes'], params['department'],
+                                           params['details'], params['rates'])
+
+        def counted(rows):
+            for count, row in enumerate(rows, 1):
+                if count % EXPORT_BATCH_ROWS == 0:
+                    job.check_stop()
+                    job.progress(count)
+                yield row
+            job.progress(total)
+
+        columns = export.export_columns(params['details'], params['rates'])
+        size = export.write_export(
+            export.iter_export(counted(rows), params['format'], columns, params['gzip']),
+            os.path.join(export_dir, file_name))
+    finally:
+        reader.close()
+    return {'file': file_name, 'filename': filename, 'rows': total, 'bytes': size,
+            'mimetype': export.export_mimetype(params['format'], params['gzip'])}
+
+@job_handler('billing_export')
+def billing_export(conn, job):
+    """Write a company-wide billing export to EXPORT_DIR (a directory per tenant)
+
+    Batches of employees are billed on connections of their own, in a
+    process pool for long periods (see src/billing_export.py).
+    """
+    from . import billing_export as export
+    from .attendance_export import write_export
+
+    params = job.params
+    export_dir = tenant_export_dir()
+    os.makedirs(export_dir, exist_ok=True)
+    mimetype, extension = export.EXPORT_FORMATS[params['format']]
+    filename = f"billing_{params['start_date']}_{params['end_date']}.{extension}"
+    file_name = f'job-{job.id}-{filename}'
+    path = os.path.join(export_dir, file_name)
+
+    def progress(done, total):
+        job.check_stop()
+        job.progress(done, total)
+
+    rows = export.iter_billing_rows(date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date']),
+                                    params['employee_ids'], params['department'],
+                                    db_path=conn.pool.path, progress=progress)
+    if params['format'] == 'xlsx':
+        export.write_xlsx(rows, path + '.part')
+        os.replace(path + '.part', path)
+        size = os.path.getsize(path)
+    else:
+        size = write_export(export.iter_export(rows, params['format']), path)
+    return {'file': file_name, 'filename': filename, 'employees': job.done, 'bytes': size,
+            'mimetype': mimetype}
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m src.jobs', description='Background job worker')
+    parser.add_argument('command', choices=['worker', 'list'])
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--db', help=f'database file (default: {DB_PATH}, or every tenant with TENANT_DATA_DIR)')
+    parser.add_argument('--tenant', help='tenant whose jobs to list')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        from .database import get_pool, current_pool
+        if args.tenant and not tenant_exists(args.tenant):
+            parser.error(f'Unknown tenant {args.tenant}')
+        if tenants_enabled() and not (args.tenant or args.db):
+            parser.error('list needs --tenant or --db in multi-tenant mode')
+        with tenant_context(args.tenant):
+            conn = get_pool(args.db).acquire() if args.db else current_pool().acquire()
+        try:
+            for job in list_jobs(conn):
+                total = f"/{job['total']}" if job['total'] is not None else ''
+                print(f"{job['id']:>6} {job['kind']:<20} {job['status']:<8} {job['progress']}{total}"
+                      f"  {job['created_at']}  {job['error'] or ''}")
+        finally:
+            conn.close()
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    stop_event = threading.Event()
+    # Stop at the next chunk boundary; the interrupted job is requeued
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    run_worker(args.db, once=args.once, stop_event=stop_event)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
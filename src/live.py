@@ -0,0 +1,230 @@
+"""Live attendance board for admins
+
+Check-in and check-out write a row to the attendance_events outbox in the
+same transaction as the change (publish_event). Each process keeps one
+LiveBoard: today's board in memory plus a ring buffer of recent events,
+brought up to date by a single indexed query on the outbox however many
+admins are watching. Streams are Server-Sent Events; event ids are outbox
+ids, so a reconnecting EventSource resumes from Last-Event-ID.
+
+Under ASGI, LiveHub polls the outbox from one task per process and pushes
+events to every open stream. Under WSGI, the stream route returns what is
+pending and closes, and the browser reconnects after LIVE_RETRY_MS, so no
+sync worker is held by an idle dashboard.
+
+In multi-tenant mode each tenant has its own board and hub (get_live_hub).
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date
+from .config import LIVE_POLL_SECONDS, LIVE_BUFFER_SIZE, LIVE_QUEUE_SIZE, LIVE_EVENT_RETENTION_DAYS
+from .dialects import dialect_of
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+EVENTS_LOCK_KEY = 7305  # PostgreSQL advisory lock ordering outbox inserts
+
+BOARD_COLUMNS_SQL = '''
+    e.id, e.employee_id, e.first_name, e.last_name, e.department,
+    substr(CAST(c.check_in_time AS TEXT), 12, 5) AS check_in,
+    substr(CAST(c.check_out_time AS TEXT), 12, 5) AS check_out,
+    c.status
+'''
+
+def publish_event(conn, event_type, employee_id, day):
+    """Queue a board event; call before committing the change it describes
+
+    event_type is 'check_in', 'check_out', 'ingest' (badge reader batches),
+    'schedule' (for caches; boards skip it) or 'reset' (bulk changes, which
+    make every board reload).
+    """
+    publish_events(conn, [(event_type, employee_id, day)])
+
+def publish_events(conn, events):
+    """Queue many (event_type, employee_id, day) board events at once"""
+    # Boards read past the highest id they saw, so ids must become visible
+    # in order: concurrent PostgreSQL writers take turns until they commit
+    dialect_of(conn).lock_until_commit(conn, EVENTS_LOCK_KEY)
+    conn.executemany(
+        'INSERT INTO attendance_events (event_type, employee_id, date) VALUES (?, ?, ?)',
+        events
+    )
+
+def prune_events(conn):
+    """Drop outbox rows older than LIVE_EVENT_RETENTION_DAYS"""
+    conn.execute(
+        f"DELETE FROM attendance_events WHERE created_at < {dialect_of(conn).shifted_now('?')}",
+        (f'-{int(LIVE_EVENT_RETENTION_DAYS)} days',)
+    )
+    conn.commit()
+
+def board_row(row):
+    return {
+        'id': row['id'],
+        'employee_id': row['employee_id'],
+        'name': f"{row['first_name']} {row['last_name']}",
+        'department': row['department'],
+        'check_in': row['check_in'],
+        'check_out': row['check_out'],
+        'status': row['status']
+    }
+
+def format_sse(event):
+    """Encode a board event as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+class LiveBoard:
+    """Today's board and recent events of this process"""
+
+    def __init__(self, buffer_size=LIVE_BUFFER_SIZE):
+        self.day = None
+        self.rows = {}
+        self.last_id = 0
+        self.events = deque(maxlen=buffer_size)
+        # Clients that saw this event id or a later one can resume from the buffer
+        self.buffered_from = 0
+        self._lock = threading.RLock()
+        self._refreshed_at = 0.0
+        self._pruned_at = 0.0
+
+    def _load(self, conn, day):
+        self.last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance_events').fetchone()[0]
+        rows = conn.execute(f'''
+            SELECT {BOARD_COLUMNS_SQL}
+            FROM checkins c
+            JOIN employees e ON c.employee_id = e.id
+            WHERE c.date = ?
+            ORDER BY c.check_in_time
+        ''', (day,)).fetchall()
+        self.day = day
+        self.rows = {row['id']: board_row(row) for row in rows}
+        self.events.clear()
+        self.buffered_from = self.last_id
+
+    def snapshot(self):
+        with self._lock:
+            return {'id': self.last_id, 'type': 'snapshot',
+                    'data': {'date': self.day, 'rows': list(self.rows.values())}}
+
+    def refresh(self, conn, max_age=0):
+        """Apply outbox events committed since the last refresh
+
+        A new day or a 'reset' event reloads the whole board, which clients
+        then receive as a 'snapshot' event. Refreshes younger than max_age
+        seconds are skipped.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._refreshed_at < max_age:
+                return
+            self._refreshed_at = now
+
+            today = date.today().isoformat()
+            if self.day != today:
+                self._load(conn, today)
+                return
+
+            rows = conn.execute(f'''
+                SELECT ev.id AS event_id, ev.event_type, ev.date, {BOARD_COLUMNS_SQL}
+                FROM attendance_events ev
+                LEFT JOIN employees e ON ev.employee_id = e.id
+                LEFT JOIN checkins c ON c.employee_id = ev.employee_id AND c.date = ev.date
+                WHERE ev.id > ?
+                ORDER BY ev.id
+            ''', (self.last_id,)).fetchall()
+            if any(row['event_type'] == 'reset' for row in rows):
+                self._load(conn, today)
+                return
+
+            for row in rows:
+                self.last_id = row['event_id']
+                if row['date'] != today or row['id'] is None or row['event_type'] == 'schedule':
+                    continue
+                self.rows[row['id']] = board_row(row)
+                event = {'id': row['event_id'], 'type': 'update', 'data': self.rows[row['id']]}
+                if len(self.events) == self.events.maxlen:
+                    self.buffered_from = self.events[0]['id']
+                self.events.append(event)
+
+            if now - self._pruned_at > 3600:
+                self._pruned_at = now
+                prune_events(conn)
+
+    def events_since(self, last_event_id):
+        """Events a client that saw last_event_id is missing"""
+        with self._lock:
+            if last_event_id == self.last_id:
+                return []
+            if last_event_id is None or not self.buffered_from <= last_event_id < self.last_id:
+                # New client, or older than the buffer: send the full board
+                return [self.snapshot()]
+            return [event for event in self.events if event['id'] > last_event_id]
+
+live_board = LiveBoard()
+
+class LiveHub:
+    """Pushes board events to the open async streams of this process"""
+
+    def __init__(self, board):
+        self.board = board
+        self.subscribers = {}
+        self._task = None
+
+    def subscribe(self, last_event_id=None):
+        """Queue receiving the events after last_event_id, then live ones"""
+        # Only the ASGI server needs asyncio; sync workers never import it
+        import asyncio
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.subscribers[queue] = last_event_id
+        self._push(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    def _push(self, queue):
+        for event in self.board.events_since(self.subscribers[queue]):
+            if queue.full():
+                # The client fell behind: drop its backlog and resend the board
+                while not queue.empty():
+                    queue.get_nowait()
+                event = self.board.snapshot()
+                queue.put_nowait(event)
+                self.subscribers[queue] = event['id']
+                return
+            queue.put_nowait(event)
+            self.subscribers[queue] = event['id']
+
+    async def _poll(self):
+        import asyncio
+        from .async_db import run_db
+        while self.subscribers:
+            await asyncio.sleep(LIVE_POLL_SECONDS)
+            try:
+                await run_db(self.board.refresh)
+            except Exception:
+                logger.exception('live board refresh failed')
+                continue
+            for queue in list(self.subscribers):
+                self._push(queue)
+
+live_hub = LiveHub(live_board)
+_tenant_hubs = {}
+_tenant_hubs_lock = threading.Lock()
+
+def get_live_hub():
+    """The hub, and through hub.board the board, of the current tenant"""
+    tenant = current_tenant()
+    if tenant is None:
+        return live_hub
+    hub = _tenant_hubs.get(tenant)
+    if hub is None:
+        with _tenant_hubs_lock:
+            hub = _tenant_hubs.setdefault(tenant, LiveHub(LiveBoard()))
+    return hub
\ No newline at end of file
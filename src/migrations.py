@@ -0,0 +1,674 @@
+"""Versioned schema migrations
+
+Each migration runs once per database. The applied version is kept in
+PRAGMA user_version (read on every worker boot) and the history in the
+schema_migrations table; PostgreSQL databases, created in one step with
+the current schema, keep both in schema_migrations.
+
+Usage:
+    python -m src.migrations status  [--db checkin_system.db]
+    python -m src.migrations upgrade [--db checkin_system.db]
+    python -m src.migrations verify  [--db checkin_system.db]
+    python -m src.migrations optimize [--db checkin_system.db]
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import datetime
+from werkzeug.security import generate_password_hash
+from .archive import add_worked_hours
+from .dialects import SQLITE, POSTGRES, dialect_of
+from .rollups import rebuild_rollups
+
+def initial_schema(cursor):
+    """Base tables and the default admin account"""
+    # Employees table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id TEXT UNIQUE NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            department TEXT,
+            position TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Check-ins table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS checkins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            check_in_time TIMESTAMP,
+            check_out_time TIMESTAMP,
+            date DATE NOT NULL,
+            status TEXT DEFAULT 'present',
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees (id),
+            UNIQUE(employee_id, date)
+        )
+    ''')
+
+    # Work schedules table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS work_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+    ''')
+
+    # Billing rates table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS billing_rates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            hourly_rate DECIMAL(10,2) NOT NULL DEFAULT 25.00,
+            effective_date DATE NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+    ''')
+
+    # Create default admin employee
+    cursor.execute('SELECT COUNT(*) FROM employees WHERE username = ?', ('admin',))
+    if cursor.fetchone()[0] == 0:
+        admin_password_hash = generate_password_hash('password')
+        cursor.execute('''
+            INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ('EMP001', 'admin', 'admin@company.com', admin_password_hash, 'System', 'Administrator', 'IT', 'Admin'))
+
+        # Get the admin employee ID
+        admin_id = cursor.lastrowid
+
+        # Create default billing rate for admin
+        cursor.execute('''
+            INSERT INTO billing_rates (employee_id, hourly_rate, effective_date)
+            VALUES (?, ?, ?)
+        ''', (admin_id, 25.00, datetime.now().date()))
+
+def checkin_log_indexes(cursor):
+    """Keyset order and filter indexes for the admin check-in log"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_checkins_log
+        ON checkins (date, check_in_time, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_checkins_employee_log
+        ON checkins (employee_id, date, check_in_time, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_checkins_status_log
+        ON checkins (status, date, check_in_time, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_employees_department
+        ON employees (department)
+    ''')
+
+def report_and_rate_indexes(cursor):
+    """Covering indexes for report range scans and active rate lookups"""
+    # Report and billing range scans: c.date BETWEEN ? AND ? for all employees
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_checkins_date_cover
+        ON checkins (date, employee_id, status, check_in_time, check_out_time)
+    ''')
+    # Per-employee range scans (billing, weekly/monthly reports)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_checkins_employee_date_cover
+        ON checkins (employee_id, date, status, check_in_time, check_out_time)
+    ''')
+    # employee_id = ? AND is_active = 1 ORDER BY effective_date DESC
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_billing_rates_active
+        ON billing_rates (employee_id, is_active, effective_date, hourly_rate)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_work_schedules_employee
+        ON work_schedules (employee_id, day_of_week, is_active)
+    ''')
+    cursor.execute('ANALYZE')
+
+def attendance_rollups(cursor):
+    """Per employee day/week/month rollups for the activity reports"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_rollups (
+            employee_id INTEGER NOT NULL,
+            period_type TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            days_worked INTEGER NOT NULL DEFAULT 0,
+            check_ins INTEGER NOT NULL DEFAULT 0,
+            late_days INTEGER NOT NULL DEFAULT 0,
+            completed_days INTEGER NOT NULL DEFAULT 0,
+            total_hours REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_type, period_start, employee_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_rollups_employee
+        ON attendance_rollups (employee_id)
+    ''')
+    # Filled by migration 11, once every column they read exists
+
+def attendance_events(cursor):
+    """Outbox of check-in/check-out events for the live board"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            employee_id INTEGER,
+            date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_events_created
+        ON attendance_events (created_at)
+    ''')
+
+def ingest_events(cursor):
+    """Idempotency log of badge reader events"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_events (
+            event_id TEXT PRIMARY KEY,
+            employee_id INTEGER,
+            event_type TEXT NOT NULL,
+            occurred_at TIMESTAMP,
+            result TEXT NOT NULL,
+            message TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ingest_events_received
+        ON ingest_events (received_at)
+    ''')
+
+def job_queue(cursor):
+    """Durable queue of background jobs run by python -m src.jobs worker"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_status
+        ON jobs (status, id)
+    ''')
+
+def rate_history(cursor):
+    """End dates on billing rate versions and a change counter for the rate index"""
+    cursor.execute('ALTER TABLE billing_rates ADD COLUMN end_date DATE')
+    cursor.execute('''
+        UPDATE billing_rates SET end_date = versions.next_start
+        FROM (
+            SELECT id, LEAD(effective_date) OVER (
+                PARTITION BY employee_id ORDER BY effective_date, id
+            ) AS next_start
+            FROM billing_rates WHERE is_active = 1
+        ) AS versions
+        WHERE billing_rates.id = versions.id
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_billing_rates_history
+        ON billing_rates (employee_id, effective_date, id)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_index_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO rate_index_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS billing_rates_{event.lower()}_version
+            AFTER {event} ON billing_rates
+            BEGIN
+                UPDATE rate_index_version SET version = version + 1;
+            END
+        ''')
+
+def checkin_archives(cursor):
+    """Catalog of the monthly check-in archives (see src/archive.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS checkin_archives (
+            month TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            checksum TEXT NOT NULL,
+            archived_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+def work_sessions(cursor):
+    """Check-in sessions, at most one open per employee (see src/occupancy.py)"""
+    if dialect_of(cursor) is POSTGRES:
+        id_column = 'INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY'
+    else:
+        id_column = 'INTEGER PRIMARY KEY'
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS work_sessions (
+            id {id_column},
+            employee_id INTEGER NOT NULL REFERENCES employees (id),
+            checkin_date DATE NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            ended_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_work_sessions_open
+        ON work_sessions (employee_id) WHERE ended_at IS NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_work_sessions_employee_date
+        ON work_sessions (employee_id, checkin_date)
+    ''')
+    # Whoever has not checked out of their latest day is still on site
+    cursor.execute('''
+        INSERT INTO work_sessions (employee_id, checkin_date, started_at)
+        SELECT employee_id, date, check_in_time FROM checkins c
+        WHERE check_in_time IS NOT NULL AND check_out_time IS NULL
+        AND date = (SELECT MAX(date) FROM checkins latest WHERE latest.employee_id = c.employee_id)
+    ''')
+
+def worked_hours(cursor):
+    """Hours worked per check-in day, the sum of its closed work sessions"""
+    dialect = dialect_of(cursor)
+    cursor.execute(f"ALTER TABLE checkins ADD COLUMN worked_hours {'DOUBLE PRECISION' if dialect is POSTGRES else 'REAL'}")
+    # Days before work_sessions existed had a single session
+    cursor.execute(f'''
+        UPDATE checkins SET worked_hours = COALESCE(
+            (SELECT SUM({dialect.exact_hours_between('s.started_at', 's.ended_at')}) FROM work_sessions s
+             WHERE s.employee_id = checkins.employee_id AND s.checkin_date = checkins.date
+             AND s.ended_at IS NOT NULL),
+            {dialect.exact_hours_between('check_in_time', 'check_out_time')}
+        )
+    ''')
+    # Report and billing range scans read the hours from the covering indexes
+    for name, columns in (('idx_checkins_date_cover', 'date, employee_id'),
+                          ('idx_checkins_employee_date_cover', 'employee_id, date')):
+        cursor.execute(f'DROP INDEX IF EXISTS {name}')
+        cursor.execute(f'''
+            CREATE INDEX {name}
+            ON checkins ({columns}, status, check_in_time, check_out_time, worked_hours)
+        ''')
+    if dialect is SQLITE:
+        add_worked_hours(cursor)
+    rebuild_rollups(cursor)
+
+def postgres_schema(conn):
+    """The schema of SQLite migrations 1-8 in PostgreSQL, with the default admin account
+
+    Timestamp defaults are truncated to whole seconds like SQLite's
+    CURRENT_TIMESTAMP; sessions run in UTC (see src/postgres.py).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id TEXT UNIQUE NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            department TEXT,
+            position TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS checkins (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER NOT NULL REFERENCES employees (id),
+            check_in_time TIMESTAMP,
+            check_out_time TIMESTAMP,
+            date DATE NOT NULL,
+            status TEXT DEFAULT 'present',
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP),
+            UNIQUE (employee_id, date)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS work_schedules (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER NOT NULL REFERENCES employees (id),
+            day_of_week INTEGER NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            is_active INTEGER DEFAULT 1
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS billing_rates (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER NOT NULL REFERENCES employees (id),
+            hourly_rate DOUBLE PRECISION NOT NULL DEFAULT 25.00,
+            effective_date DATE NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP),
+            end_date DATE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_rollups (
+            employee_id INTEGER NOT NULL,
+            period_type TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            days_worked INTEGER NOT NULL DEFAULT 0,
+            check_ins INTEGER NOT NULL DEFAULT 0,
+            late_days INTEGER NOT NULL DEFAULT 0,
+            completed_days INTEGER NOT NULL DEFAULT 0,
+            total_hours DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_type, period_start, employee_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_events (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            employee_id INTEGER,
+            date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_events (
+            event_id TEXT PRIMARY KEY,
+            employee_id INTEGER,
+            event_type TEXT NOT NULL,
+            occurred_at TIMESTAMP,
+            result TEXT NOT NULL,
+            message TEXT,
+            received_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created_at TIMESTAMP DEFAULT date_trunc('second', LOCALTIMESTAMP),
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_index_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT INTO rate_index_version (id, version) VALUES (1, 0) ON CONFLICT DO NOTHING')
+
+    indexes = {
+        'idx_checkins_log': 'checkins (date, check_in_time, id)',
+        'idx_checkins_employee_log': 'checkins (employee_id, date, check_in_time, id)',
+        'idx_checkins_status_log': 'checkins (status, date, check_in_time, id)',
+        'idx_employees_department': 'employees (department)',
+        'idx_checkins_date_cover': 'checkins (date, employee_id, status, check_in_time, check_out_time)',
+        'idx_checkins_employee_date_cover': 'checkins (employee_id, date, status, check_in_time, check_out_time)',
+        'idx_billing_rates_active': 'billing_rates (employee_id, is_active, effective_date, hourly_rate)',
+        'idx_billing_rates_history': 'billing_rates (employee_id, effective_date, id)',
+        'idx_work_schedules_employee': 'work_schedules (employee_id, day_of_week, is_active)',
+        'idx_attendance_rollups_employee': 'attendance_rollups (employee_id)',
+        'idx_attendance_events_created': 'attendance_events (created_at)',
+        'idx_ingest_events_received': 'ingest_events (received_at)',
+        'idx_jobs_status': 'jobs (status, id)',
+    }
+    for name, definition in indexes.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+    # SQLite's ROUND() takes floating point values, PostgreSQL's only numeric
+    conn.execute('''
+        CREATE OR REPLACE FUNCTION round(value DOUBLE PRECISION, digits INTEGER) RETURNS DOUBLE PRECISION
+        AS 'SELECT CAST(round(CAST(value AS NUMERIC), digits) AS DOUBLE PRECISION)'
+        LANGUAGE SQL IMMUTABLE STRICT
+    ''')
+    conn.execute('''
+        CREATE OR REPLACE FUNCTION bump_rate_index_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE rate_index_version SET version = version + 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    conn.execute('''
+        CREATE TRIGGER billing_rates_version
+        AFTER INSERT OR UPDATE OR DELETE ON billing_rates
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_rate_index_version()
+    ''')
+
+    admin = conn.execute('''
+        INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    ''', ('EMP001', 'admin', 'admin@company.com', generate_password_hash('password'),
+          'System', 'Administrator', 'IT', 'Admin')).fetchone()
+    if admin is not None:
+        conn.execute('''
+            INSERT INTO billing_rates (employee_id, hourly_rate, effective_date)
+            VALUES (?, ?, ?)
+        ''', (admin[0], 25.00, datetime.now().date()))
+
+MIGRATIONS = [
+    (1, 'initial schema', initial_schema),
+    (2, 'check-in log indexes', checkin_log_indexes),
+    (3, 'report and rate covering indexes', report_and_rate_indexes),
+    (4, 'attendance rollups', attendance_rollups),
+    (5, 'attendance events outbox', attendance_events),
+    (6, 'ingest events log', ingest_events),
+    (7, 'job queue', job_queue),
+    (8, 'billing rate history', rate_history),
+    (9, 'check-in archive catalog', checkin_archives),
+    (10, 'work sessions', work_sessions),
+    (11, 'hours worked per day', worked_hours),
+]
+
+# A PostgreSQL database starts at the current schema; later migrations are
+# added to both lists under the same version
+POSTGRES_MIGRATIONS = [
+    (8, 'PostgreSQL schema', postgres_schema),
+    (9, 'check-in archive catalog', checkin_archives),
+    (10, 'work sessions', work_sessions),
+    (11, 'hours worked per day', worked_hours),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+MIGRATIONS_LOCK_KEY = 7304  # PostgreSQL advisory lock held while migrating
+
+SCHEMA_MIGRATIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def get_schema_version(conn):
+    """Version recorded in the database header (PostgreSQL: in schema_migrations)"""
+    if dialect_of(conn) is POSTGRES:
+        if conn.execute("SELECT to_regclass('schema_migrations')").fetchone()[0] is None:
+            return 0
+        return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def pending_migrations(conn):
+    """Migrations not yet applied to this database"""
+    version = get_schema_version(conn)
+    migrations = POSTGRES_MIGRATIONS if dialect_of(conn) is POSTGRES else MIGRATIONS
+    return [m for m in migrations if m[0] > version]
+
+def migrate(conn):
+    """Apply pending migrations, returning the list of versions applied
+
+    The check runs under BEGIN IMMEDIATE so concurrently booting workers
+    serialize on the write lock and only the first one applies anything.
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return []
+    if dialect_of(conn) is POSTGRES:
+        return migrate_postgres(conn)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SCHEMA_MIGRATIONS_SQL)
+        applied = []
+        for version, description, step in pending_migrations(conn):
+            step(cursor)
+            cursor.execute(
+                'INSERT OR REPLACE INTO schema_migrations (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if applied:
+        conn.execute('PRAGMA optimize')
+    return applied
+
+def migrate_postgres(conn):
+    """migrate() for PostgreSQL, where nodes booting together queue on an advisory lock"""
+    conn.execute('BEGIN')
+    try:
+        POSTGRES.lock_until_commit(conn, MIGRATIONS_LOCK_KEY)
+        conn.execute(SCHEMA_MIGRATIONS_SQL)
+        applied = []
+        for version, description, step in pending_migrations(conn):
+            step(conn)
+            conn.execute('INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                         (version, description))
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if applied:
+        conn.execute('ANALYZE')
+    return applied
+
+def reference_schema():
+    """Tables and indexes of a freshly migrated database"""
+    reference = sqlite3.connect(':memory:')
+    try:
+        migrate(reference)
+        return {(row[0], row[1]) for row in reference.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'index')"
+        )}
+    finally:
+        reference.close()
+
+def verify(conn):
+    """Check a database against the migrations, returning a list of problems"""
+    problems = []
+
+    version = get_schema_version(conn)
+    if version != SCHEMA_VERSION:
+        problems.append(f'schema version is {version}, expected {SCHEMA_VERSION}')
+
+    if dialect_of(conn) is POSTGRES:
+        existing = {(row[0], row[1]) for row in conn.execute('''
+            SELECT 'table', tablename FROM pg_tables WHERE schemaname = current_schema()
+            UNION ALL
+            SELECT 'index', indexname FROM pg_indexes WHERE schemaname = current_schema()
+        ''')}
+        expected = {(kind, name) for kind, name in reference_schema() if not name.startswith('sqlite_')}
+        for kind, name in sorted(expected - existing):
+            problems.append(f'missing {kind} {name}')
+        return problems
+
+    existing = {(row[0], row[1]) for row in conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'index')"
+    )}
+    for kind, name in sorted(reference_schema() - existing):
+        problems.append(f'missing {kind} {name}')
+
+    result = conn.execute('PRAGMA quick_check').fetchone()[0]
+    if result != 'ok':
+        problems.append(f'quick_check: {result}')
+
+    for row in conn.execute('PRAGMA foreign_key_check'):
+        problems.append(f'foreign key violation in {row[0]} rowid {row[1]} -> {row[2]}')
+
+    return problems
+
+def main(argv=None):
+    """Command line entry point"""
+    from .config import DB_PATH
+    from .database import get_pool
+
+    parser = argparse.ArgumentParser(prog='python -m src.migrations', description='Manage the database schema')
+    parser.add_argument('command', choices=['status', 'upgrade', 'verify', 'optimize'])
+    parser.add_argument('--db', default=DB_PATH, help='database file or postgresql:// URL (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    conn = get_pool(args.db).acquire()
+    try:
+        if args.command == 'status':
+            print(f'{args.db}: schema version {get_schema_version(conn)} of {SCHEMA_VERSION}')
+            for version, description, _ in pending_migrations(conn):
+                print(f'  pending {version}: {description}')
+        elif args.command == 'upgrade':
+            applied = migrate(conn)
+            print(f'Applied migrations: {applied}' if applied else 'Schema is up to date')
+        elif args.command == 'verify':
+            problems = verify(conn)
+            for problem in problems:
+                print(f'FAIL {problem}')
+            if problems:
+                return 1
+            print(f'{args.db}: OK (schema version {SCHEMA_VERSION})')
+        elif args.command == 'optimize':
+            conn.execute('ANALYZE')
+            if dialect_of(conn) is SQLITE:
+                conn.execute('PRAGMA optimize')
+            print('Statistics updated')
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
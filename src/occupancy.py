@@ -0,0 +1,318 @@
+"""Who is on site now
+
+A check-in opens a work session and the check-out closes it. work_sessions
+keeps one row per session, so a day can have several (breaks, re-entries)
+and a session can end after midnight (night shifts); checkins keeps one row
+per employee and day with the first arrival and the last departure. A
+partial unique index allows a single open session per employee and finds
+it in one index lookup.
+
+Each process keeps an OccupancyIndex: the open sessions by employee and by
+department, so head counts are dictionary sizes however many employees
+there are. This process's check-ins and check-outs update it directly;
+other workers' changes arrive through the attendance_events outbox, read at
+most every OCCUPANCY_MAX_AGE_SECONDS. A session open for longer than
+OCCUPANCY_MAX_SESSION_HOURS is a forgotten check-out: it stops counting,
+and the employee's next check-in drops it. So does a check-in on a later
+day once the session's scheduled shift is over: only a night shift can
+still be running the next day.
+
+Hours are billed from checkins.worked_hours, to which every closed session
+adds its length, so the gaps between sessions are not billed and dropped
+sessions add nothing.
+"""
+import heapq
+import threading
+import time
+from datetime import date, datetime, timedelta
+from .config import OCCUPANCY_MAX_SESSION_HOURS, OCCUPANCY_MAX_AGE_SECONDS, LIVE_EVENT_RETENTION_DAYS
+from .dialects import dialect_of
+from .schedules import shift_end
+
+MAX_SESSION = timedelta(hours=OCCUPANCY_MAX_SESSION_HOURS)
+
+def as_datetime(value):
+    """A stored timestamp as a datetime (SQLite returns strings)"""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+def session_cutoff(now):
+    """Open sessions that started before this are forgotten check-outs"""
+    return now - MAX_SESSION
+
+def is_forgotten(session, now, schedule):
+    """Whether a check-in at now finds session to be a forgotten check-out"""
+    if as_datetime(session['started_at']) < session_cutoff(now):
+        return True
+    day = date.fromisoformat(str(session['checkin_date']))
+    if day >= now.date():
+        return False
+    end = shift_end(schedule, day)
+    return end is None or now > end
+
+def session_hours(session, now):
+    """Length of a session closed at now, in hours"""
+    return (now - as_datetime(session['started_at'])).total_seconds() / 3600
+
+def already_checked_in(session, day):
+    """Refusal message for a check-in on day while session is open"""
+    if str(session['checkin_date']) == str(day):
+        return 'Already checked in today'
+    return f"Already checked in since {as_datetime(session['started_at']).strftime('%Y-%m-%d %H:%M')}"
+
+def get_open_session(conn, employee_id):
+    """An employee's open session as a dict, or None"""
+    row = conn.execute('''
+        SELECT id, checkin_date, started_at FROM work_sessions
+        WHERE employee_id = ? AND ended_at IS NULL
+    ''', (employee_id,)).fetchone()
+    return dict(row) if row else None
+
+def open_session(conn, employee_id, now, schedule):
+    """Open a session for the check-in day, returning its id, or None if one is open
+
+    A forgotten session is dropped first. Runs in the caller's transaction;
+    concurrent check-ins of one employee open a single session.
+    """
+    session = get_open_session(conn, employee_id)
+    if session and is_forgotten(session, now, schedule):
+        conn.execute('DELETE FROM work_sessions WHERE id = ?', (session['id'],))
+    row = conn.execute('''
+        INSERT INTO work_sessions (employee_id, checkin_date, started_at) VALUES (?, ?, ?)
+        ON CONFLICT (employee_id) WHERE ended_at IS NULL DO NOTHING
+        RETURNING id
+    ''', (employee_id, now.date(), now)).fetchone()
+    return row[0] if row else None
+
+def close_session(conn, employee_id, now):
+    """Close the employee's open session, returning it as a dict, or None
+
+    Forgotten sessions are not closed. Runs in the caller's transaction.
+    """
+    row = conn.execute('''
+        UPDATE work_sessions SET ended_at = ?
+        WHERE employee_id = ? AND ended_at IS NULL AND started_at >= ?
+        RETURNING id, checkin_date, started_at
+    ''', (now, employee_id, session_cutoff(now))).fetchone()
+    return dict(row) if row else None
+
+def load_open_sessions(conn, employee_ids):
+    """Open sessions of several employees by employee id, locked until commit
+
+    Dates and timestamps are ISO strings, as badge reader events compare them.
+    """
+    dialect = dialect_of(conn)
+    rows = conn.execute(f'''
+        SELECT id, employee_id, checkin_date, started_at FROM work_sessions
+        WHERE ended_at IS NULL AND {dialect.in_list('employee_id', '?')}{dialect.for_update}
+    ''', (dialect.list_param(employee_ids),))
+    return {row['employee_id']: {
+        'id': row['id'], 'employee_id': row['employee_id'], 'checkin_date': str(row['checkin_date']),
+        'started_at': str(row['started_at']), 'ended_at': None, 'dropped': False
+    } for row in rows}
+
+def load_sessions_since(conn, since):
+    """Sessions to replay with badge events older than what they record
+
+    since maps employee ids to the time of their earliest new event. For
+    each employee with a session starting or ending after it, returns every
+    session of theirs from the day of that session, or of the event if
+    earlier, in start order. Dates and timestamps are ISO strings.
+    """
+    dialect = dialect_of(conn)
+    columns = [('employee_id', 'INTEGER'), ('since', 'TIMESTAMP'), ('day', 'DATE')]
+    rows = conn.execute(f'''
+        WITH events AS ({dialect.rows_table('?', columns)}),
+        rewound AS (
+            SELECT e.employee_id, {dialect.least('MIN(s.checkin_date)', 'e.day')} AS first_day
+            FROM events e
+            JOIN work_sessions s ON s.employee_id = e.employee_id
+            WHERE s.started_at > e.since OR s.ended_at > e.since
+            GROUP BY e.employee_id, e.day
+        )
+        SELECT s.id, s.employee_id, s.checkin_date, s.started_at, s.ended_at
+        FROM rewound r
+        JOIN work_sessions s ON s.employee_id = r.employee_id AND s.checkin_date >= r.first_day
+        ORDER BY s.employee_id, s.started_at
+    ''', (dialect.rows_param([(employee_id, str(moment), str(moment.date()))
+                                for employee_id, moment in sorted(since.items())], columns),))
+    return [{
+        'id': row['id'], 'employee_id': row['employee_id'], 'checkin_date': str(row['checkin_date']),
+        'started_at': str(row['started_at']), 'ended_at': str(row['ended_at']) if row['ended_at'] else None,
+        'dropped': False
+    } for row in rows]
+
+def save_sessions(conn, sessions):
+    """Write sessions replayed in memory: drops, then closes, then new sessions"""
+    conn.executemany('DELETE FROM work_sessions WHERE id = ?',
+                     [(session['id'],) for session in sessions if session['id'] and session['dropped']])
+    conn.executemany('UPDATE work_sessions SET ended_at = ? WHERE id = ?', [
+        (session['ended_at'], session['id']) for session in sessions
+        if session['id'] and not session['dropped'] and session['ended_at']
+    ])
+    conn.executemany('''
+        INSERT INTO work_sessions (employee_id, checkin_date, started_at, ended_at) VALUES (?, ?, ?, ?)
+    ''', [
+        (session['employee_id'], session['checkin_date'], session['started_at'], session['ended_at'])
+        for session in sessions if not session['id'] and not session['dropped']
+    ])
+
+def employee_department(conn, employee_id):
+    row = conn.execute('SELECT department FROM employees WHERE id = ?', (employee_id,)).fetchone()
+    return row['department'] if row else None
+
+class OccupancyIndex:
+    """Open sessions of one database, by employee and by department"""
+
+    def __init__(self):
+        # employee id -> (session id, started_at, department)
+        self.sessions = {}
+        self.departments = {}
+        self.last_id = None
+        # (started_at, session id, employee id) of sessions opened less than
+        # OCCUPANCY_MAX_SESSION_HOURS ago, closed ones included until then
+        self._expiry = []
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def opened(self, employee_id, session_id, started_at, department):
+        """Record an open session"""
+        started_at = as_datetime(started_at)
+        department = department or ''
+        with self._lock:
+            self._remove(employee_id)
+            self.sessions[employee_id] = (session_id, started_at, department)
+            self.departments.setdefault(department, set()).add(employee_id)
+            heapq.heappush(self._expiry, (started_at, session_id, employee_id))
+
+    def closed(self, employee_id):
+        """Record that the employee left"""
+        with self._lock:
+            self._remove(employee_id)
+
+    def _remove(self, employee_id):
+        entry = self.sessions.pop(employee_id, None)
+        if entry is not None:
+            members = self.departments[entry[2]]
+            members.discard(employee_id)
+            if not members:
+                del self.departments[entry[2]]
+
+    def _expire(self):
+        cutoff = session_cutoff(datetime.now())
+        while self._expiry and self._expiry[0][0] < cutoff:
+            _, session_id, employee_id = heapq.heappop(self._expiry)
+            entry = self.sessions.get(employee_id)
+            if entry is not None and entry[0] == session_id:
+                self._remove(employee_id)
+
+    def head_count(self):
+        """Employees on site"""
+        with self._lock:
+            self._expire()
+            return len(self.sessions)
+
+    def department_counts(self):
+        """Employees on site per department ('' for none)"""
+        with self._lock:
+            self._expire()
+            return {department: len(members) for department, members in self.departments.items()}
+
+    def on_site(self, department):
+        """(employee id, started_at) of a department's employees on site, earliest first"""
+        with self._lock:
+            self._expire()
+            return sorted(((employee_id, self.sessions[employee_id][1])
+                           for employee_id in self.departments.get(department, ())),
+                          key=lambda entry: entry[1])
+
+    def mark_stale(self):
+        """Read the outbox at the next query, after a change written without opened()/closed()"""
+        self._checked_at = 0.0
+
+    def refresh(self, conn, max_age=OCCUPANCY_MAX_AGE_SECONDS):
+        """Apply other workers' changes; outbox reads younger than max_age are skipped"""
+        now = time.monotonic()
+        if now - self._checked_at < max_age:
+            return
+        with self._lock:
+            if now - self._checked_at < max_age:
+                return
+            # Outbox rows older than LIVE_EVENT_RETENTION_DAYS may be gone
+            if self.last_id is None or now - self._checked_at > LIVE_EVENT_RETENTION_DAYS * 86400:
+                self._load(conn)
+            else:
+                self._replay(conn)
+            self._checked_at = now
+
+    def _load(self, conn):
+        self.last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance_events').fetchone()[0]
+        rows = conn.execute('''
+            SELECT s.id, s.employee_id, s.started_at, e.department
+            FROM work_sessions s
+            JOIN employees e ON s.employee_id = e.id
+            WHERE s.ended_at IS NULL
+        ''').fetchall()
+        self.sessions, self.departments, self._expiry = {}, {}, []
+        for row in rows:
+            self.opened(row['employee_id'], row['id'], row['started_at'], row['department'])
+
+    def _replay(self, conn):
+        events = conn.execute('''
+            SELECT id, event_type, employee_id FROM attendance_events
+            WHERE id > ? ORDER BY id
+        ''', (self.last_id,)).fetchall()
+        if not events:
+            return
+        if any(row['event_type'] == 'reset' for row in events):
+            self._load(conn)
+            return
+        # Each event only says whose sessions changed: read their open session now
+        dialect = dialect_of(conn)
+        rows = conn.execute(f'''
+            SELECT e.id AS employee_id, e.department, s.id, s.started_at
+            FROM employees e
+            LEFT JOIN work_sessions s ON s.employee_id = e.id AND s.ended_at IS NULL
+            WHERE {dialect.in_list('e.id', '?')}
+        ''', (dialect.list_param(sorted({row['employee_id'] for row in events})),)).fetchall()
+        for row in rows:
+            if row['id'] is None:
+                self._remove(row['employee_id'])
+            elif self.sessions.get(row['employee_id'], (None,))[0] != row['id']:
+                self.opened(row['employee_id'], row['id'], row['started_at'], row['department'])
+        self.last_id = events[-1]['id']
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def index_for(conn):
+    """The OccupancyIndex of the database conn is connected to"""
+    from .config import DB_PATH
+    pool = getattr(conn, 'pool', None)
+    path = pool.path if pool is not None else DB_PATH
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(path, OccupancyIndex())
+    return index
+
+def department_on_site(conn, department):
+    """A department's employees on site, earliest arrival first, as dicts"""
+    on_site = get_occupancy(conn).on_site(department)
+    if not on_site:
+        return []
+    dialect = dialect_of(conn)
+    names = {row['id']: row for row in conn.execute(f'''
+        SELECT id, username, first_name, last_name, employee_id FROM employees
+        WHERE {dialect.in_list('id', '?')}
+    ''', (dialect.list_param([employee_id for employee_id, _ in on_site]),))}
+    return [{
+        'id': employee_id, 'username': names[employee_id]['username'],
+        'first_name': names[employee_id]['first_name'], 'last_name': names[employee_id]['last_name'],
+        'employee_id': names[employee_id]['employee_id'], 'since': started_at.isoformat(' ')
+    } for employee_id, started_at in on_site if employee_id in names]
+
+def get_occupancy(conn):
+    """The up-to-date OccupancyIndex for conn's database"""
+    index = index_for(conn)
+    index.refresh(conn)
+    return index
\ No newline at end of file
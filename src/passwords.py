@@ -0,0 +1,163 @@
+"""Password hashing for the login path
+
+Hash verification is CPU bound, so it runs on a small bounded thread pool
+(hashlib releases the GIL while hashing). When more logins are waiting
+than the pool can take, new ones are refused with PasswordHashBusy instead
+of queueing until the worker times out. Hashes made with older parameters
+are upgraded to PASSWORD_HASH_METHOD after a successful login, and
+LoginRateLimiter turns floods away before any hashing is done.
+
+Usage:
+    python -m src.passwords benchmark [--target-ms 250]
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+from .config import (PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE,
+                     PASSWORD_HASH_WAIT_SECONDS, LOGIN_RATE_LIMIT_ATTEMPTS,
+                     LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+
+class PasswordHashBusy(Exception):
+    """Raised when the hashing pool is saturated"""
+
+_executor = None
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Thread pool shared by all hashing calls of this process"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                               thread_name_prefix='password-hash')
+    return _executor
+
+def _run_bounded(func, *args):
+    """Run func on the pool, refusing work once every slot is taken"""
+    if not _slots.acquire(timeout=PASSWORD_HASH_WAIT_SECONDS):
+        raise PasswordHashBusy()
+    try:
+        return get_executor().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    """Hash a password with the configured method (inline, for admin forms)"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    """Check a password on the hashing pool"""
+    return _run_bounded(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != PASSWORD_HASH_METHOD
+
+def rehash_password(password):
+    """New hash for a verified password, computed on the hashing pool"""
+    return _run_bounded(hash_password, password)
+
+class LoginRateLimiter:
+    """Sliding window of failed login attempts per key (username, client address)
+
+    Successful logins are not counted, so a whole shift logging in from
+    one kiosk or office address is never turned away.
+
+    Counters live in the worker process, so with N workers the effective
+    limit is at most N times the configured one.
+    """
+
+    def __init__(self, max_attempts=LOGIN_RATE_LIMIT_ATTEMPTS, window=LOGIN_RATE_LIMIT_WINDOW_SECONDS):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return None
+        return attempts
+
+    def allow(self, *keys):
+        """Whether none of the keys is over the limit"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                attempts = self._recent(key, now)
+                if attempts is not None and len(attempts) >= self.max_attempts:
+                    return False
+            return True
+
+    def failed(self, *keys):
+        """Record a failed attempt for each key"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._attempts.setdefault(key, deque()).append(now)
+
+    def reset(self, *keys):
+        """Forget the attempts for the keys (after a successful login)"""
+        with self._lock:
+            for key in keys:
+                self._attempts.pop(key, None)
+
+login_limiter = LoginRateLimiter()
+
+# Candidate methods, from weakest to strongest
+BENCHMARK_METHODS = [
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1'
+]
+
+def benchmark(methods=BENCHMARK_METHODS, rounds=5):
+    """Median verification time in milliseconds for each hash method"""
+    results = []
+    for method in methods:
+        password_hash = generate_password_hash('benchmark-password', method=method)
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            check_password_hash(password_hash, 'benchmark-password')
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append((method, sorted(timings)[len(timings) // 2]))
+    return results
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='python -m src.passwords', description='Password hashing tools')
+    parser.add_argument('command', choices=['benchmark'])
+    parser.add_argument('--target-ms', type=float, default=250,
+                        help='upper bound for one verification (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = benchmark(rounds=args.rounds)
+    for method, elapsed in results:
+        marker = '*' if method == PASSWORD_HASH_METHOD else ' '
+        print(f'{marker} {method:<24} {elapsed:8.1f} ms')
+
+    affordable = [method for method, elapsed in results if elapsed <= args.target_ms]
+    if affordable:
+        print(f'Suggested PASSWORD_HASH_METHOD={affordable[-1]}')
+    else:
+        print(f'No method verifies within {args.target_ms:g} ms on this machine')
+    print(f'{PASSWORD_HASH_WORKERS} hashing threads per worker process')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
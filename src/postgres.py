@@ -0,0 +1,155 @@
+"""PostgreSQL storage
+
+With DB_PATH set to a postgresql:// URL, every app node behind the load
+balancer shares one PostgreSQL database instead of a local SQLite file.
+PostgresPool hands out connections that behave like the pooled sqlite3
+ones, so the query modules run unchanged: execute() takes ? or :name
+placeholders, rows are indexed by position or column name, dates and
+timestamps come back as the same ISO strings, and INSERT/UPDATE/DELETE
+open a transaction when none is, as in the sqlite3 module. The few SQL
+constructs that differ come from src/dialects.py.
+
+Requires psycopg2 (pip install psycopg2-binary).
+"""
+import itertools
+import re
+from functools import lru_cache
+from .config import EXPORT_BATCH_ROWS
+from .database import ConnectionPool
+from .dialects import POSTGRES
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+except ImportError:
+    raise RuntimeError('A postgresql:// DB_PATH requires psycopg2 (pip install psycopg2-binary)')
+
+_TOKENS = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|::|\?|:([A-Za-z_]\w*)|%""")
+_TRANSACTION_MODE = re.compile(r'^\s*BEGIN\s+(?:DEFERRED|IMMEDIATE|EXCLUSIVE)\b', re.IGNORECASE)
+_WRITE = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+# Read back as the strings SQLite stores, e.g. '2024-03-04 08:57:12.123456'
+TEXT_TYPES = (1082, 1083, 1114, 1184)  # date, time, timestamp, timestamptz
+NUMERIC_TYPES = (1700,)  # numeric, as returned by EXTRACT() and ROUND()
+
+_stream_names = itertools.count()
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """psycopg2 form of a statement written with ? or :name placeholders"""
+    def replace(match):
+        token = match.group(0)
+        if token == '?':
+            return '%s'
+        if match.group(1):
+            return f'%({match.group(1)})s'
+        if token == '::':
+            return token
+        # psycopg2 formats every statement: literal percent signs are doubled
+        return token.replace('%', '%%')
+    # BEGIN IMMEDIATE only matters to SQLite's single writer
+    return _TOKENS.sub(replace, _TRANSACTION_MODE.sub('BEGIN', sql))
+
+def _parameters(parameters):
+    return parameters if isinstance(parameters, dict) else tuple(parameters)
+
+def _register_types(raw):
+    extensions = psycopg2.extensions
+    extensions.register_type(extensions.new_type(TEXT_TYPES, 'SQLITE_TEXT', lambda value, cursor: value), raw)
+    extensions.register_type(extensions.new_type(
+        NUMERIC_TYPES, 'SQLITE_REAL', lambda value, cursor: float(value) if value is not None else None), raw)
+
+class PostgresConnection:
+    """psycopg2 connection with the sqlite3 interface the query modules use"""
+    dialect = POSTGRES
+
+    def __init__(self, raw, pool):
+        self.raw = raw
+        self.pool = pool
+        self.bound = False
+        self.streamed = False
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def execute(self, sql, parameters=()):
+        cursor = self.raw.cursor()
+        if _WRITE.match(sql) and not self.in_transaction:
+            cursor.execute('BEGIN')
+        cursor.execute(translate(sql), _parameters(parameters))
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        cursor = self.raw.cursor()
+        if _WRITE.match(sql) and not self.in_transaction:
+            cursor.execute('BEGIN')
+        psycopg2.extras.execute_batch(cursor, translate(sql), [_parameters(p) for p in seq_of_parameters],
+                                      page_size=500)
+        return cursor
+
+    def stream(self, sql, parameters=()):
+        """Server-side cursor for large results, fetched EXPORT_BATCH_ROWS at a time
+
+        It belongs to a transaction, opened here if needed, and is dropped
+        when the connection goes back to the pool.
+        """
+        if not self.in_transaction:
+            self.raw.cursor().execute('BEGIN')
+        cursor = self.raw.cursor(f'stream_{next(_stream_names)}', withhold=True)
+        cursor.itersize = EXPORT_BATCH_ROWS
+        cursor.execute(translate(sql), _parameters(parameters))
+        self.streamed = True
+        return cursor
+
+    def commit(self):
+        if self.in_transaction:
+            self.raw.cursor().execute('COMMIT')
+
+    def rollback(self):
+        if self.in_transaction:
+            self.raw.cursor().execute('ROLLBACK')
+
+    def reset(self):
+        """Discard uncommitted work and open cursors before reuse"""
+        self.rollback()
+        if self.streamed:
+            self.raw.cursor().execute('CLOSE ALL')
+            self.streamed = False
+
+    def close(self):
+        # Connections bound to an app context are released at teardown
+        if self.bound:
+            return
+        self.pool.release(self)
+
+class PostgresPool(ConnectionPool):
+    """Per-process pool of PostgreSQL connections to one database URL"""
+
+    def _connect(self):
+        raw = psycopg2.connect(self.path, cursor_factory=psycopg2.extras.DictCursor)
+        raw.autocommit = True
+        _register_types(raw)
+        # CURRENT_TIMESTAMP is stored as UTC, as SQLite does
+        raw.cursor().execute("SET TIME ZONE 'UTC'")
+        return PostgresConnection(raw, self)
+
+    def acquire(self):
+        conn = super().acquire()
+        if conn.raw.closed:
+            # Dropped by a server restart while idle
+            return self._connect()
+        return conn
+
+    def release(self, conn):
+        try:
+            conn.reset()
+        except psycopg2.Error:
+            conn.bound = False
+            self._close(conn)
+            return
+        super().release(conn)
+
+    def _close(self, conn):
+        conn.raw.close()
\ No newline at end of file
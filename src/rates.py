@@ -0,0 +1,172 @@
+"""Billing rate history
+
+Every rate change adds a billing_rates version with its effective_date;
+end_date (exclusive, NULL while current) is kept up to date by set_rate().
+Versions are never overwritten, except a same-day correction, so past
+periods keep being billed at the rate that applied then. Days before an
+employee's first version use DEFAULT_HOURLY_RATE.
+
+Each process keeps a RateIndex: per employee, the sorted effective dates
+and their rates, so the rate for any (employee, day) is a bisect with no
+database round trip. Triggers bump rate_index_version on any change to
+billing_rates. The index reloads when the counter moves, checked at most
+every RATE_INDEX_MAX_AGE_SECONDS, and at once after this process's own
+changes (invalidate_rates()).
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from .config import DEFAULT_HOURLY_RATE, RATE_INDEX_MAX_AGE_SECONDS
+from .dialects import dialect_of
+
+END_OF_TIME = '9999-12-31'
+
+def refresh_end_dates(conn, employee_ids=None):
+    """Set each version's end_date to the next version's effective_date"""
+    dialect = dialect_of(conn)
+    employee_filter = ''
+    params = {}
+    if employee_ids is not None:
+        employee_filter = f"AND {dialect.in_list('employee_id', ':ids')}"
+        params['ids'] = dialect.list_param(employee_ids)
+    conn.execute(f'''
+        UPDATE billing_rates SET end_date = versions.next_start
+        FROM (
+            SELECT id, LEAD(effective_date) OVER (
+                PARTITION BY employee_id ORDER BY effective_date, id
+            ) AS next_start
+            FROM billing_rates
+            WHERE is_active = 1
+            {employee_filter}
+        ) AS versions
+        WHERE billing_rates.id = versions.id AND billing_rates.end_date IS DISTINCT FROM versions.next_start
+    ''', params)
+
+def set_rate(conn, employee_id, hourly_rate, effective_date=None):
+    """Record a rate from effective_date on (default today)
+
+    A version that starts on the same day is corrected in place; any other
+    change adds a version, which may also be back- or future-dated. The
+    caller commits, then calls invalidate_rates().
+    """
+    effective_date = str(effective_date or date.today())
+    updated = conn.execute('''
+        UPDATE billing_rates SET hourly_rate = ?
+        WHERE employee_id = ? AND effective_date = ? AND is_active = 1
+    ''', (hourly_rate, employee_id, effective_date)).rowcount
+    if not updated:
+        conn.execute('''
+            INSERT INTO billing_rates (employee_id, hourly_rate, effective_date) VALUES (?, ?, ?)
+        ''', (employee_id, hourly_rate, effective_date))
+    refresh_end_dates(conn, [employee_id])
+
+def invalidate_rates(conn):
+    """Make this process reload its rate index after a committed change"""
+    index_for(conn).mark_stale()
+
+def rate_history(conn, employee_id):
+    """An employee's rate versions, newest first"""
+    return conn.execute('''
+        SELECT hourly_rate, effective_date, end_date, created_at FROM billing_rates
+        WHERE employee_id = ? AND is_active = 1
+        ORDER BY effective_date DESC, id DESC
+    ''', (employee_id,)).fetchall()
+
+class RateIndex:
+    """Sorted rate intervals of every employee of one database"""
+
+    def __init__(self):
+        self.starts = {}
+        self.rates = {}
+        self.version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def mark_stale(self):
+        self._checked_at = 0.0
+        self.version = None
+
+    def refresh(self, conn, max_age=RATE_INDEX_MAX_AGE_SECONDS):
+        """Reload if billing_rates changed; version checks younger than max_age are skipped"""
+        now = time.monotonic()
+        if now - self._checked_at < max_age:
+            return
+        with self._lock:
+            if now - self._checked_at < max_age:
+                return
+            version = conn.execute('SELECT version FROM rate_index_version').fetchone()[0]
+            if version != self.version:
+                self._load(conn)
+                self.version = version
+            self._checked_at = now
+
+    def _load(self, conn):
+        starts = {}
+        rates = {}
+        for employee_id, effective_date, hourly_rate in conn.execute('''
+            SELECT employee_id, effective_date, hourly_rate FROM billing_rates
+            WHERE is_active = 1
+            ORDER BY employee_id, effective_date, id
+        '''):
+            employee_starts = starts.setdefault(employee_id, [])
+            employee_rates = rates.setdefault(employee_id, [])
+            effective_date = str(effective_date)
+            if employee_starts and employee_starts[-1] == effective_date:
+                # Several versions on one day: the last one recorded applies
+                employee_rates[-1] = hourly_rate
+            else:
+                employee_starts.append(effective_date)
+                employee_rates.append(hourly_rate)
+        self.starts, self.rates = starts, rates
+
+    def rate_at(self, employee_id, day):
+        """Hourly rate in effect for an employee on a day (date or ISO string)"""
+        starts = self.starts.get(employee_id)
+        if not starts:
+            return DEFAULT_HOURLY_RATE
+        position = bisect_right(starts, str(day)) - 1
+        return self.rates[employee_id][position] if position >= 0 else DEFAULT_HOURLY_RATE
+
+    def current_rate(self, employee_id):
+        return self.rate_at(employee_id, date.today())
+
+    def periods(self, employee_id, start_date, end_date):
+        """(hourly_rate, valid_from, valid_to) intervals overlapping [start_date, end_date]
+
+        valid_to is exclusive; the period before the first version, if any,
+        carries DEFAULT_HOURLY_RATE.
+        """
+        start_date, end_date = str(start_date), str(end_date)
+        starts = self.starts.get(employee_id, [])
+        rates = self.rates.get(employee_id, [])
+        bounds = ['0001-01-01'] + starts + [END_OF_TIME]
+        values = [DEFAULT_HOURLY_RATE] + rates
+        first = max(bisect_right(bounds, start_date) - 1, 0)
+        periods = []
+        for position in range(first, len(values)):
+            if bounds[position] > end_date:
+                break
+            if bounds[position] < bounds[position + 1]:
+                periods.append((values[position], bounds[position], bounds[position + 1]))
+        return periods
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def index_for(conn):
+    """The RateIndex of the database conn is connected to"""
+    from .config import DB_PATH
+    pool = getattr(conn, 'pool', None)
+    path = pool.path if pool is not None else DB_PATH
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(path, RateIndex())
+    return index
+
+def get_rate_index(conn):
+    """The up-to-date RateIndex for conn's database"""
+    index = index_for(conn)
+    index.refresh(conn)
+    return index
\ No newline at end of file
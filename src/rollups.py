@@ -0,0 +1,227 @@
+"""Pre-aggregated attendance rollups for the activity reports
+
+attendance_rollups keeps one row per employee per day, ISO week (keyed by
+its Monday) and month (keyed by its first day). Writers call
+refresh_rollups() in the same transaction as the check-in change, which
+re-aggregates the affected periods from the (employee_id, date) index, so
+report pages read one row per employee whatever the history size.
+
+Check-ins of archived months (src/archive.py) have left the table; their
+day rollups are kept and added in when a week or month spanning them is
+re-aggregated.
+
+Usage:
+    python -m src.rollups rebuild [--db checkin_system.db]
+"""
+import argparse
+import sys
+from calendar import monthrange
+from datetime import date, timedelta
+from .archive import archived_months, archived_ranges
+from .dialects import dialect_of
+
+PERIOD_TYPES = ('day', 'week', 'month')
+
+ROLLUP_COLUMNS = ('days_worked', 'check_ins', 'late_days', 'completed_days', 'total_hours')
+
+# Day rollups standing for the check-ins of archived months
+ARCHIVED_DAYS_SQL = "period_type = 'day' AND substr(period_start, 1, 7) IN (SELECT month FROM checkin_archives)"
+
+def period_start_sql(dialect, period_type, column='date'):
+    """SQL expression giving the period start of a date column (checkins.date by default)"""
+    if period_type == 'week':
+        return dialect.week_start(column)
+    if period_type == 'month':
+        return dialect.month_start(column)
+    return column
+
+# Hours come from worked_hours, the sum of each day's closed work sessions
+AGGREGATE_COLUMNS_SQL = '''
+    COUNT(id),
+    COUNT(check_in_time),
+    COUNT(CASE WHEN status = 'late' THEN 1 END),
+    COUNT(worked_hours),
+    COALESCE(SUM(worked_hours), 0)
+'''
+
+def period_bounds(period_type, day):
+    """First and last date of the period containing day"""
+    if period_type == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period_type == 'month':
+        return date(day.year, day.month, 1), date(day.year, day.month, monthrange(day.year, day.month)[1])
+    return day, day
+
+def refresh_period(conn, employee_id, period_type, start, end):
+    """Re-aggregate one employee's rollup row for one period"""
+    archived = archived_ranges(conn, start, end)
+    if archived:
+        refresh_archived_period(conn, employee_id, period_type, start, end, archived)
+        return
+    conn.execute(f'''
+        INSERT INTO attendance_rollups
+            (employee_id, period_type, period_start, days_worked, check_ins,
+             late_days, completed_days, total_hours)
+        SELECT ?, ?, ?, {AGGREGATE_COLUMNS_SQL}
+        FROM checkins
+        WHERE employee_id = ? AND date BETWEEN ? AND ?
+        ON CONFLICT (period_type, period_start, employee_id) DO UPDATE SET
+            days_worked = excluded.days_worked, check_ins = excluded.check_ins,
+            late_days = excluded.late_days, completed_days = excluded.completed_days,
+            total_hours = excluded.total_hours
+    ''', (employee_id, period_type, start, employee_id, start, end))
+    conn.execute('''
+        DELETE FROM attendance_rollups
+        WHERE period_type = ? AND period_start = ? AND employee_id = ? AND days_worked = 0
+    ''', (period_type, start, employee_id))
+
+def refresh_archived_period(conn, employee_id, period_type, start, end, archived):
+    """refresh_period() for a period partly in archived months
+
+    The check-ins still in the table are aggregated and the day rollups of
+    the archived days are added to them.
+    """
+    totals = list(conn.execute(f'''
+        SELECT {AGGREGATE_COLUMNS_SQL}
+        FROM checkins
+        WHERE employee_id = ? AND date BETWEEN ? AND ?
+    ''', (employee_id, start, end)).fetchone())
+    for first, last in archived:
+        row = conn.execute(f'''
+            SELECT {', '.join(f'COALESCE(SUM({column}), 0)' for column in ROLLUP_COLUMNS)}
+            FROM attendance_rollups
+            WHERE period_type = 'day' AND employee_id = ? AND period_start BETWEEN ? AND ?
+        ''', (employee_id, first, last)).fetchone()
+        totals = [total + value for total, value in zip(totals, row)]
+    if not totals[0]:
+        conn.execute('''
+            DELETE FROM attendance_rollups WHERE period_type = ? AND period_start = ? AND employee_id = ?
+        ''', (period_type, start, employee_id))
+        return
+    conn.execute('''
+        INSERT INTO attendance_rollups
+            (employee_id, period_type, period_start, days_worked, check_ins,
+             late_days, completed_days, total_hours)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (period_type, period_start, employee_id) DO UPDATE SET
+            days_worked = excluded.days_worked, check_ins = excluded.check_ins,
+            late_days = excluded.late_days, completed_days = excluded.completed_days,
+            total_hours = excluded.total_hours
+    ''', [employee_id, period_type, start] + totals)
+
+def refresh_rollups(conn, employee_id, day):
+    """Re-aggregate the day, week and month containing day for one employee"""
+    refresh_rollups_many(conn, [(employee_id, day)])
+
+def refresh_rollups_many(conn, keys):
+    """Re-aggregate every period touched by the given (employee_id, day) pairs"""
+    periods = set()
+    for employee_id, day in keys:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        for period_type in PERIOD_TYPES:
+            periods.add((employee_id, period_type) + period_bounds(period_type, day))
+    for employee_id, period_type, start, end in sorted(periods):
+        refresh_period(conn, employee_id, period_type, start, end)
+
+def delete_employee_rollups(conn, employee_id):
+    """Drop every rollup of a deleted employee"""
+    conn.execute('DELETE FROM attendance_rollups WHERE employee_id = ?', (employee_id,))
+
+def clear_rollups(conn):
+    """Drop every rollup (used when all check-ins are purged)"""
+    conn.execute('DELETE FROM attendance_rollups')
+
+def rebuild_rollups(conn, employee_ids=None):
+    """Recompute rollups from the checkins table in set-based passes
+
+    Without employee_ids every rollup is rebuilt; otherwise only those of
+    the given employees, so large rebuilds can be split into short
+    transactions. Day rollups of archived months are kept and summed into
+    their weeks and months.
+    """
+    dialect = dialect_of(conn)
+    params = {}
+    conditions = []
+    if employee_ids is not None:
+        params['ids'] = dialect.list_param(employee_ids)
+        conditions.append(dialect.in_list('employee_id', ':ids'))
+    archived = archived_months(conn)
+    if archived:
+        conn.execute(f'''
+            DELETE FROM attendance_rollups WHERE {' AND '.join(conditions + [f'NOT ({ARCHIVED_DAYS_SQL})'])}
+        ''', params)
+    elif employee_ids is None:
+        clear_rollups(conn)
+    else:
+        conn.execute(f'DELETE FROM attendance_rollups WHERE {conditions[0]}', params)
+    employee_filter = f'WHERE {conditions[0]}' if conditions else ''
+    for period_type in PERIOD_TYPES:
+        period_start = period_start_sql(dialect, period_type)
+        conn.execute(f'''
+            INSERT INTO attendance_rollups
+                (employee_id, period_type, period_start, days_worked, check_ins,
+                 late_days, completed_days, total_hours)
+            SELECT employee_id, :period_type, {period_start}, {AGGREGATE_COLUMNS_SQL}
+            FROM checkins
+            {employee_filter}
+            GROUP BY employee_id, {period_start}
+        ''', dict(params, period_type=period_type))
+        if archived and period_type != 'day':
+            period_start = period_start_sql(dialect, period_type, 'period_start')
+            conn.execute(f'''
+                INSERT INTO attendance_rollups
+                    (employee_id, period_type, period_start, {', '.join(ROLLUP_COLUMNS)})
+                SELECT employee_id, :period_type, {period_start},
+                       {', '.join(f'SUM({column})' for column in ROLLUP_COLUMNS)}
+                FROM attendance_rollups
+                WHERE {' AND '.join(conditions + [ARCHIVED_DAYS_SQL])}
+                GROUP BY employee_id, {period_start}
+                ON CONFLICT (period_type, period_start, employee_id) DO UPDATE SET
+                    {', '.join(f'{column} = attendance_rollups.{column} + excluded.{column}'
+                               for column in ROLLUP_COLUMNS)}
+            ''', dict(params, period_type=period_type))
+
+def get_period_activity(conn, period_type, day):
+    """Per-employee summary of the period containing day, from the rollups"""
+    start, _ = period_bounds(period_type, day)
+    return conn.execute('''
+        SELECT e.username, e.first_name, e.last_name,
+               COALESCE(r.days_worked, 0) as days_worked,
+               COALESCE(r.late_days, 0) as late_days,
+               COALESCE(r.check_ins, 0) as check_ins,
+               CASE WHEN r.completed_days > 0
+                    THEN ROUND(r.total_hours / r.completed_days, 2)
+               END as avg_hours,
+               ROUND(COALESCE(r.total_hours, 0), 2) as total_hours
+        FROM employees e
+        LEFT JOIN attendance_rollups r ON r.employee_id = e.id
+            AND r.period_type = ? AND r.period_start = ?
+        WHERE e.is_active = 1
+        ORDER BY e.username
+    ''', (period_type, start)).fetchall()
+
+def main(argv=None):
+    """Command line entry point"""
+    from .config import DB_PATH
+    from .database import get_pool
+
+    parser = argparse.ArgumentParser(prog='python -m src.rollups', description='Maintain attendance rollups')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    conn = get_pool(args.db).acquire()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        rebuild_rollups(conn)
+        conn.commit()
+        count = conn.execute('SELECT COUNT(*) FROM attendance_rollups').fetchone()[0]
+        print(f'Rebuilt {count} rollup rows')
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
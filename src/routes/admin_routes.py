@@ -1,10 +1,31 @@
 """Admin management routes"""
-from flask import Blueprint, request, redirect, url_for, session, flash, render_template
-from werkzeug.security import generate_password_hash
-from datetime import datetime, date, timedelta
-from calendar import monthrange
+from flask import (
+    Blueprint, request, redirect, url_for, session, flash, render_template,
+    jsonify, Response, stream_with_context, send_file, abort
+)
+from datetime import date, timedelta
+import base64
+import json
+import os
 from ..database import get_db_connection
-from ..config import DEFAULT_HOURLY_RATE
+from ..attendance import (
+    get_checkin_log, iter_checkin_log, delete_checkin as delete_checkin_record, last_checkin_id,
+    get_day_activity
+)
+from ..employees import (
+    list_employees, employee_choices, list_departments, get_employee, username_or_email_taken,
+    create_employee, update_employee, deactivate_employee
+)
+from ..rollups import get_period_activity, period_bounds
+from ..config import (
+    DEFAULT_HOURLY_RATE, ADMIN_LOG_PAGE_SIZE, ADMIN_LOG_MAX_PAGE_SIZE, LIVE_POLL_SECONDS, LIVE_RETRY_MS,
+    EXPORT_STREAM_MAX_DAYS, ANALYTICS_DEFAULT_DAYS
+)
+from ..cache import invalidate_employee_day, cache_stats
+from ..passwords import hash_password
+from ..rates import get_rate_index, set_rate, invalidate_rates, rate_history
+from ..live import get_live_hub, format_sse
+from ..occupancy import department_on_site, get_occupancy
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -23,25 +44,106 @@ def admin_required(f):
 def admin_panel():
     conn = get_db_connection()
     
-    # Get all check-in records
-    all_checkins = conn.execute('''
-        SELECT c.*, e.first_name, e.last_name, e.employee_id as emp_id
-        FROM checkins c
-        JOIN employees e ON c.employee_id = e.id
-        ORDER BY c.date DESC, c.check_in_time DESC
-    ''').fetchall()
+    filters = parse_log_filters(request.args)
+    page_size = parse_page_size(request.args.get('limit'), ADMIN_LOG_PAGE_SIZE)
+    after = decode_log_cursor(request.args.get('cursor'))
+    
+    # Fetch one extra row to know whether a next page exists
+    checkins = get_checkin_log(conn, filters, after, page_size + 1)
+    
+    next_cursor = None
+    if len(checkins) > page_size:
+        checkins = checkins[:page_size]
+        next_cursor = encode_log_cursor(checkins[-1])
+    
+    employees = employee_choices(conn)
+    departments = list_departments(conn)
     
     conn.close()
     
-    return render_template('admin_panel.html', checkins=all_checkins)
+    return render_template('admin_panel.html',
+                         checkins=checkins,
+                         filters=filters,
+                         employees=employees,
+                         departments=departments,
+                         next_cursor=next_cursor)
+
+@admin_bp.route('/admin/api/checkins')
+@admin_required
+def api_checkins():
+    """Stream the check-in log as JSON with the same filters as the admin panel"""
+    filters = parse_log_filters(request.args)
+    after = decode_log_cursor(request.args.get('cursor'))
+    limit = request.args.get('limit')
+    page_size = parse_page_size(limit, ADMIN_LOG_MAX_PAGE_SIZE) if limit else None
+    
+    def generate():
+        conn = get_db_connection()
+        yield '{"checkins": ['
+        count = 0
+        last = None
+        next_cursor = None
+        chunk = []
+        for row in iter_checkin_log(conn, filters, after, page_size + 1 if page_size else None):
+            if page_size and count == page_size:
+                next_cursor = encode_log_cursor(last)
+                break
+            chunk.append(json.dumps(dict(row)))
+            count += 1
+            last = row
+            if len(chunk) == 500:
+                yield (',' if count > len(chunk) else '') + ','.join(chunk)
+                chunk = []
+        if chunk:
+            yield (',' if count > len(chunk) else '') + ','.join(chunk)
+        yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def parse_log_filters(args):
+    """Read check-in log filters from query arguments"""
+    filters = {
+        'employee': args.get('employee', type=int),
+        'department': args.get('department') or None,
+        'status': args.get('status') or None,
+        'start_date': None,
+        'end_date': None
+    }
+    for key in ('start_date', 'end_date'):
+        try:
+            filters[key] = date.fromisoformat(args.get(key, ''))
+        except ValueError:
+            pass
+    return filters
+
+def parse_page_size(value, default):
+    """Clamp a requested page size to the configured bounds"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, ADMIN_LOG_MAX_PAGE_SIZE))
+
+def encode_log_cursor(row):
+    """Encode the keyset position (date, check_in_time, id) of a log row"""
+    key = [row['date'], row['check_in_time'], row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_log_cursor(value):
+    """Decode a cursor produced by encode_log_cursor, or None if invalid"""
+    if not value:
+        return None
+    try:
+        checkin_date, check_in_time, checkin_id = json.loads(base64.urlsafe_b64decode(value.encode()))
+        return str(checkin_date), None if check_in_time is None else str(check_in_time), int(checkin_id)
+    except (ValueError, TypeError):
+        return None
 
 @admin_bp.route('/admin/delete/<int:checkin_id>', methods=['POST'])
 @admin_required
 def delete_checkin(checkin_id):
     conn = get_db_connection()
-    
-    conn.execute('DELETE FROM checkins WHERE id = ?', (checkin_id,))
-    conn.commit()
+    delete_checkin_record(conn, checkin_id)
     conn.close()
     
     flash('Check-in record deleted successfully')
@@ -50,14 +152,49 @@ def delete_checkin(checkin_id):
 @admin_bp.route('/admin/purge', methods=['POST'])
 @admin_required
 def purge_all():
+    """Queue the deletion of every check-in recorded so far"""
+    from ..jobs import enqueue
     conn = get_db_connection()
     
-    conn.execute('DELETE FROM checkins')
+    enqueue(conn, 'purge_checkins', {'max_id': last_checkin_id(conn)})
     conn.commit()
     conn.close()
     
-    flash('All check-in records have been purged')
-    return redirect(url_for('admin.admin_panel'))
+    flash('Purge of all check-in records started')
+    return redirect(url_for('admin.jobs'))
+
+@admin_bp.route('/admin/live')
+@admin_required
+def live():
+    """Live attendance board"""
+    return render_template('admin/live.html')
+
+@admin_bp.route('/admin/live/stream')
+@admin_required
+def live_stream():
+    """Board events since Last-Event-ID (one-shot; the ASGI app keeps it open)"""
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    board = get_live_hub().board
+    conn = get_db_connection()
+    board.refresh(conn, max_age=LIVE_POLL_SECONDS)
+    conn.close()
+    
+    body = ''.join(format_sse(event) for event in board.events_since(last_event_id))
+    return Response(f'retry: {LIVE_RETRY_MS}\n\n' + body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+def parse_last_event_id(value):
+    """Last-Event-ID header as an int, or None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+@admin_bp.route('/admin/cache/stats')
+@admin_required
+def cache_statistics():
+    """Cache hit/miss counters of this worker process"""
+    return jsonify(cache_stats())
 
 @admin_bp.route('/admin/users')
 @admin_required
@@ -65,14 +202,8 @@ def manage_users():
     """Display user management page"""
     conn = get_db_connection()
     
-    users = conn.execute('''
-        SELECT e.id, e.employee_id, e.username, e.email, e.first_name, e.last_name, 
-               e.department, e.position, e.is_active, e.created_at,
-               br.hourly_rate
-        FROM employees e
-        LEFT JOIN billing_rates br ON e.id = br.employee_id AND br.is_active = 1
-        ORDER BY e.created_at DESC
-    ''').fetchall()
+    rates = get_rate_index(conn)
+    users = [dict(row, hourly_rate=rates.current_rate(row['id'])) for row in list_employees(conn)]
     
     conn.close()
     
@@ -97,32 +228,21 @@ def create_user():
         hourly_rate = float(request.form.get('hourly_rate', DEFAULT_HOURLY_RATE))
         
         # Check if username or email exists
-        existing = conn.execute(
-            'SELECT id FROM employees WHERE username = ? OR email = ?',
-            (username, email)
-        ).fetchone()
-        
-        if existing:
+        if username_or_email_taken(conn, username, email):
             flash('Username or email already exists')
             conn.close()
             return redirect(url_for('admin.create_user'))
         
         # Create user
-        password_hash = generate_password_hash(password)
-        cursor = conn.execute('''
-            INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department, position)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (employee_id, username, email, password_hash, first_name, last_name, department, position))
-        
-        user_id = cursor.lastrowid
+        password_hash = hash_password(password)
+        user_id = create_employee(conn, employee_id, username, email, password_hash,
+                                  first_name, last_name, department, position)
         
         # Create billing rate
-        conn.execute('''
-            INSERT INTO billing_rates (employee_id, hourly_rate, effective_date)
-            VALUES (?, ?, ?)
-        ''', (user_id, hourly_rate, date.today()))
+        set_rate(conn, user_id, hourly_rate)
         
         conn.commit()
+        invalidate_rates(conn)
         conn.close()
         
         flash(f'User {username} created successfully')
@@ -145,157 +265,355 @@ def edit_user(user_id):
         position = request.form['position']
         is_active = 1 if request.form.get('is_active') else 0
         hourly_rate = float(request.form.get('hourly_rate', DEFAULT_HOURLY_RATE))
+        rate_effective_date = request.form.get('rate_effective_date') or date.today().isoformat()
         
-        conn.execute('''
-            UPDATE employees 
-            SET email = ?, first_name = ?, last_name = ?, department = ?, position = ?, is_active = ?
-            WHERE id = ?
-        ''', (email, first_name, last_name, department, position, is_active, user_id))
+        update_employee(conn, user_id, email, first_name, last_name, department, position, is_active)
         
-        # Update billing rate
-        conn.execute('''
-            UPDATE billing_rates 
-            SET hourly_rate = ?
-            WHERE employee_id = ? AND is_active = 1
-        ''', (hourly_rate, user_id))
+        # A rate change starts a new version, keeping past periods at their old rate
+        if hourly_rate != get_rate_index(conn).rate_at(user_id, rate_effective_date):
+            set_rate(conn, user_id, hourly_rate, rate_effective_date)
         
         conn.commit()
+        invalidate_rates(conn)
         conn.close()
         
         flash('User updated successfully')
         return redirect(url_for('admin.manage_users'))
     
     # Get user data
-    user = conn.execute('''
-        SELECT e.*, br.hourly_rate
-        FROM employees e
-        LEFT JOIN billing_rates br ON e.id = br.employee_id AND br.is_active = 1
-        WHERE e.id = ?
-    ''', (user_id,)).fetchone()
-    
-    conn.close()
+    user = get_employee(conn, user_id)
     
     if not user:
+        conn.close()
         flash('User not found')
         return redirect(url_for('admin.manage_users'))
     
-    return render_template('admin/edit_user.html', user=user)
+    user = dict(user, hourly_rate=get_rate_index(conn).current_rate(user_id))
+    history = rate_history(conn, user_id)
+    conn.close()
+    
+    return render_template('admin/edit_user.html', user=user, rate_history=history,
+                           today=date.today().isoformat())
 
 @admin_bp.route('/admin/users/<int:user_id>/delete', methods=['POST'])
 @admin_required
 def delete_user(user_id):
     """Delete user"""
+    from ..jobs import enqueue
     conn = get_db_connection()
     
     # Check if user exists and is not admin
-    user = conn.execute('SELECT username FROM employees WHERE id = ?', (user_id,)).fetchone()
+    user = get_employee(conn, user_id)
     
     if not user:
         flash('User not found')
     elif user['username'] == 'admin':
         flash('Cannot delete admin user')
     else:
-        # Delete user and related data
-        conn.execute('DELETE FROM billing_rates WHERE employee_id = ?', (user_id,))
-        conn.execute('DELETE FROM checkins WHERE employee_id = ?', (user_id,))
-        conn.execute('DELETE FROM employees WHERE id = ?', (user_id,))
+        # Deactivate now so the user can no longer log in; the data is
+        # deleted in chunks by the job worker
+        deactivate_employee(conn, user_id)
+        enqueue(conn, 'delete_employee', {'employee_id': user_id})
         conn.commit()
-        flash('User deleted successfully')
+        invalidate_employee_day(user_id, date.today())
+        flash('User deactivated; their data is being deleted')
     
     conn.close()
     return redirect(url_for('admin.manage_users'))
 
+@admin_bp.route('/admin/billing/export')
+@admin_required
+def billing_export():
+    """Start a background billing export for all (or filtered) employees as CSV, JSONL or XLSX"""
+    from ..billing_export import EXPORT_FORMATS, check_export_format
+    from ..jobs import enqueue
+    try:
+        start_date = date.fromisoformat(request.args.get('start_date', ''))
+        end_date = date.fromisoformat(request.args.get('end_date', ''))
+    except ValueError:
+        flash('Invalid billing export period')
+        return redirect(url_for('admin.reports'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+    try:
+        check_export_format(export_format)
+    except RuntimeError as e:
+        flash(str(e))
+        return redirect(url_for('admin.reports'))
+    
+    conn = get_db_connection()
+    enqueue(conn, 'billing_export', {
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+        'format': export_format,
+        'employee_ids': request.args.getlist('employee', type=int) or None,
+        'department': request.args.get('department') or None
+    })
+    conn.commit()
+    conn.close()
+    flash('Export started; download it here when it is done')
+    return redirect(url_for('admin.jobs'))
+
+@admin_bp.route('/admin/attendance/export')
+@admin_required
+def attendance_export_download():
+    """Stream attendance history, or start a background export for long ranges"""
+    from .. import attendance_export
+    from ..jobs import enqueue
+    try:
+        start_date = date.fromisoformat(request.args.get('start_date', ''))
+        end_date = date.fromisoformat(request.args.get('end_date', ''))
+    except ValueError:
+        flash('Invalid attendance export period')
+        return redirect(url_for('admin.reports'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in attendance_export.EXPORT_FORMATS:
+        export_format = 'csv'
+    try:
+        attendance_export.check_export_format(export_format)
+    except RuntimeError as e:
+        flash(str(e))
+        return redirect(url_for('admin.reports'))
+    options = dict(
+        start_date=str(start_date),
+        end_date=str(end_date),
+        format=export_format,
+        gzip=request.args.get('gzip') == '1',
+        details=request.args.get('details') == '1',
+        rates=request.args.get('rates') == '1',
+        employee_codes=[code for code in request.args.getlist('employee') if code] or None,
+        department=request.args.get('department') or None
+    )
+    
+    if request.args.get('background') == '1' or (end_date - start_date).days > EXPORT_STREAM_MAX_DAYS:
+        conn = get_db_connection()
+        enqueue(conn, 'attendance_export', options)
+        conn.commit()
+        conn.close()
+        flash('Export started; download it here when it is done')
+        return redirect(url_for('admin.jobs'))
+    
+    def generate():
+        conn = get_db_connection()
+        try:
+            rows = attendance_export.iter_attendance_rows(
+                conn, start_date, end_date, options['employee_codes'], options['department'],
+                options['details'], options['rates'])
+            columns = attendance_export.export_columns(options['details'], options['rates'])
+            yield from attendance_export.iter_export(rows, export_format, columns, options['gzip'])
+        finally:
+            conn.close()
+    
+    filename = attendance_export.export_filename(start_date, end_date, export_format, options['gzip'])
+    return Response(stream_with_context(generate()),
+                    mimetype=attendance_export.export_mimetype(export_format, options['gzip']),
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@admin_bp.route('/admin/jobs')
+@admin_required
+def jobs():
+    """Background jobs, their progress and export downloads"""
+    from ..jobs import list_jobs
+    conn = get_db_connection()
+    recent = list_jobs(conn)
+    conn.close()
+    running = any(job['status'] in ('queued', 'running') for job in recent)
+    return render_template('admin/jobs.html', jobs=recent, running=running)
+
+@admin_bp.route('/admin/jobs/<int:job_id>')
+@admin_required
+def job_status(job_id):
+    """Status and progress of a background job as JSON"""
+    from ..jobs import get_job
+    conn = get_db_connection()
+    job = get_job(conn, job_id)
+    conn.close()
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@admin_bp.route('/admin/jobs/<int:job_id>/download')
+@admin_required
+def job_download(job_id):
+    """Download the file written by a finished export job"""
+    from ..jobs import get_job, export_path
+    conn = get_db_connection()
+    job = get_job(conn, job_id)
+    conn.close()
+    path = export_path(job['result']) if job and job['status'] == 'done' else None
+    if path is None or not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=job['result']['filename'],
+                     mimetype=job['result']['mimetype'])
+
+@admin_bp.route('/admin/jobs/rollups', methods=['POST'])
+@admin_required
+def rebuild_rollups_job():
+    """Queue a rebuild of the report rollups"""
+    from ..jobs import enqueue
+    conn = get_db_connection()
+    enqueue(conn, 'rebuild_rollups')
+    conn.commit()
+    conn.close()
+    flash('Report rollups are being rebuilt')
+    return redirect(url_for('admin.jobs'))
+
+@admin_bp.route('/admin/jobs/statuses', methods=['POST'])
+@admin_required
+def reevaluate_statuses_job():
+    """Queue a recomputation of check-in statuses over a date range"""
+    from ..jobs import enqueue
+    try:
+        start_date = date.fromisoformat(request.form.get('start_date', ''))
+        end_date = date.fromisoformat(request.form.get('end_date', ''))
+    except ValueError:
+        flash('Invalid period')
+        return redirect(url_for('admin.jobs'))
+    
+    conn = get_db_connection()
+    enqueue(conn, 'reevaluate_statuses', {'start_date': str(start_date), 'end_date': str(end_date)})
+    conn.commit()
+    conn.close()
+    flash('Check-in statuses are being recomputed')
+    return redirect(url_for('admin.jobs'))
+
 @admin_bp.route('/admin/reports')
 @admin_required
 def reports():
     """Display activity reports"""
     conn = get_db_connection()
     
-    # Get period from request
+    # Get period and reference date from request
     period = request.args.get('period', 'week')
+    if period not in ('day', 'week', 'month'):
+        period = 'week'
+    try:
+        day = date.fromisoformat(request.args.get('date', ''))
+    except ValueError:
+        day = date.today()
     
     if period == 'day':
-        activity_data = get_daily_activity(conn)
+        activity_data = get_daily_activity(conn, day)
     elif period == 'month':
-        activity_data = get_monthly_activity(conn)
+        activity_data = get_monthly_activity(conn, day)
     else:  # week
-        activity_data = get_weekly_activity(conn)
+        activity_data = get_weekly_activity(conn, day)
     
     conn.close()
     
+    # Neighbouring periods for navigation
+    start, end = period_bounds(period, day)
+    previous_date = period_bounds(period, start - timedelta(days=1))[0]
+    next_date = end + timedelta(days=1)
+    
     return render_template('admin/reports.html', 
                          activity_data=activity_data,
-                         period=period)
+                         period=period,
+                         report_date=day,
+                         previous_date=previous_date,
+                         next_date=next_date)
+
+def parse_analytics_period(args):
+    """(start, end) from start_date/end_date, the last ANALYTICS_DEFAULT_DAYS by default"""
+    end_date = date.fromisoformat(args['end_date']) if args.get('end_date') else date.today()
+    if args.get('start_date'):
+        return date.fromisoformat(args['start_date']), end_date
+    return end_date - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1), end_date
 
-def get_daily_activity(conn):
-    """Get today's activity"""
-    today = date.today()
+@admin_bp.route('/admin/reports/analytics')
+@admin_required
+def analytics():
+    """Lateness, arrival and overtime analytics over a period"""
+    from ..analytics import VIEWS as ANALYTICS_VIEWS, attendance_report
+    view = request.args.get('view', 'trends')
+    if view not in ANALYTICS_VIEWS:
+        view = 'trends'
+    department = request.args.get('department') or None
+    
+    conn = get_db_connection()
+    try:
+        start_date, end_date = parse_analytics_period(request.args)
+        report = attendance_report(conn, view, start_date, end_date, department)
+        departments = list_departments(conn)
+    except (ValueError, RuntimeError) as e:
+        flash(str(e))
+        return redirect(url_for('admin.reports'))
+    finally:
+        conn.close()
     
-    activities = conn.execute('''
-        SELECT e.username, e.first_name, e.last_name,
-               c.check_in_time, c.check_out_time, c.status
-        FROM employees e
-        LEFT JOIN checkins c ON e.id = c.employee_id AND c.date = ?
-        WHERE e.is_active = 1
-        ORDER BY e.username
-    ''', (today,)).fetchall()
+    return render_template('admin/analytics.html',
+                         report=report,
+                         views=ANALYTICS_VIEWS,
+                         departments=departments)
+
+@admin_bp.route('/admin/api/analytics/<view>')
+@admin_required
+def api_analytics(view):
+    """One analytics view as JSON"""
+    from ..analytics import attendance_report
+    conn = get_db_connection()
+    try:
+        start_date, end_date = parse_analytics_period(request.args)
+        return jsonify(attendance_report(conn, view, start_date, end_date,
+                                         request.args.get('department') or None))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    finally:
+        conn.close()
+
+@admin_bp.route('/admin/api/occupancy')
+@admin_required
+def api_occupancy():
+    """Head count of employees on site, in total and per department"""
+    conn = get_db_connection()
+    try:
+        index = get_occupancy(conn)
+        return jsonify({'on_site': index.head_count(), 'departments': index.department_counts()})
+    finally:
+        conn.close()
+
+@admin_bp.route('/admin/api/occupancy/<department>')
+@admin_required
+def api_department_occupancy(department):
+    """Employees of one department on site"""
+    conn = get_db_connection()
+    try:
+        employees = department_on_site(conn, department)
+        return jsonify({'department': department, 'on_site': len(employees), 'employees': employees})
+    finally:
+        conn.close()
+
+def get_daily_activity(conn, day=None):
+    """Get one day's activity (today by default)"""
+    day = day or date.today()
     
     return {
-        'title': f'Daily Activity - {today}',
-        'activities': activities
+        'title': f'Daily Activity - {day}',
+        'activities': get_day_activity(conn, day)
     }
 
-def get_weekly_activity(conn):
-    """Get this week's activity"""
-    today = date.today()
-    week_start = today - timedelta(days=today.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    activities = conn.execute('''
-        SELECT e.username, e.first_name, e.last_name,
-               COUNT(c.id) as days_worked,
-               COUNT(CASE WHEN c.status = 'late' THEN 1 END) as late_days,
-               COUNT(CASE WHEN c.check_in_time IS NOT NULL THEN 1 END) as check_ins
-        FROM employees e
-        LEFT JOIN checkins c ON e.id = c.employee_id 
-            AND c.date BETWEEN ? AND ?
-        WHERE e.is_active = 1
-        GROUP BY e.id, e.username, e.first_name, e.last_name
-        ORDER BY e.username
-    ''', (week_start, week_end)).fetchall()
+def get_weekly_activity(conn, day=None):
+    """Get the activity of the week containing day (this week by default)"""
+    week_start, week_end = period_bounds('week', day or date.today())
     
     return {
         'title': f'Weekly Activity - {week_start} to {week_end}',
-        'activities': activities,
+        'activities': get_period_activity(conn, 'week', week_start),
         'is_summary': True
     }
 
-def get_monthly_activity(conn):
-    """Get this month's activity"""
-    today = date.today()
-    month_start = date(today.year, today.month, 1)
-    month_end = date(today.year, today.month, monthrange(today.year, today.month)[1])
-    
-    activities = conn.execute('''
-        SELECT e.username, e.first_name, e.last_name,
-               COUNT(c.id) as days_worked,
-               COUNT(CASE WHEN c.status = 'late' THEN 1 END) as late_days,
-               COUNT(CASE WHEN c.check_in_time IS NOT NULL THEN 1 END) as check_ins,
-               ROUND(AVG(CASE 
-                   WHEN c.check_in_time IS NOT NULL AND c.check_out_time IS NOT NULL 
-                   THEN (julianday(c.check_out_time) - julianday(c.check_in_time)) * 24 
-               END), 2) as avg_hours
-        FROM employees e
-        LEFT JOIN checkins c ON e.id = c.employee_id 
-            AND c.date BETWEEN ? AND ?
-        WHERE e.is_active = 1
-        GROUP BY e.id, e.username, e.first_name, e.last_name
-        ORDER BY e.username
-    ''', (month_start, month_end)).fetchall()
+def get_monthly_activity(conn, day=None):
+    """Get the activity of the month containing day (this month by default)"""
+    month_start, _ = period_bounds('month', day or date.today())
     
     return {
         'title': f'Monthly Activity - {month_start.strftime("%B %Y")}',
-        'activities': activities,
+        'activities': get_period_activity(conn, 'month', month_start),
         'is_summary': True,
         'show_hours': True
     }
\ No newline at end of file
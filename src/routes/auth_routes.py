@@ -1,7 +1,11 @@
 """Authentication routes"""
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import check_password_hash
 from ..database import get_db_connection
+from ..employees import find_login, set_password_hash
+from ..tenants import current_tenant
+from ..passwords import (
+    PasswordHashBusy, verify_password, needs_rehash, rehash_password, login_limiter
+)
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -11,19 +15,37 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
+        # Turn floods away before spending any hashing time on them; the
+        # client address comes from the proxy when TRUSTED_PROXY_COUNT is set
+        user_key = f'user:{current_tenant() or ""}:{username.lower()}'
+        address_key = f'ip:{request.remote_addr}'
+        if not login_limiter.allow(user_key, address_key):
+            flash('Too many login attempts, please try again later')
+            return render_template('login.html'), 429
+        
         conn = get_db_connection()
-        employee = conn.execute(
-            'SELECT * FROM employees WHERE username = ? AND is_active = 1',
-            (username,)
-        ).fetchone()
+        employee = find_login(conn, username)
+        
+        try:
+            valid = employee is not None and verify_password(employee['password_hash'], password)
+            if valid and needs_rehash(employee['password_hash']):
+                set_password_hash(conn, employee['id'], rehash_password(password))
+                conn.commit()
+        except PasswordHashBusy:
+            conn.close()
+            flash('The server is busy, please try again in a moment')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
         conn.close()
         
-        if employee and check_password_hash(employee['password_hash'], password):
+        if valid:
+            login_limiter.reset(user_key, address_key)
             session['employee_id'] = employee['id']
+            session['tenant'] = current_tenant()
             session['username'] = employee['username']
             session['employee_name'] = employee['username']  # Use username for admin check
             return redirect(url_for('main.dashboard'))
         else:
+            login_limiter.failed(user_key, address_key)
             flash('Invalid username or password')
     
     return render_template('login.html')
@@ -1,8 +1,10 @@
 """Billing and reporting routes"""
-from flask import Blueprint, request, render_template, session, redirect, url_for
-from datetime import datetime, date, timedelta
+from flask import Blueprint, request, render_template, session, redirect, url_for, jsonify
+from datetime import datetime, date
 from calendar import monthrange
 from ..database import get_db_connection
+from ..billing_engine import compute_employee_billing
+from ..rates import get_rate_index
 
 billing_bp = Blueprint('billing', __name__)
 
@@ -21,38 +23,15 @@ def billing_report():
     """Display billing report page"""
     conn = get_db_connection()
     
-    # Get current month data by default
-    today = date.today()
-    start_date = date(today.year, today.month, 1)
-    end_date = date(today.year, today.month, monthrange(today.year, today.month)[1])
-    
-    # Get period from request
-    period = request.args.get('period', 'this_month')
+    period, start_date, end_date = resolve_billing_period(request.args)
     custom_start = request.args.get('start_date')
     custom_end = request.args.get('end_date')
     
-    if period == 'last_month':
-        if today.month == 1:
-            start_date = date(today.year - 1, 12, 1)
-            end_date = date(today.year - 1, 12, 31)
-        else:
-            start_date = date(today.year, today.month - 1, 1)
-            end_date = date(today.year, today.month - 1, monthrange(today.year, today.month - 1)[1])
-    elif period == 'custom' and custom_start and custom_end:
-        start_date = datetime.strptime(custom_start, '%Y-%m-%d').date()
-        end_date = datetime.strptime(custom_end, '%Y-%m-%d').date()
-    
     # Get billing data
     billing_data = get_billing_data(conn, session['employee_id'], start_date, end_date)
     
     # Get current hourly rate
-    current_rate = conn.execute('''
-        SELECT hourly_rate FROM billing_rates 
-        WHERE employee_id = ? AND is_active = 1 
-        ORDER BY effective_date DESC LIMIT 1
-    ''', (session['employee_id'],)).fetchone()
-    
-    hourly_rate = current_rate['hourly_rate'] if current_rate else 25.00
+    hourly_rate = get_rate_index(conn).current_rate(session['employee_id'])
     
     conn.close()
     
@@ -65,67 +44,52 @@ def billing_report():
                          custom_start=custom_start,
                          custom_end=custom_end)
 
-def get_billing_data(conn, employee_id, start_date, end_date):
-    """Calculate billing data for the given period"""
-    checkins = conn.execute('''
-        SELECT date, check_in_time, check_out_time, status
-        FROM checkins 
-        WHERE employee_id = ? AND date BETWEEN ? AND ?
-        AND check_in_time IS NOT NULL AND check_out_time IS NOT NULL
-        ORDER BY date
-    ''', (employee_id, start_date, end_date)).fetchall()
+@billing_bp.route('/api/billing')
+@login_required
+def api_billing():
+    """API endpoint for the billing report"""
+    try:
+        _, start_date, end_date = resolve_billing_period(request.args)
+    except ValueError:
+        return jsonify({'error': 'invalid period'}), 400
     
-    billing_records = []
-    total_hours = 0
-    total_cost = 0
+    conn = get_db_connection()
+    billing_data = get_billing_data(conn, session['employee_id'], start_date, end_date)
+    conn.close()
     
-    # Get hourly rate for the period
-    rate_record = conn.execute('''
-        SELECT hourly_rate FROM billing_rates 
-        WHERE employee_id = ? AND effective_date <= ? AND is_active = 1
-        ORDER BY effective_date DESC LIMIT 1
-    ''', (employee_id, end_date)).fetchone()
+    return jsonify(billing_data_to_json(billing_data))
+
+def resolve_billing_period(args, today=None):
+    """Return (period, start_date, end_date) for the billing query arguments"""
+    # Get current month data by default
+    today = today or date.today()
+    start_date = date(today.year, today.month, 1)
+    end_date = date(today.year, today.month, monthrange(today.year, today.month)[1])
     
-    hourly_rate = rate_record['hourly_rate'] if rate_record else 25.00
+    # Get period from request
+    period = args.get('period', 'this_month')
+    custom_start = args.get('start_date')
+    custom_end = args.get('end_date')
     
-    for checkin in checkins:
-        if checkin['check_in_time'] and checkin['check_out_time']:
-            # Parse datetime strings - handle both formats
-            try:
-                check_in = datetime.strptime(checkin['check_in_time'], '%Y-%m-%d %H:%M:%S.%f')
-            except ValueError:
-                check_in = datetime.strptime(checkin['check_in_time'], '%Y-%m-%d %H:%M:%S')
-            
-            try:
-                check_out = datetime.strptime(checkin['check_out_time'], '%Y-%m-%d %H:%M:%S.%f')
-            except ValueError:
-                check_out = datetime.strptime(checkin['check_out_time'], '%Y-%m-%d %H:%M:%S')
-            
-            # Calculate hours worked
-            time_diff = check_out - check_in
-            hours_worked = time_diff.total_seconds() / 3600
-            
-            # Calculate cost
-            daily_cost = hours_worked * hourly_rate
-            
-            billing_records.append({
-                'date': checkin['date'],
-                'check_in': check_in.strftime('%H:%M'),
-                'check_out': check_out.strftime('%H:%M'),
-                'hours_worked': round(hours_worked, 2),
-                'hourly_rate': hourly_rate,
-                'cost': round(daily_cost, 2),
-                'status': checkin['status']
-            })
-            
-            total_hours += hours_worked
-            total_cost += daily_cost
+    if period == 'last_month':
+        if today.month == 1:
+            start_date = date(today.year - 1, 12, 1)
+            end_date = date(today.year - 1, 12, 31)
+        else:
+            start_date = date(today.year, today.month - 1, 1)
+            end_date = date(today.year, today.month - 1, monthrange(today.year, today.month - 1)[1])
+    elif period == 'custom' and custom_start and custom_end:
+        start_date = datetime.strptime(custom_start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(custom_end, '%Y-%m-%d').date()
     
-    return {
-        'records': billing_records,
-        'total_hours': round(total_hours, 2),
-        'total_cost': round(total_cost, 2),
-        'hourly_rate': hourly_rate,
-        'period_start': start_date,
-        'period_end': end_date
-    }
\ No newline at end of file
+    return period, start_date, end_date
+
+def billing_data_to_json(billing_data):
+    """Make billing data JSON serializable"""
+    return dict(billing_data,
+                period_start=str(billing_data['period_start']),
+                period_end=str(billing_data['period_end']))
+
+def get_billing_data(conn, employee_id, start_date, end_date):
+    """Calculate billing data for the given period"""
+    return compute_employee_billing(conn, employee_id, start_date, end_date)
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Badge reader ingestion routes"""
+import hmac
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from ..database import get_db_connection
+from ..config import INGEST_API_TOKENS, INGEST_MAX_EVENTS
+from ..ingest import ingest_batch, summarize
+from ..tenants import current_tenant
+
+ingest_bp = Blueprint('ingest', __name__)
+
+def valid_tokens():
+    """Tokens of the current tenant: INGEST_API_TOKENS entries '<tenant>:<token>' in multi-tenant mode"""
+    tenant = current_tenant()
+    if tenant is None:
+        return INGEST_API_TOKENS
+    prefix = f'{tenant}:'
+    return [token[len(prefix):] for token in INGEST_API_TOKENS
+            if token.startswith(prefix) and len(token) > len(prefix)]
+
+def token_required(f):
+    """Decorator to require a bearer token from INGEST_API_TOKENS"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not any(
+            hmac.compare_digest(token.encode(), valid.encode()) for valid in valid_tokens()
+        ):
+            response = jsonify({'error': 'invalid or missing token'})
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            return response, 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+@ingest_bp.route('/api/ingest/events', methods=['POST'])
+@token_required
+def ingest_events():
+    """Apply a batch of check-in/check-out events (JSON lines)"""
+    lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    if not lines:
+        return jsonify({'error': 'no events'}), 400
+    if len(lines) > INGEST_MAX_EVENTS:
+        return jsonify({'error': f'at most {INGEST_MAX_EVENTS} events per request'}), 413
+    
+    conn = get_db_connection()
+    results = ingest_batch(conn, lines)
+    conn.close()
+    
+    return jsonify({'summary': summarize(results), 'results': results})
\ No newline at end of file
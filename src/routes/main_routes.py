@@ -1,7 +1,8 @@
 """Main application routes"""
 from flask import Blueprint, render_template, session, redirect, url_for
 from ..database import get_db_connection
-from datetime import datetime, date
+from ..attendance import get_day_checkin, get_recent_checkins
+from datetime import date
 
 main_bp = Blueprint('main', __name__)
 
@@ -27,18 +28,10 @@ def dashboard():
     
     # Get today's check-in status
     today = date.today()
-    checkin_today = conn.execute(
-        'SELECT * FROM checkins WHERE employee_id = ? AND date = ?',
-        (session['employee_id'], today)
-    ).fetchone()
+    checkin_today = get_day_checkin(conn, session['employee_id'], today)
     
     # Get recent check-ins (last 7 days)
-    recent_checkins = conn.execute('''
-        SELECT * FROM checkins 
-        WHERE employee_id = ? 
-        ORDER BY date DESC 
-        LIMIT 7
-    ''', (session['employee_id'],)).fetchall()
+    recent_checkins = get_recent_checkins(conn, session['employee_id'])
     
     conn.close()
     
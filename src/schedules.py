@@ -0,0 +1,211 @@
+"""Per-employee work schedules and attendance status
+
+work_schedules rows (day_of_week 0 = Monday ... 6 = Sunday, as
+date.weekday()) are compiled into a weekly schedule: seven [start, end]
+pairs in seconds since midnight, or None for a day off. Employees without
+any active row follow WORK_START_TIME/WORK_END_TIME every day. Compiled
+schedules are cached through src/cache.py and invalidated by set_schedule(),
+so a status decision is a list lookup and two comparisons.
+
+Usage:
+    python -m src.schedules show --employee EMP001 [--db checkin_system.db]
+    python -m src.schedules reevaluate --start 2024-01-01 --end 2024-12-31 [--employee EMP001]
+"""
+import argparse
+import sys
+from datetime import date, datetime, time, timedelta
+from .cache import cached, get_cache, invalidate_all, schedule_key
+from .config import WORK_START_TIME, WORK_END_TIME, LATE_THRESHOLD_MINUTES, EARLY_LEAVE_THRESHOLD_MINUTES
+from .dialects import dialect_of
+from .live import publish_event
+from .rollups import refresh_rollups_many
+
+def time_to_seconds(value):
+    """Seconds since midnight of an 'HH:MM' or 'HH:MM:SS' string"""
+    parts = [int(part) for part in value.split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+DEFAULT_DAY = [time_to_seconds(WORK_START_TIME), time_to_seconds(WORK_END_TIME)]
+DEFAULT_SCHEDULE = [DEFAULT_DAY] * 7
+LATE_SECONDS = LATE_THRESHOLD_MINUTES * 60
+EARLY_LEAVE_SECONDS = EARLY_LEAVE_THRESHOLD_MINUTES * 60
+
+def compile_schedule(rows):
+    """Weekly schedule from (day_of_week, start_time, end_time) rows"""
+    if not rows:
+        return DEFAULT_SCHEDULE
+    schedule = [None] * 7
+    for day_of_week, start_time, end_time in rows:
+        schedule[day_of_week] = [time_to_seconds(start_time), time_to_seconds(end_time)]
+    return schedule
+
+def load_schedules(conn, employee_ids):
+    """Compiled schedules of several employees, read in one query"""
+    dialect = dialect_of(conn)
+    rows = {}
+    for row in conn.execute(f'''
+        SELECT employee_id, day_of_week, start_time, end_time FROM work_schedules
+        WHERE is_active = 1 AND {dialect.in_list('employee_id', '?')}
+    ''', (dialect.list_param(employee_ids),)):
+        rows.setdefault(row['employee_id'], []).append(
+            (row['day_of_week'], row['start_time'], row['end_time']))
+    return {employee_id: compile_schedule(rows.get(employee_id)) for employee_id in employee_ids}
+
+def get_schedule(conn, employee_id):
+    """An employee's compiled weekly schedule (cached)"""
+    return cached(conn, schedule_key(employee_id),
+                  lambda conn: load_schedules(conn, [employee_id])[employee_id])
+
+def set_schedule(conn, employee_id, days):
+    """Replace an employee's schedule with {day_of_week: (start_time, end_time)}
+
+    An empty mapping reverts to the default hours. Existing check-ins keep
+    their status until reevaluate_statuses() is run for them.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM work_schedules WHERE employee_id = ?', (employee_id,))
+        conn.executemany('''
+            INSERT INTO work_schedules (employee_id, day_of_week, start_time, end_time)
+            VALUES (?, ?, ?, ?)
+        ''', [(employee_id, day_of_week, start, end) for day_of_week, (start, end) in sorted(days.items())])
+        publish_event(conn, 'schedule', employee_id, date.today())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    get_cache().delete(schedule_key(employee_id))
+
+def seconds_of_day(moment):
+    return moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1000000
+
+def shift_end(schedule, day):
+    """End of the shift scheduled to start on day, or None on a day off
+
+    A shift that ends at or before its start time ends the next day.
+    """
+    hours = schedule[day.weekday()]
+    if hours is None:
+        return None
+    end = datetime.combine(day, time()) + timedelta(seconds=hours[1])
+    return end + timedelta(days=1) if hours[1] <= hours[0] else end
+
+def arrival_status(schedule, moment):
+    """'late' when arriving more than LATE_THRESHOLD_MINUTES after the start"""
+    day = schedule[moment.weekday()]
+    if day is not None and seconds_of_day(moment) - day[0] > LATE_SECONDS:
+        return 'late'
+    return 'on_time'
+
+def is_early_leave(schedule, moment):
+    """Whether leaving at moment is more than EARLY_LEAVE_THRESHOLD_MINUTES early"""
+    day = schedule[moment.weekday()]
+    return day is not None and day[1] - seconds_of_day(moment) > EARLY_LEAVE_SECONDS
+
+def departure_status(schedule, moment, status):
+    """Status after checking out; lateness takes precedence over leaving early"""
+    if status == 'on_time' and is_early_leave(schedule, moment):
+        return 'early_leave'
+    return status
+
+def reevaluate_statuses(conn, start_date, end_date, employee_ids=None):
+    """Recompute on_time/late/early_leave for a date range in one statement
+
+    Schedules are compiled once into a temporary table and joined by
+    weekday; check-outs after midnight (night shifts) are never early.
+    Affected rollups are refreshed and the caller commits. Returns
+    the number of check-ins whose status changed; archived months
+    (src/archive.py) are not in the table and keep their statuses.
+    """
+    if employee_ids is None:
+        employee_ids = [row[0] for row in conn.execute('SELECT id FROM employees')]
+    schedules = load_schedules(conn, employee_ids)
+
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS schedule_offsets (
+            employee_id INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,
+            start_second INTEGER,
+            end_second INTEGER,
+            PRIMARY KEY (employee_id, day_of_week)
+        )
+    ''')
+    conn.execute('DELETE FROM schedule_offsets')
+    conn.executemany('INSERT INTO schedule_offsets VALUES (?, ?, ?, ?)', [
+        (employee_id, day_of_week, day[0] if day else None, day[1] if day else None)
+        for employee_id, schedule in schedules.items()
+        for day_of_week, day in enumerate(schedule)
+    ])
+
+    dialect = dialect_of(conn)
+    arrival = dialect.seconds_of_day('c.check_in_time')
+    departure = dialect.seconds_of_day('c.check_out_time')
+    changed = conn.execute(f'''
+        UPDATE checkins SET status = evaluated.status
+        FROM (
+            SELECT c.id,
+                   CASE
+                       WHEN s.start_second IS NULL THEN 'on_time'
+                       WHEN {arrival} - s.start_second > :late THEN 'late'
+                       WHEN c.check_out_time IS NOT NULL AND {dialect.days_between('c.date', 'c.check_out_time')} = 0
+                            AND s.end_second - {departure} > :early THEN 'early_leave'
+                       ELSE 'on_time'
+                   END AS status
+            FROM checkins c
+            JOIN schedule_offsets s ON s.employee_id = c.employee_id
+                AND s.day_of_week = {dialect.day_of_week('c.date')}
+            WHERE c.date BETWEEN :start AND :end AND c.check_in_time IS NOT NULL
+        ) AS evaluated
+        WHERE checkins.id = evaluated.id AND checkins.status IS DISTINCT FROM evaluated.status
+        RETURNING checkins.employee_id, checkins.date
+    ''', {'late': LATE_SECONDS, 'early': EARLY_LEAVE_SECONDS,
+          'start': str(start_date), 'end': str(end_date)}).fetchall()
+    conn.execute('DELETE FROM schedule_offsets')
+
+    refresh_rollups_many(conn, [(row['employee_id'], row['date']) for row in changed])
+    return len(changed)
+
+def main(argv=None):
+    """Command line entry point"""
+    from .config import DB_PATH
+    from .database import get_pool
+
+    parser = argparse.ArgumentParser(prog='python -m src.schedules', description='Work schedules')
+    parser.add_argument('command', choices=['show', 'reevaluate'])
+    parser.add_argument('--employee', help='employee ID (e.g. EMP001)')
+    parser.add_argument('--start', type=date.fromisoformat, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', type=date.fromisoformat, help='last day (YYYY-MM-DD)')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    conn = get_pool(args.db).acquire()
+    try:
+        employee_ids = None
+        if args.employee:
+            row = conn.execute('SELECT id FROM employees WHERE employee_id = ?', (args.employee,)).fetchone()
+            if row is None:
+                parser.error(f'unknown employee {args.employee}')
+            employee_ids = [row['id']]
+
+        if args.command == 'show':
+            if employee_ids is None:
+                parser.error('show needs --employee')
+            schedule = load_schedules(conn, employee_ids)[employee_ids[0]]
+            for day_of_week, day in enumerate(schedule):
+                hours = 'off' if day is None else '{:02d}:{:02d}-{:02d}:{:02d}'.format(
+                    day[0] // 3600, day[0] % 3600 // 60, day[1] // 3600, day[1] % 3600 // 60)
+                print(f"{date(2024, 1, 1 + day_of_week).strftime('%A'):<10} {hours}")
+        else:
+            if not args.start or not args.end:
+                parser.error('reevaluate needs --start and --end')
+            conn.execute('BEGIN IMMEDIATE')
+            changed = reevaluate_statuses(conn, args.start, args.end, employee_ids)
+            conn.commit()
+            invalidate_all()
+            print(f'{changed} check-in statuses updated')
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
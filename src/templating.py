@@ -0,0 +1,56 @@
+"""Template compilation and fragment caching
+
+Compiled templates are kept in TEMPLATE_CACHE_DIR, shared by every worker,
+so a worker recycled by gunicorn's max_requests loads bytecode instead of
+recompiling each template. Jinja checks the source checksum on load and
+recompiles a template whose file changed.
+
+Parts of a page that only depend on the language or the user's role are
+wrapped in {% cache 'name', key... %}...{% endcache %} and rendered once per
+process and key. They must not contain per-user or per-request data.
+"""
+import os
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from .config import TEMPLATE_CACHE_DIR
+
+class FragmentCacheExtension(Extension):
+    """{% cache %} tag: renders its body once per key and process"""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={})
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        cache = self.environment.fragment_cache
+        # Edited templates are reloaded in debug mode; their fragments are not
+        if cache is None or self.environment.auto_reload:
+            return caller()
+        key = tuple(key)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = cache[key] = caller()
+        return fragment
+
+def bytecode_cache(directory=TEMPLATE_CACHE_DIR):
+    """Bytecode cache in directory, or None when caching is disabled"""
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+def init_templates(app):
+    """Enable the bytecode cache and the {% cache %} tag on the app's templates"""
+    app.jinja_env.bytecode_cache = bytecode_cache()
+    app.jinja_env.add_extension(FragmentCacheExtension)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""Multi-tenant storage
+
+With TENANT_DATA_DIR set, one deployment serves many companies, each in
+its own SQLite file <TENANT_DATA_DIR>/<tenant>.db. The tenant of a request
+comes from its host name (<tenant>.TENANT_DOMAIN) or from a header the
+proxy sets (TENANT_HEADER), and is kept in a context variable that
+get_db_connection(), the caches, the rate index and the job worker read.
+Each process keeps at most DB_MAX_OPEN_POOLS tenant pools open, closing
+the least recently used ones.
+
+Tenant databases are created with the command below, never by a request.
+
+Usage:
+    python -m src.tenants create acme [--admin-password SECRET]
+    python -m src.tenants list
+    python -m src.tenants upgrade
+"""
+import argparse
+import contextvars
+import os
+import re
+import sys
+from contextlib import contextmanager
+from .config import TENANT_DATA_DIR, TENANT_DOMAIN, TENANT_HEADER, EXPORT_DIR
+
+TENANT_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+
+_current_tenant = contextvars.ContextVar('tenant', default=None)
+
+def tenants_enabled():
+    return bool(TENANT_DATA_DIR)
+
+def current_tenant():
+    """Tenant of the running request or job, None in single-tenant mode"""
+    return _current_tenant.get()
+
+def set_current_tenant(tenant):
+    """Switch the current context to a tenant, returning a token for reset_current_tenant()"""
+    return _current_tenant.set(tenant)
+
+def reset_current_tenant(token):
+    _current_tenant.reset(token)
+
+@contextmanager
+def tenant_context(tenant):
+    token = set_current_tenant(tenant)
+    try:
+        yield tenant
+    finally:
+        reset_current_tenant(token)
+
+def valid_tenant_id(tenant):
+    return bool(tenant) and TENANT_ID_PATTERN.match(tenant) is not None
+
+def tenant_db_path(tenant):
+    return os.path.join(TENANT_DATA_DIR, f'{tenant}.db')
+
+def tenant_exists(tenant):
+    return valid_tenant_id(tenant) and os.path.exists(tenant_db_path(tenant))
+
+def resolve_tenant(host, headers):
+    """Tenant named by a request's TENANT_HEADER or host name, or None"""
+    if TENANT_HEADER:
+        tenant = headers.get(TENANT_HEADER)
+        if tenant:
+            return tenant.strip().lower()
+    if TENANT_DOMAIN:
+        host = (host or '').split(':', 1)[0].lower()
+        suffix = '.' + TENANT_DOMAIN.lower()
+        if host.endswith(suffix):
+            return host[:-len(suffix)]
+    return None
+
+def list_tenants():
+    """Names of the tenant databases in TENANT_DATA_DIR"""
+    if not TENANT_DATA_DIR or not os.path.isdir(TENANT_DATA_DIR):
+        return []
+    return sorted(
+        name[:-3] for name in os.listdir(TENANT_DATA_DIR)
+        if name.endswith('.db') and valid_tenant_id(name[:-3])
+    )
+
+def tenant_export_dir():
+    """Where the current tenant's export files go"""
+    tenant = current_tenant()
+    return os.path.join(EXPORT_DIR, tenant) if tenant else EXPORT_DIR
+
+def init_tenants(app):
+    """Bind every request to the tenant it names; unknown tenants get a 404"""
+    from flask import abort, g, request, session
+
+    @app.before_request
+    def bind_tenant():
+        if request.endpoint == 'static':
+            return
+        tenant = resolve_tenant(request.host, request.headers)
+        if not tenant_exists(tenant):
+            abort(404)
+        g.tenant_token = set_current_tenant(tenant)
+        # A session only ever opens the tenant that issued it
+        if 'employee_id' in session and session.get('tenant') != tenant:
+            session.clear()
+
+    @app.teardown_request
+    def unbind_tenant(exception=None):
+        token = g.pop('tenant_token', None)
+        if token is not None:
+            reset_current_tenant(token)
+
+def create_tenant(tenant, admin_password=None):
+    """Create and migrate a tenant database, optionally setting the admin password"""
+    from .database import current_pool
+    from .passwords import hash_password
+
+    if not valid_tenant_id(tenant):
+        raise ValueError(f'Invalid tenant id {tenant!r} (lowercase letters, digits and dashes)')
+    if tenant_exists(tenant):
+        raise ValueError(f'Tenant {tenant} already exists')
+    os.makedirs(TENANT_DATA_DIR, exist_ok=True)
+    with tenant_context(tenant):
+        conn = current_pool().acquire()
+        try:
+            if admin_password:
+                conn.execute("UPDATE employees SET password_hash = ? WHERE username = 'admin'",
+                             (hash_password(admin_password),))
+                conn.commit()
+        finally:
+            conn.close()
+
+def main(argv=None):
+    """Command line entry point"""
+    # Run with -m this file is __main__, a second copy of the module: work
+    # through the src.tenants the rest of the package reads the tenant from
+    from . import tenants
+
+    parser = argparse.ArgumentParser(prog='python -m src.tenants', description='Manage tenant databases')
+    parser.add_argument('command', choices=['create', 'list', 'upgrade'])
+    parser.add_argument('tenant', nargs='?')
+    parser.add_argument('--admin-password', help='password of the new tenant\'s admin account')
+    args = parser.parse_args(argv)
+
+    if not tenants_enabled():
+        parser.error('TENANT_DATA_DIR is not set')
+
+    if args.command == 'create':
+        if not args.tenant:
+            parser.error('create needs a tenant id')
+        try:
+            tenants.create_tenant(args.tenant, args.admin_password)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f'Created {tenant_db_path(args.tenant)}')
+    elif args.command == 'list':
+        for tenant in list_tenants():
+            print(tenant)
+    elif args.command == 'upgrade':
+        from .database import current_pool
+        for tenant in list_tenants():
+            with tenants.tenant_context(tenant):
+                current_pool()
+            print(f'{tenant}: up to date')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
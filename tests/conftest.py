@@ -0,0 +1,78 @@
+"""Shared fixtures: an app on a fresh database for each test"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TEMPLATE_FOLDER', os.path.join(ROOT, 'templates'))
+os.environ.setdefault('STATIC_FOLDER', os.path.join(ROOT, 'static'))
+# Tests log in a lot: a cheap hash keeps them fast
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+import pytest
+
+# Every test also runs on PostgreSQL when this names a scratch database,
+# whose public schema is dropped before each test
+POSTGRES_DSN = os.environ.get('TEST_POSTGRES_DSN')
+
+def reset_postgres(dsn):
+    import psycopg2
+    raw = psycopg2.connect(dsn)
+    try:
+        raw.autocommit = True
+        raw.cursor().execute('DROP SCHEMA public CASCADE; CREATE SCHEMA public')
+    finally:
+        raw.close()
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def db_path(request, tmp_path, monkeypatch):
+    """A new database used as DB_PATH: a SQLite file, then TEST_POSTGRES_DSN"""
+    from src import database
+    if request.param == 'postgres':
+        if not POSTGRES_DSN:
+            pytest.skip('TEST_POSTGRES_DSN is not set')
+        path = POSTGRES_DSN
+        reset_postgres(path)
+    else:
+        path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    yield path
+    database.close_pools()
+
+@pytest.fixture
+def app(db_path, monkeypatch):
+    from src import app as app_module
+    from src.passwords import LoginRateLimiter
+    from src.routes import auth_routes
+    monkeypatch.setattr(auth_routes, 'login_limiter', LoginRateLimiter())
+    application = app_module.create_app()
+    application.config['TESTING'] = True
+    return application
+
+@pytest.fixture
+def conn(app):
+    from src.database import get_db_connection
+    connection = get_db_connection()
+    yield connection
+    connection.close()
+
+@pytest.fixture
+def admin_client(app, conn):
+    """A test client logged in as the default admin"""
+    admin_id = conn.execute("SELECT id FROM employees WHERE username = 'admin'").fetchone()[0]
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(employee_id=admin_id, tenant=None, username='admin', employee_name='admin')
+    return client
+
+def add_employee(conn, username, password='secret', department=None):
+    """Insert an active employee, returning their id"""
+    from src.passwords import hash_password
+    row = conn.execute('''
+        INSERT INTO employees (employee_id, username, email, password_hash, first_name, last_name, department)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        RETURNING id
+    ''', (username.upper(), username, f'{username}@example.com', hash_password(password),
+          username.title(), 'Test', department)).fetchone()
+    conn.commit()
+    return row[0]
@@ -0,0 +1,61 @@
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from src import database
+from src.attendance import check_in_employee, check_out_employee
+from conftest import add_employee
+
+DAY = datetime(2026, 10, 5, 8, 50)
+
+def hammer(employee_ids, operation, minutes, threads=6, rounds=2):
+    """Run operation on every employee from several threads; returns (successes, errors)"""
+    successes = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = database.get_pool().acquire()
+        try:
+            for _ in range(rounds):
+                order = list(employee_ids)
+                rng.shuffle(order)
+                for employee_id in order:
+                    moment = DAY + timedelta(minutes=minutes, microseconds=rng.randint(0, 10 ** 6))
+                    try:
+                        success, _ = operation(conn, employee_id, now=moment)
+                    except Exception as exc:
+                        with lock:
+                            errors.append(repr(exc))
+                        continue
+                    if success:
+                        with lock:
+                            successes[employee_id] += 1
+        finally:
+            conn.close()
+
+    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return successes, errors
+
+def test_concurrent_check_ins_are_neither_lost_nor_duplicated(conn):
+    employee_ids = [add_employee(conn, f'user{n}') for n in range(12)]
+
+    # Check-outs start once every check-in is done: a check-in after a check-out opens another session
+    for operation, minutes in ((check_in_employee, 0), (check_out_employee, 8 * 60)):
+        successes, errors = hammer(employee_ids, operation, minutes)
+        assert errors == []
+        assert successes == {employee_id: 1 for employee_id in employee_ids}
+
+    rows = conn.execute('''
+        SELECT employee_id, COUNT(*) AS n, MIN(check_in_time) AS check_in, MIN(check_out_time) AS check_out
+        FROM checkins WHERE date = ? GROUP BY employee_id
+    ''', (DAY.date().isoformat(),)).fetchall()
+    assert sorted(row['employee_id'] for row in rows) == sorted(employee_ids)
+    assert all(row['n'] == 1 and row['check_in'] and row['check_out'] for row in rows)
+    sessions, closed = conn.execute('SELECT COUNT(*), COUNT(ended_at) FROM work_sessions').fetchone()
+    assert sessions == closed == len(employee_ids)
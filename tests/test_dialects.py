@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+import time
+import pytest
+from src import database
+from src.dialects import POSTGRES, dialect_of
+from src.migrations import (MIGRATIONS, POSTGRES_MIGRATIONS, SCHEMA_VERSION, get_schema_version, migrate,
+                            verify)
+from conftest import add_employee
+
+def test_translate_placeholders():
+    pytest.importorskip('psycopg2')
+    from src.postgres import translate
+    assert translate("BEGIN IMMEDIATE") == 'BEGIN'
+    assert translate("SELECT '?', \"a?\", x::text, ? FROM t WHERE a = :name AND b LIKE '10%'") == (
+        "SELECT '?', \"a?\", x::text, %s FROM t WHERE a = %(name)s AND b LIKE '10%%'")
+
+def test_placeholders(conn):
+    assert tuple(conn.execute("SELECT '50%' AS literal, '?' AS mark, ? AS value", (7,)).fetchone()) == (
+        '50%', '?', 7)
+    row = conn.execute("SELECT ':day' AS literal, :day AS day", {'day': '2026-10-05'}).fetchone()
+    assert (row['literal'], row['day']) == (':day', '2026-10-05')
+
+def test_rows_table_and_in_list(conn):
+    dialect = dialect_of(conn)
+    columns = [('employee_id', 'INTEGER'), ('day', 'DATE'), ('since', 'TIMESTAMP')]
+    rows = [(1, '2026-10-05', '2026-10-05 09:00:00'), (2, '2026-10-06', '2026-10-06 13:30:00.123456')]
+    selected = conn.execute(f'''
+        SELECT employee_id, day, since FROM ({dialect.rows_table('?', columns)}) AS r ORDER BY employee_id
+    ''', (dialect.rows_param(rows, columns),)).fetchall()
+    assert [tuple(row) for row in selected] == rows
+
+    for username in ('alice', 'bob', 'carol'):
+        add_employee(conn, username)
+    names = conn.execute(f'''
+        SELECT username FROM employees WHERE {dialect.in_list('username', ':names')} ORDER BY username
+    ''', {'names': dialect.list_param(['alice', 'carol', 'nobody'])}).fetchall()
+    assert [row[0] for row in names] == ['alice', 'carol']
+
+def test_lock_until_commit_serializes_transactions(conn):
+    dialect = dialect_of(conn)
+    order = []
+
+    def second_writer():
+        other = database.get_pool().acquire()
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            dialect.lock_until_commit(other, 4242)
+            order.append('second')
+            other.commit()
+        finally:
+            other.close()
+
+    conn.execute('BEGIN IMMEDIATE')
+    dialect.lock_until_commit(conn, 4242)
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    time.sleep(0.3)
+    order.append('first')
+    conn.commit()
+    thread.join(5)
+    assert order == ['first', 'second']
+
+def test_migrations_are_applied(conn):
+    migrations = POSTGRES_MIGRATIONS if dialect_of(conn) is POSTGRES else MIGRATIONS
+    applied = conn.execute('SELECT version FROM schema_migrations ORDER BY version').fetchall()
+    assert [row[0] for row in applied] == [version for version, _, _ in migrations]
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert verify(conn) == []
+    assert migrate(conn) == []
+    # Columns and tables of migrations 8 to 11
+    conn.execute('SELECT effective_date, hourly_rate FROM billing_rates').fetchall()
+    conn.execute('SELECT month, file, checksum FROM checkin_archives').fetchall()
+    conn.execute('SELECT started_at, ended_at, checkin_date FROM work_sessions').fetchall()
+    conn.execute('SELECT worked_hours FROM checkins').fetchall()
+
+def test_sqlite_upgrade_fills_worked_hours(tmp_path):
+    old = sqlite3.connect(tmp_path / 'old.db')
+    old.row_factory = sqlite3.Row
+    cursor = old.cursor()
+    for version, _, step in MIGRATIONS[:7]:
+        step(cursor)
+    cursor.execute('PRAGMA user_version = 7')
+    employee_id = add_employee(old, 'alice')
+    old.execute('''
+        INSERT INTO checkins (employee_id, check_in_time, check_out_time, date, status)
+        VALUES (?, '2026-10-05 08:57:00', '2026-10-05 17:27:00', '2026-10-05', 'on_time')
+    ''', (employee_id,))
+    old.commit()
+
+    assert migrate(old) == [8, 9, 10, 11]
+    assert verify(old) == []
+    assert old.execute('SELECT worked_hours FROM checkins').fetchone()[0] == 8.5
+    rollup = old.execute('''
+        SELECT completed_days, total_hours FROM attendance_rollups WHERE period_type = 'month'
+    ''').fetchone()
+    assert tuple(rollup) == (1, 8.5)
+    old.close()
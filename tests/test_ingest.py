@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+import pytest
+from src.attendance import check_in_employee, check_out_employee
+from src.ingest import ingest_batch
+from conftest import add_employee
+
+def event(event_id, event_type, timestamp, employee='ALICE'):
+    return json.dumps({'event_id': event_id, 'employee_id': employee, 'type': event_type, 'timestamp': timestamp})
+
+def day_row(conn, employee_id, day):
+    return dict(conn.execute('''
+        SELECT check_in_time, check_out_time, worked_hours, status FROM checkins WHERE employee_id = ? AND date = ?
+    ''', (employee_id, day)).fetchone())
+
+def sessions(conn, employee_id):
+    return [tuple(row) for row in conn.execute('''
+        SELECT started_at, ended_at FROM work_sessions WHERE employee_id = ? ORDER BY started_at
+    ''', (employee_id,))]
+
+@pytest.fixture
+def alice(conn):
+    return add_employee(conn, 'alice')
+
+def test_events_in_order(conn, alice):
+    results = ingest_batch(conn, [event('a:1', 'check_in', '2026-10-05T08:57:00'),
+                                  event('a:2', 'check_out', '2026-10-05T17:27:00')])
+    assert [entry['result'] for entry in results] == ['applied', 'applied']
+    assert day_row(conn, alice, '2026-10-05') == {
+        'check_in_time': '2026-10-05 08:57:00', 'check_out_time': '2026-10-05 17:27:00',
+        'worked_hours': 8.5, 'status': 'on_time'}
+
+def test_late_events_replay_before_newer_sessions(conn, alice):
+    assert ingest_batch(conn, [event('b:1', 'check_in', '2026-10-05T13:00:00')])[0]['result'] == 'applied'
+    # Buffered by a reader that was offline all morning
+    results = ingest_batch(conn, [event('a:1', 'check_in', '2026-10-05T09:00:00'),
+                                  event('a:2', 'check_out', '2026-10-05T12:00:00')])
+    assert [entry['result'] for entry in results] == ['applied', 'applied']
+    assert sessions(conn, alice) == [('2026-10-05 09:00:00', '2026-10-05 12:00:00'), ('2026-10-05 13:00:00', None)]
+    assert ingest_batch(conn, [event('b:2', 'check_out', '2026-10-05T17:00:00')])[0]['result'] == 'applied'
+    assert day_row(conn, alice, '2026-10-05') == {
+        'check_in_time': '2026-10-05 09:00:00', 'check_out_time': '2026-10-05 17:00:00',
+        'worked_hours': 7.0, 'status': 'on_time'}
+
+def test_late_check_in_moves_a_web_check_in_earlier(conn, alice):
+    assert check_in_employee(conn, alice, datetime(2026, 10, 5, 9, 20))[0]
+    assert check_out_employee(conn, alice, datetime(2026, 10, 5, 12, 0))[0]
+    assert day_row(conn, alice, '2026-10-05')['status'] == 'late'
+    result, = ingest_batch(conn, [event('a:1', 'check_in', '2026-10-05T08:57:00')])
+    assert result['result'] == 'applied'
+    assert sessions(conn, alice) == [('2026-10-05 08:57:00', '2026-10-05 12:00:00')]
+    row = day_row(conn, alice, '2026-10-05')
+    assert (row['check_in_time'], row['status'], round(row['worked_hours'], 2)) == (
+        '2026-10-05 08:57:00', 'early_leave', 3.05)
+
+def test_rejections_are_recorded(conn, alice):
+    batch = [event('a:1', 'check_out', '2026-10-05T17:00:00'),
+             event('x:1', 'check_in', '2026-10-05T09:00:00', employee='NOBODY'),
+             event('x:1', 'check_in', '2026-10-05T09:00:00', employee='NOBODY')]
+    first = ingest_batch(conn, batch)
+    assert [(entry['result'], entry.get('duplicate', False)) for entry in first] == [
+        ('rejected', False), ('rejected', False), ('rejected', True)]
+    again = ingest_batch(conn, batch)
+    assert [entry['message'] for entry in again] == [entry['message'] for entry in first]
+    assert all(entry['duplicate'] for entry in again)
+    assert conn.execute("SELECT COUNT(*) FROM ingest_events WHERE result = 'rejected'").fetchone()[0] == 2
@@ -0,0 +1,40 @@
+import csv
+import io
+import threading
+import pytest
+from src import jobs
+from conftest import add_employee
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    from src import tenants
+    monkeypatch.setattr(tenants, 'EXPORT_DIR', str(tmp_path / 'exports'))
+    return tmp_path / 'exports'
+
+def run_queued(conn):
+    row = jobs.claim(conn, 'test')
+    return jobs.run_job(conn, row, threading.Event()), jobs.get_job(conn, row['id'])
+
+def test_billing_export_runs_as_a_job(admin_client, conn, export_dir):
+    employee_id = add_employee(conn, 'alice', department='Ops')
+    conn.execute('INSERT INTO billing_rates (employee_id, hourly_rate, effective_date) VALUES (?, ?, ?)',
+                 (employee_id, 40, '2026-01-01'))
+    conn.execute('''
+        INSERT INTO checkins (employee_id, check_in_time, check_out_time, worked_hours, date)
+        VALUES (?, '2026-03-02 09:00:00', '2026-03-02 17:00:00', 8, '2026-03-02')
+    ''', (employee_id,))
+    conn.commit()
+
+    response = admin_client.get('/admin/billing/export?start_date=2026-03-01&end_date=2026-03-31&department=Ops')
+    assert response.status_code == 302 and response.location.endswith('/admin/jobs')
+
+    status, job = run_queued(conn)
+    assert status == 'done'
+    assert job['kind'] == 'billing_export' and job['result']['employees'] == 1
+    assert job['progress'] == job['total'] == 1
+
+    download = admin_client.get(f"/admin/jobs/{job['id']}/download")
+    assert download.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(download.get_data(as_text=True))))
+    assert [(row['employee_id'], float(row['total_hours']), float(row['total_cost'])) for row in rows] == [
+        ('ALICE', 8.0, 320.0)]
@@ -0,0 +1,58 @@
+from src.config import LOGIN_RATE_LIMIT_ATTEMPTS
+from conftest import add_employee
+
+OFFICE = {'REMOTE_ADDR': '10.0.0.1'}
+
+def log_in(client, username, password='secret', **environ):
+    client.get('/logout')
+    return client.post('/login', data={'username': username, 'password': password},
+                       environ_base=dict(OFFICE, **environ))
+
+def test_many_users_log_in_from_one_address(app, conn):
+    count = LOGIN_RATE_LIMIT_ATTEMPTS * 2 + 1
+    for number in range(count):
+        add_employee(conn, f'user{number}')
+    client = app.test_client()
+    statuses = [log_in(client, f'user{number}').status_code for number in range(count)]
+    assert statuses == [302] * count
+
+def test_failed_attempts_are_limited_per_address(app, conn):
+    add_employee(conn, 'alice')
+    client = app.test_client()
+    for number in range(LOGIN_RATE_LIMIT_ATTEMPTS):
+        assert log_in(client, f'nobody{number}', 'wrong').status_code == 200
+    assert log_in(client, 'alice').status_code == 429
+    assert log_in(client, 'alice', REMOTE_ADDR='10.0.0.2').status_code == 302
+
+def test_failed_attempts_are_limited_per_username(app, conn):
+    add_employee(conn, 'alice')
+    client = app.test_client()
+    for number in range(LOGIN_RATE_LIMIT_ATTEMPTS):
+        log_in(client, 'alice', 'wrong', REMOTE_ADDR=f'10.1.0.{number}')
+    assert log_in(client, 'alice', REMOTE_ADDR='10.2.0.1').status_code == 429
+
+def test_successful_login_clears_failures(app, conn):
+    add_employee(conn, 'alice')
+    client = app.test_client()
+    for _ in range(2):
+        for _ in range(LOGIN_RATE_LIMIT_ATTEMPTS - 1):
+            assert log_in(client, 'alice', 'wrong').status_code == 200
+        assert log_in(client, 'alice').status_code == 302
+
+def test_client_address_from_trusted_proxy(db_path, monkeypatch):
+    from src import app as app_module
+    from src.database import get_db_connection
+    from src.passwords import LoginRateLimiter
+    from src.routes import auth_routes
+    monkeypatch.setattr(auth_routes, 'login_limiter', LoginRateLimiter())
+    monkeypatch.setattr(app_module, 'TRUSTED_PROXY_COUNT', 1)
+    client = app_module.create_app().test_client()
+    conn = get_db_connection()
+    add_employee(conn, 'alice')
+    conn.close()
+
+    # Every request comes from the proxy; the clients differ in X-Forwarded-For
+    for number in range(LOGIN_RATE_LIMIT_ATTEMPTS):
+        log_in(client, f'nobody{number}', 'wrong', HTTP_X_FORWARDED_FOR='203.0.113.7')
+    assert log_in(client, 'alice', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code == 429
+    assert log_in(client, 'alice', HTTP_X_FORWARDED_FOR='198.51.100.20').status_code == 302
@@ -0,0 +1,53 @@
+import csv
+import io
+from datetime import date, datetime
+import pytest
+from src.attendance import check_in_employee, check_out_employee, get_day_activity
+from src.rollups import get_period_activity
+from conftest import add_employee
+
+MONDAY = date(2026, 10, 5)
+
+@pytest.fixture
+def week(conn):
+    """alice late and staying on, bob on time, carol absent"""
+    alice = add_employee(conn, 'alice', department='Ops')
+    bob = add_employee(conn, 'bob', department='Ops')
+    add_employee(conn, 'carol', department='Sales')
+    for employee_id, check_in, check_out in ((alice, (9, 20), (17, 30)), (bob, (8, 55), (17, 0))):
+        assert check_in_employee(conn, employee_id, datetime(2026, 10, 5, *check_in))[0]
+        assert check_out_employee(conn, employee_id, datetime(2026, 10, 5, *check_out))[0]
+
+def test_day_and_week_activity(conn, week):
+    day = {row['username']: (row['check_in_time'], row['status']) for row in get_day_activity(conn, MONDAY)}
+    assert day == {'admin': (None, None), 'alice': ('2026-10-05 09:20:00', 'late'),
+                   'bob': ('2026-10-05 08:55:00', 'on_time'), 'carol': (None, None)}
+    summary = {row['username']: (row['days_worked'], row['late_days'], row['total_hours'])
+               for row in get_period_activity(conn, 'week', MONDAY)}
+    assert summary['alice'] == (1, 1, 8.17)
+    assert summary['bob'] == (1, 0, 8.08)
+    assert summary['carol'] == (0, 0, 0)
+
+def test_report_pages(admin_client, week):
+    for period in ('day', 'week', 'month'):
+        response = admin_client.get(f'/admin/reports?period={period}&date=2026-10-05')
+        assert response.status_code == 200
+        assert b'alice' in response.data
+
+def test_analytics_api(admin_client, week):
+    response = admin_client.get('/admin/api/analytics/trends?start_date=2026-10-05&end_date=2026-10-11')
+    assert response.status_code == 200
+    trends = response.get_json()
+    assert trends['employees'] == 4
+    assert trends['data'][0] == {'week_start': '2026-10-05', 'check_ins': 2, 'late_days': 1,
+                                 'late_rate': 50.0, 'overtime_hours': 0.5}
+    departments = admin_client.get('/admin/api/analytics/departments?start_date=2026-10-05&end_date=2026-10-11')
+    assert {row['department'] for row in departments.get_json()['data']} >= {'Ops', 'Sales'}
+
+def test_attendance_export(admin_client, week):
+    response = admin_client.get('/admin/attendance/export?start_date=2026-10-05&end_date=2026-10-05'
+                                '&department=Ops&details=1')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['employee_id'], row['status'], row['hours_worked']) for row in rows] == [
+        ('BOB', 'on_time', '8.0833'), ('ALICE', 'late', '8.1667')]
@@ -0,0 +1,69 @@
+import json
+from datetime import date, datetime
+import pytest
+from src.attendance import check_in_employee, check_out_employee
+from src.billing_engine import compute_billing_totals, compute_employee_billing
+from src.ingest import ingest_batch
+from src.schedules import set_schedule
+from conftest import add_employee
+
+MONDAY = date(2026, 10, 5)
+
+def at(day, clock):
+    return datetime.combine(date.fromisoformat(day), datetime.strptime(clock, '%H:%M').time())
+
+def billed_days(conn, employee_id):
+    billing = compute_employee_billing(conn, employee_id, MONDAY, date(2026, 10, 11))
+    return {str(record['date']): record['hours_worked'] for record in billing['records']}
+
+def badge(conn, employee_code, event_type, moment):
+    line = json.dumps({'event_id': f'{employee_code}:{event_type}:{moment}', 'employee_id': employee_code,
+                       'type': event_type, 'timestamp': moment.isoformat()})
+    return ingest_batch(conn, [line])[0]
+
+@pytest.fixture
+def alice(conn):
+    return add_employee(conn, 'alice')
+
+def test_next_day_check_in_drops_a_forgotten_evening_session(conn, alice):
+    assert check_in_employee(conn, alice, at('2026-10-05', '17:30'))[0]
+    assert check_in_employee(conn, alice, at('2026-10-06', '08:55'))[0]
+    assert check_out_employee(conn, alice, at('2026-10-06', '09:00'))[0]
+    assert billed_days(conn, alice) == {'2026-10-06': 0.08}
+
+def test_night_shift_is_still_running_the_next_morning(conn, alice):
+    set_schedule(conn, alice, {MONDAY.weekday(): ('22:00', '06:00')})
+    assert check_in_employee(conn, alice, at('2026-10-05', '21:55'))[0]
+    assert check_in_employee(conn, alice, at('2026-10-06', '02:00')) == (
+        False, 'Already checked in since 2026-10-05 21:55')
+    assert check_out_employee(conn, alice, at('2026-10-06', '06:07'))[0]
+    assert billed_days(conn, alice) == {'2026-10-05': 8.2}
+
+def test_gaps_between_sessions_are_not_billed(conn, alice):
+    for check_in, check_out in (('09:00', '12:00'), ('13:00', '17:30')):
+        assert check_in_employee(conn, alice, at('2026-10-05', check_in))[0]
+        assert check_out_employee(conn, alice, at('2026-10-05', check_out))[0]
+    assert billed_days(conn, alice) == {'2026-10-05': 7.5}
+    assert compute_billing_totals(conn, MONDAY, MONDAY)[alice]['total_hours'] == 7.5
+    rollup = conn.execute('''
+        SELECT completed_days, total_hours FROM attendance_rollups
+        WHERE employee_id = ? AND period_type = 'month'
+    ''', (alice,)).fetchone()
+    assert tuple(rollup) == (1, 7.5)
+
+def test_open_session_bills_what_is_closed(conn, alice):
+    assert check_in_employee(conn, alice, at('2026-10-05', '09:00'))[0]
+    assert billed_days(conn, alice) == {}
+    assert check_out_employee(conn, alice, at('2026-10-05', '12:00'))[0]
+    assert check_in_employee(conn, alice, at('2026-10-05', '13:00'))[0]
+    assert billed_days(conn, alice) == {'2026-10-05': 3.0}
+
+def test_badge_events_follow_the_same_rules(conn, alice):
+    assert badge(conn, 'ALICE', 'check_in', at('2026-10-05', '09:00'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_out', at('2026-10-05', '12:00'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_in', at('2026-10-05', '13:00'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_out', at('2026-10-05', '17:30'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_in', at('2026-10-05', '19:00'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_in', at('2026-10-06', '08:55'))['result'] == 'applied'
+    assert badge(conn, 'ALICE', 'check_out', at('2026-10-06', '09:00'))['result'] == 'applied'
+    assert billed_days(conn, alice) == {'2026-10-05': 7.5, '2026-10-06': 0.08}